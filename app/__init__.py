@@ -1,21 +1,44 @@
 # app/__init__.py
+import click
 from flask import Flask, request, session
+from sqlalchemy import event
 from flask_babel import Babel
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_migrate import Migrate
 from config import Config
 
 db = SQLAlchemy()
 babel = Babel()
 login_manager = LoginManager()
-migrate = Migrate()
+migrate = None  # created on demand, see _init_migrate
 
 def get_locale():
     if 'language' in session:
         return session['language']
     return request.accept_languages.best_match(Config.LANGUAGES.keys())
 
+def _apply_sqlite_pragmas(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+def _init_migrate(app):
+    """
+    Flask-Migrate pulls in alembic (~100 ms, several MB per worker) and is
+    only used by the `flask db ...` commands, so it is initialised only when
+    the app is created from the Flask CLI (or MIGRATIONS_ENABLED is set).
+    """
+    global migrate
+    if not (app.config.get('MIGRATIONS_ENABLED') or click.get_current_context(silent=True)):
+        return
+    from flask_migrate import Migrate
+    if migrate is None:
+        migrate = Migrate()
+    migrate.init_app(app, db)
+
 def create_app(config_class=Config):
     app = Flask(__name__, 
                 template_folder='../templates',
@@ -25,9 +48,12 @@ def create_app(config_class=Config):
     
     # Initialize extensions
     db.init_app(app)
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        with app.app_context():
+            _apply_sqlite_pragmas(db.engine, app.config.get('SQLITE_PRAGMAS', {}))
     babel.init_app(app, locale_selector=get_locale)
     login_manager.init_app(app)
-    migrate.init_app(app, db)
+    _init_migrate(app)
     
     # Flask-Login settings
     login_manager.login_view = 'auth.login_page'
@@ -36,23 +62,59 @@ def create_app(config_class=Config):
     @login_manager.user_loader
     def load_user(user_id):
         from app.models import User
-        return User.query.get(int(user_id))
+        user = db.session.get(User, int(user_id))
+        # login_user() refuses inactive accounts; a deactivated account's open session ends too
+        return user if user is not None and user.is_active else None
     
     @app.context_processor
     def inject_locale():
         return dict(get_locale=get_locale)
     
+    # Host backend: the real Linux box, or an in-memory fake (load tests, dev)
+    from app.user_mgmt.backends import init_system_backend
+    init_system_backend(app)
+    
+    # Write-behind audit journal (app.audit.audit)
+    from app.audit import journal
+    journal.init_app(app)
+    
+    # Billing cycles (`flask billing rollover`)
+    from app.billing import init_billing
+    init_billing(app)
+
+    # Reseller totals maintenance (`flask resellers recount`)
+    from app.user_mgmt.services.resellers import init_resellers
+    init_resellers(app)
+    
+    # nft quota re-install (`flask quotas sync`, itbity-quotas.service at boot)
+    from app.user_mgmt.services.quotas import init_quotas
+    init_quotas(app)
+    
+    # On-demand request profiling (armed from the settings page)
+    from app.profiling import profiler
+    profiler.init_app(app)
+    
+    # Per-request query counting / N+1 detection (QUERY_BUDGET=warn|strict)
+    from app.querybudget import budget
+    budget.init_app(app)
+    
+    # Fingerprinted static assets (asset_url() in templates, `flask assets-build`)
+    from app.assets import init_assets
+    init_assets(app)
+    
     # Register blueprints
     from app.routes import main_bp
     from app.auth import auth_bp
     from app.api import api_bp
     from app.user_management import user_management_bp
     from app.settings import settings_bp
+    from app.nodes.routes import nodes_bp
     
     app.register_blueprint(main_bp, url_prefix=f'/{app.config["PANEL_PATH"]}')
     app.register_blueprint(auth_bp, url_prefix=f'/{app.config["PANEL_PATH"]}')
     app.register_blueprint(api_bp, url_prefix=f'/{app.config["PANEL_PATH"]}/api')
     app.register_blueprint(user_management_bp, url_prefix=f'/{app.config["PANEL_PATH"]}/user_management')
     app.register_blueprint(settings_bp, url_prefix=f'/{app.config["PANEL_PATH"]}/settings')
+    app.register_blueprint(nodes_bp, url_prefix=f'/{app.config["PANEL_PATH"]}/nodes')
     
     return app
\ No newline at end of file
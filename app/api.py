@@ -1,6 +1,7 @@
-from flask import Blueprint, jsonify, session
+from flask import Blueprint, jsonify, request, session
 from flask_babel import gettext as _
-import paramiko
+from app.api_tokens import token_required
+from app.querybudget import query_budget
 
 api_bp = Blueprint('api', __name__)
 
@@ -9,5 +10,55 @@ def connect():
     if 'logged_in' not in session:
         return jsonify({'success': False, 'message': _('Not authenticated')})
     
-    # SSH connection logic
-    return jsonify({'success': True, 'message': _('Connected successfully')})
\ No newline at end of file
+    # SSH connection logic (not implemented yet). paramiko, when it is used,
+    # belongs inside this handler, not at module level: importing it roughly
+    # doubles worker startup
+    return jsonify({'success': True, 'message': _('Connected successfully')})
+
+
+# ---- token API for external billing systems ----------------------------------
+
+def _csv_arg(name):
+    value = request.args.get(name)
+    return [v for v in value.split(',') if v] if value else None
+
+
+@api_bp.route('/v1/usage', methods=['GET'])
+@token_required
+@query_budget(5)
+def usage():
+    """?ids=1,2 | ?usernames=a,b | ?changed_since=2024-01-01T00:00:00[&deleted_after_id=] | ?after_id=&limit="""
+    from app.user_mgmt.services.usage import query_usage
+    result = query_usage(
+        ids=_csv_arg('ids'),
+        usernames=_csv_arg('usernames'),
+        changed_since=request.args.get('changed_since'),
+        after_id=request.args.get('after_id'),
+        limit=request.args.get('limit', 500),
+        deleted_after_id=request.args.get('deleted_after_id'),
+    )
+    if isinstance(result, tuple):
+        body, code = result
+        return jsonify(body), code
+    return jsonify(result)
+
+
+@api_bp.route('/v1/usage', methods=['POST'])
+@token_required
+@query_budget(5)
+def usage_batch():
+    """Large batches: {"ids": [...]} or {"usernames": [...]} (plus the GET options)."""
+    from app.user_mgmt.services.usage import query_usage
+    data = request.get_json(silent=True) or {}
+    result = query_usage(
+        ids=data.get('ids'),
+        usernames=data.get('usernames'),
+        changed_since=data.get('changed_since'),
+        after_id=data.get('after_id'),
+        limit=data.get('limit', 500),
+        deleted_after_id=data.get('deleted_after_id'),
+    )
+    if isinstance(result, tuple):
+        body, code = result
+        return jsonify(body), code
+    return jsonify(result)
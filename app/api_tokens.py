@@ -0,0 +1,58 @@
+# app/api_tokens.py
+"""
+Bearer tokens for external integrations (billing systems).
+
+    Authorization: Bearer itb_...
+
+Only the sha256 of a token is stored, looked up through a unique index; the
+token itself is shown once when it is created. `last_used_at` is written at
+most once a minute per token so polling does not turn reads into writes.
+"""
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import g, jsonify, request
+from app import db
+from app.models import ApiToken
+
+TOKEN_PREFIX = 'itb_'
+LAST_USED_RESOLUTION = timedelta(minutes=1)
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def create_token(name: str) -> tuple[ApiToken, str]:
+    """New active token; returns (row, plaintext token)."""
+    token = TOKEN_PREFIX + secrets.token_urlsafe(32)
+    row = ApiToken(name=name, token_hash=hash_token(token), prefix=token[:12])
+    db.session.add(row)
+    db.session.commit()
+    return row, token
+
+
+def _bearer() -> str | None:
+    header = request.headers.get('Authorization', '')
+    scheme, _, value = header.partition(' ')
+    if scheme.lower() != 'bearer' or not value.strip():
+        return None
+    return value.strip()
+
+
+def token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = _bearer()
+        row = ApiToken.query.filter_by(token_hash=hash_token(token)).first() if token else None
+        if row is None or not row.is_active:
+            return jsonify({'success': False, 'message': 'Invalid or missing API token'}), 401
+
+        now = datetime.utcnow()
+        if row.last_used_at is None or now - row.last_used_at >= LAST_USED_RESOLUTION:
+            row.last_used_at = now
+            db.session.commit()
+        g.api_token = row
+        return f(*args, **kwargs)
+    return decorated
@@ -0,0 +1,132 @@
+# app/assets.py
+"""
+Static asset pipeline.
+
+`flask assets-build` copies static/css and static/js into static/dist with a
+content hash in the filename, writes .gz (and .br when the optional `brotli`
+package is installed) next to each file, and records the mapping in
+static/dist/manifest.json.
+
+Templates call `asset_url('css/admin.css')`, which resolves to the hashed
+file when a manifest exists and to the plain static URL otherwise. Hashed
+files never change, so they are served with `Cache-Control: immutable`.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import click
+from flask import current_app, request, send_file, url_for, abort
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+ASSET_DIRS = ('css', 'js')
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def build_assets(static_folder: str) -> dict:
+    dist = os.path.join(static_folder, DIST_DIR)
+    shutil.rmtree(dist, ignore_errors=True)
+
+    manifest = {}
+    for sub in ASSET_DIRS:
+        src_dir = os.path.join(static_folder, sub)
+        if not os.path.isdir(src_dir):
+            continue
+        for name in sorted(os.listdir(src_dir)):
+            src = os.path.join(src_dir, name)
+            if not os.path.isfile(src):
+                continue
+            with open(src, 'rb') as f:
+                content = f.read()
+
+            stem, ext = os.path.splitext(name)
+            digest = hashlib.sha256(content).hexdigest()[:12]
+            rel = f'{DIST_DIR}/{sub}/{stem}.{digest}{ext}'
+            out = os.path.join(static_folder, rel)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+
+            with open(out, 'wb') as f:
+                f.write(content)
+            # mtime=0 keeps the .gz byte-identical across builds
+            with open(out + '.gz', 'wb') as f:
+                f.write(gzip.compress(content, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(out + '.br', 'wb') as f:
+                    f.write(brotli.compress(content, quality=11))
+
+            manifest[f'{sub}/{name}'] = rel
+
+    with open(os.path.join(dist, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def _load_manifest(app) -> dict:
+    path = os.path.join(app.static_folder, DIST_DIR, MANIFEST_NAME)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_url(filename: str) -> str:
+    manifest = current_app.extensions['assets']
+    hashed = manifest.get(filename)
+    if hashed:
+        return url_for('assets_dist', filename=hashed[len(DIST_DIR) + 1:])
+    return url_for('static', filename=filename)
+
+
+def serve_dist(filename):
+    """Serve a hashed asset, preferring a precompressed variant the client accepts."""
+    dist = os.path.join(current_app.static_folder, DIST_DIR)
+    path = os.path.realpath(os.path.join(dist, filename))
+    if not path.startswith(os.path.realpath(dist) + os.sep) or not os.path.isfile(path):
+        abort(404)
+
+    accepted = request.headers.get('Accept-Encoding', '')
+    encoding = None
+    for enc, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if enc in accepted and os.path.isfile(path + suffix):
+            encoding, path = enc, path + suffix
+            break
+
+    response = send_file(
+        path,
+        mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+        conditional=True,
+        etag=True,
+        max_age=31536000,
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+
+def init_assets(app):
+    app.extensions['assets'] = _load_manifest(app)
+    app.add_url_rule(f'{app.static_url_path}/{DIST_DIR}/<path:filename>',
+                     endpoint='assets_dist', view_func=serve_dist)
+
+    @app.context_processor
+    def inject_asset_url():
+        return dict(asset_url=asset_url)
+
+    @app.cli.command('assets-build')
+    def assets_build():
+        """Fingerprint and precompress static/css and static/js."""
+        manifest = build_assets(app.static_folder)
+        app.extensions['assets'] = manifest
+        click.echo(f'Built {len(manifest)} assets into {DIST_DIR}/'
+                   f'{" (gzip + brotli)" if brotli else " (gzip only, install brotli for .br)"}')
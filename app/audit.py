@@ -0,0 +1,182 @@
+# app/audit.py
+"""
+Write-behind audit journal.
+
+    from app.audit import audit
+    audit('user.update', target=user, changes={'traffic_limit': 100})
+
+`audit()` only appends to an in-process buffer (no DB round trip on the
+request path). A background thread flushes the buffer to the append-only
+`audit_events` table with one batched INSERT every AUDIT_FLUSH_INTERVAL
+seconds, or as soon as AUDIT_FLUSH_SIZE events are waiting. Pending events
+are flushed at exit and before every query.
+
+The buffer is per process: under gunicorn a query flushes only its own
+worker's events, the other workers' reach the table within
+AUDIT_FLUSH_INTERVAL. Actions that later reads depend on (SYNC_ACTIONS,
+e.g. `user.delete` for the usage API's `deleted` list) skip the buffer and
+are inserted in the caller's transaction, so they are visible to every
+worker as soon as that change is committed (and vanish with a rollback).
+"""
+import atexit
+import json
+import os
+import threading
+from datetime import datetime
+from flask import current_app, has_app_context, has_request_context
+from flask_login import current_user
+from sqlalchemy import and_, insert, or_, select
+
+SECRET_FIELDS = {'password'}
+# written with the caller's transaction instead of the write-behind buffer
+SYNC_ACTIONS = {'user.delete'}
+
+
+class AuditJournal:
+    def __init__(self):
+        self.app = None
+        self.interval = 2.0
+        self.flush_size = 200
+        self.max_buffer = 10000
+        self._buffer: list[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None  # flusher thread owner (threads do not survive a fork)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config.get('AUDIT_FLUSH_INTERVAL', self.interval)
+        self.flush_size = app.config.get('AUDIT_FLUSH_SIZE', self.flush_size)
+        self.max_buffer = app.config.get('AUDIT_BUFFER_MAX', self.max_buffer)
+        atexit.register(self.flush)
+
+    def _ensure_flusher(self):
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        threading.Thread(target=self._run, daemon=True, name='audit-flusher').start()
+
+    def record(self, action: str, target=None, **details):
+        """Queue one event; `target` is a User (or None), details must be JSON-serialisable."""
+        actor_id, actor = None, None
+        if has_request_context() and current_user and current_user.is_authenticated:
+            actor_id, actor = current_user.id, current_user.username
+
+        event = {
+            'created_at': datetime.utcnow(),
+            'actor_id': actor_id,
+            'actor': actor,
+            'action': action,
+            'target_user_id': getattr(target, 'id', None),
+            'target': getattr(target, 'username', target),
+            'details': json.dumps(redact(details), default=str) if details else None,
+        }
+        if action in SYNC_ACTIONS and has_app_context():
+            from app import db
+            from app.models import AuditEvent
+            db.session.execute(insert(AuditEvent), [event])
+            return
+
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                # DB unreachable for a long time: keep the newest events
+                self._buffer.pop(0)
+            self._buffer.append(event)
+            size = len(self._buffer)
+
+        self._ensure_flusher()
+        if size >= self.flush_size:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Write all pending events in one batched INSERT; returns how many were written."""
+        if self.app is None:
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buffer = self._buffer, []
+            if not batch:
+                return 0
+
+            from app import db
+            from app.models import AuditEvent
+            with self.app.app_context():
+                try:
+                    db.session.execute(insert(AuditEvent), batch)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    with self._lock:
+                        self._buffer[:0] = batch
+                    print(f"[audit] flush failed, {len(batch)} events kept: {e}")
+                    return 0
+            return len(batch)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+
+journal = AuditJournal()
+
+
+def redact(details: dict) -> dict:
+    """Never journal secrets: only record that they changed."""
+    out = {}
+    for key, value in details.items():
+        if isinstance(value, dict):
+            value = redact(value)
+        elif key in SECRET_FIELDS:
+            value = bool(value)
+        out[key] = value
+    return out
+
+
+def audit(action: str, target=None, **details):
+    journal.record(action, target, **details)
+
+
+def query_events(user_id=None, action=None, since=None, until=None, before_id=None,
+                 after_id=None, oldest_first=False, limit=100):
+    """
+    Newest-first events, optionally for one target user, action and
+    [since, until) time range. Page with `before_id` = last id of the page
+    (or oldest-first with `oldest_first` / `after_id`): events are ordered
+    and paged by (created_at, id), since a worker that flushes later stores
+    older events under higher ids.
+    Only this process's buffer is flushed first (see the module docstring).
+    """
+    from app.models import AuditEvent
+    journal.flush()
+
+    q = AuditEvent.query
+    if user_id is not None:
+        q = q.filter(AuditEvent.target_user_id == user_id)
+    if action:
+        q = q.filter(AuditEvent.action == action)
+    if since:
+        q = q.filter(AuditEvent.created_at >= since)
+    if until:
+        q = q.filter(AuditEvent.created_at < until)
+    if before_id:
+        cursor = select(AuditEvent.created_at).where(AuditEvent.id == before_id).scalar_subquery()
+        q = q.filter(or_(AuditEvent.created_at < cursor,
+                         and_(AuditEvent.created_at == cursor, AuditEvent.id < before_id)))
+    if after_id:
+        cursor = select(AuditEvent.created_at).where(AuditEvent.id == after_id).scalar_subquery()
+        q = q.filter(or_(AuditEvent.created_at > cursor,
+                         and_(AuditEvent.created_at == cursor, AuditEvent.id > after_id)))
+    limit = max(1, min(int(limit), audit_query_max()))
+    if oldest_first or after_id:
+        order = (AuditEvent.created_at, AuditEvent.id)
+    else:
+        order = (AuditEvent.created_at.desc(), AuditEvent.id.desc())
+    return [e.to_dict() for e in q.order_by(*order).limit(limit)]
+
+
+def audit_query_max() -> int:
+    """Most events one query_events() call returns."""
+    return current_app.config.get('AUDIT_QUERY_MAX', 1000)
@@ -0,0 +1,206 @@
+# app/backup.py
+"""
+Streaming backup / restore.
+
+A backup is a gzip-compressed NDJSON stream, one record per line:
+
+    {"type": "header", "format": "itbity-backup", "version": 1, "created_at": ...}
+    {"type": "row", "table": "users", "data": {...}}          # users, reseller_quotas,
+    ...                                                        # user_limits, user_ip_sessions
+    {"type": "linux_user", "username": ..., "shadow": ..., "sshd": ...}
+    {"type": "end", "counts": {...}}
+
+Rows are read with server-side cursors and compressed chunk by chunk, so
+memory does not grow with the size of the session table. Restore reads the
+stream line by line, inserts in batches and only commits once the `end`
+record has been seen (a truncated upload changes nothing), then re-creates
+missing Linux users in bulk, restores their password hashes with one
+`chpasswd -e` and their sshd `Match User` blocks (only blocks made of the
+directives the panel writes, see linux.parse_sshd_match_block), and
+re-installs every nft quota from the restored limits.
+
+nft traffic counters are not backed up: they are kernel state of the source
+host keyed by UID. Usage itself is restored with user_limits
+(traffic_used_bytes); the traffic daemon counts the target host's counters
+from their own checkpoints. `nft_counter` records in older backups are
+ignored.
+"""
+import gzip
+import io
+import json
+from datetime import datetime
+from sqlalchemy import bindparam, delete, insert, select, update, DateTime
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import User, ResellerQuota, UserLimit, UserIPSession
+from app.streaming import ROW_BATCH, gzip_stream, ndjson, stream_rows
+
+FORMAT = 'itbity-backup'
+VERSION = 1
+
+# dependency order: parents first
+TABLES = [User, ResellerQuota, UserLimit, UserIPSession]
+_MODELS = {m.__tablename__: m for m in TABLES}
+
+
+class BackupError(Exception):
+    pass
+
+
+def backup_filename() -> str:
+    return f"itbity-backup-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.ndjson.gz"
+
+
+def _records():
+    from app.user_mgmt import linux
+
+    yield {'type': 'header', 'format': FORMAT, 'version': VERSION,
+           'created_at': datetime.utcnow(), 'tables': [m.__tablename__ for m in TABLES]}
+
+    counts = {}
+    for model in TABLES:
+        table = model.__table__
+        counts[table.name] = 0
+        for row in stream_rows(select(table).order_by(*table.primary_key.columns)):
+            counts[table.name] += 1
+            yield {'type': 'row', 'table': table.name, 'data': row}
+
+    # Linux side of the managed (non-admin) users
+    usernames = db.session.execute(select(User.username).where(User.role == 'user')).scalars().all()
+    hashes = linux.get_password_hashes(usernames)
+    blocks = linux.get_sshd_match_blocks(usernames)
+    for username in usernames:
+        if username in hashes or username in blocks:
+            yield {'type': 'linux_user', 'username': username,
+                   'shadow': hashes.get(username), 'sshd': blocks.get(username)}
+    counts['linux_users'] = len(hashes)
+
+    yield {'type': 'end', 'counts': counts}
+
+
+def generate_backup():
+    """gzip-compressed NDJSON chunks, for a streaming response."""
+    return gzip_stream(ndjson(record) for record in _records())
+
+
+def _decode_row(model, data: dict) -> dict:
+    row = {}
+    for column in model.__table__.columns:
+        if column.name not in data:
+            continue
+        value = data[column.name]
+        if value is not None and isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        row[column.name] = value
+    return row
+
+
+def _iter_records(fileobj):
+    with gzip.GzipFile(fileobj=fileobj, mode='rb') as gz:
+        for line in io.TextIOWrapper(gz, encoding='utf-8'):
+            if line.strip():
+                yield json.loads(line)
+
+
+def _load(fileobj) -> tuple[dict, dict, dict]:
+    """
+    Replace the DB tables with the backup's rows (not committed).
+    Returns (counts, shadow_hashes, sshd_blocks).
+    """
+    records = _iter_records(fileobj)
+    try:
+        header = next(records)
+    except (StopIteration, OSError, ValueError):
+        raise BackupError('Not a backup file')
+    if header.get('format') != FORMAT or header.get('version') != VERSION:
+        raise BackupError('Unsupported backup format')
+
+    for model in reversed(TABLES):
+        db.session.execute(delete(model))
+
+    counts = {name: 0 for name in _MODELS}
+    hashes, blocks = {}, {}
+    batch, batch_model = [], None
+    # users.owner_id points into users itself: users are inserted unowned and
+    # the owners set once every user exists
+    owners = []
+
+    def flush():
+        if batch:
+            db.session.execute(insert(batch_model), batch)
+            batch.clear()
+
+    def set_owners():
+        users = User.__table__
+        if owners:
+            db.session.execute(
+                update(users).where(users.c.id == bindparam('b_id'))
+                .values(owner_id=bindparam('b_owner')),
+                owners)
+
+    for record in records:
+        kind = record.get('type')
+        if kind == 'row':
+            model = _MODELS.get(record.get('table'))
+            if model is None:
+                continue
+            if model is not batch_model or len(batch) >= ROW_BATCH:
+                flush()
+                batch_model = model
+            row = _decode_row(model, record['data'])
+            if model is User and row.get('owner_id') is not None:
+                owners.append({'b_id': row['id'], 'b_owner': row.pop('owner_id')})
+            batch.append(row)
+            counts[model.__tablename__] += 1
+        elif kind == 'linux_user':
+            if record.get('shadow'):
+                hashes[record['username']] = record['shadow']
+            if record.get('sshd'):
+                blocks[record['username']] = record['sshd']
+        elif kind == 'end':
+            flush()
+            set_owners()
+            return counts, hashes, blocks
+    raise BackupError('Backup file is truncated')
+
+
+def restore_backup(fileobj, reprovision: bool = True) -> dict:
+    from app.user_mgmt.executor import run_per_user, succeeded, failures
+    from app.user_mgmt.services.resellers import recount
+    from app.user_mgmt.linux import (check_linux_user_exists, create_linux_user, set_password_hashes,
+                                     set_sshd_match_blocks)
+    from app.user_mgmt.services.quotas import sync_all_quotas
+    from app.user_mgmt.utils import generate_random_password
+
+    try:
+        counts, hashes, blocks = _load(fileobj)
+        recount()
+        db.session.commit()
+    except (OSError, EOFError, ValueError) as e:
+        db.session.rollback()
+        raise BackupError(f'Corrupt backup file: {e}')
+    except IntegrityError as e:
+        db.session.rollback()
+        raise BackupError(f'Inconsistent backup file: {e.orig}')
+    except Exception:
+        db.session.rollback()
+        raise
+
+    result = {'success': True, 'message': 'Backup restored', 'counts': counts}
+    if not reprovision:
+        return result
+
+    usernames = set(db.session.execute(select(User.username).where(User.role == 'user')).scalars())
+    missing = [u for u in usernames if not check_linux_user_exists(u)]
+    created = run_per_user((u, create_linux_user, u, generate_random_password()) for u in missing)
+    ok, msg = set_password_hashes({u: h for u, h in hashes.items() if u in usernames})
+    # after create_linux_user, which appends the default block
+    sshd_ok, sshd_msg = set_sshd_match_blocks({u: b for u, b in blocks.items() if u in usernames})
+    result['linux'] = {
+        'created': succeeded(created),
+        'errors': failures(created),
+        'passwords': msg if ok else f'failed: {msg}',
+        'sshd': sshd_msg if sshd_ok else f'failed: {sshd_msg}',
+    }
+    result['quotas'] = sync_all_quotas()
+    return result
@@ -0,0 +1,147 @@
+# app/billing.py
+"""
+Monthly billing cycles.
+
+Every user's usage is reset on its `billing_cycle_day` (or BILLING_CYCLE_DAY
+from config; 0 disables automatic resets). Days past the end of a short
+month fall on its last day. `flask billing rollover` (run hourly by the
+itbity-billing.timer unit) closes every cycle that has ended:
+
+- the cycle's usage is stored in `usage_periods`,
+- exactly that many bytes are subtracted from `traffic_used_bytes` (bytes
+  the traffic daemon adds meanwhile are kept) and from the owning
+  reseller's total,
+- the nft quotas of the reset users are re-installed in one batch.
+"""
+import calendar
+from datetime import datetime
+import click
+from flask import current_app
+from sqlalchemy import bindparam, case, inspect, insert, select, text, update
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models import GB, User, UserLimit, UsagePeriod, ResellerQuota
+
+
+def cycle_start(now: datetime, day: int) -> datetime:
+    """Start (00:00 UTC) of the billing cycle that contains `now`."""
+    def anchor(year, month):
+        return datetime(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+    start = anchor(now.year, now.month)
+    if start > now:
+        year, month = (now.year, now.month - 1) if now.month > 1 else (now.year - 1, 12)
+        start = anchor(year, month)
+    return start
+
+
+def rollover(now: datetime = None) -> dict:
+    from app.audit import audit
+    from app.nodes.client import propagate
+    from app.user_mgmt.services.quotas import sync_user_quotas
+
+    now = now or datetime.utcnow()
+    default_day = current_app.config.get('BILLING_CYCLE_DAY', 0)
+
+    rows = db.session.execute(
+        select(UserLimit.id, UserLimit.user_id, UserLimit.billing_cycle_day, UserLimit.cycle_started_at,
+               UserLimit.traffic_used_bytes, UserLimit.traffic_limit_gb, User.owner_id)
+        .join(User, User.id == UserLimit.user_id)
+        .where(User.role == 'user')
+    ).all()
+
+    anchors, due = [], []
+    for r in rows:
+        day = r.billing_cycle_day if r.billing_cycle_day is not None else default_day
+        if not day:
+            continue
+        start = cycle_start(now, day)
+        if r.cycle_started_at is None:
+            # first cycle of this user: anchor it, nothing to close yet
+            anchors.append({'lid': r.id, 'start': start})
+        elif r.cycle_started_at < start:
+            due.append((r, start))
+
+    if anchors:
+        db.session.execute(
+            update(UserLimit.__table__).where(UserLimit.__table__.c.id == bindparam('lid'))
+            .values(cycle_started_at=bindparam('start')),
+            anchors,
+        )
+    if due:
+        db.session.execute(insert(UsagePeriod), [
+            {'user_id': r.user_id, 'started_at': r.cycle_started_at, 'ended_at': start,
+             'bytes_used': r.traffic_used_bytes, 'traffic_limit_gb': r.traffic_limit_gb}
+            for r, start in due
+        ])
+        table = UserLimit.__table__
+        db.session.execute(
+            update(table).where(table.c.id == bindparam('lid'))
+            .values(traffic_used_bytes=case(
+                        (table.c.traffic_used_bytes > bindparam('used'), table.c.traffic_used_bytes - bindparam('used')),
+                        else_=0),
+                    cycle_started_at=bindparam('start')),
+            [{'lid': r.id, 'used': r.traffic_used_bytes, 'start': start} for r, start in due],
+        )
+        per_owner = {}
+        for r, _ in due:
+            if r.owner_id:
+                per_owner[r.owner_id] = per_owner.get(r.owner_id, 0) + r.traffic_used_bytes
+        if per_owner:
+            quotas = ResellerQuota.__table__
+            db.session.execute(
+                update(quotas).where(quotas.c.reseller_id == bindparam('rid'))
+                .values(traffic_used_bytes=case(
+                            (quotas.c.traffic_used_bytes > bindparam('used'),
+                             quotas.c.traffic_used_bytes - bindparam('used')),
+                            else_=0)),
+                [{'rid': rid, 'used': used} for rid, used in per_owner.items()],
+            )
+    db.session.commit()
+
+    result = {'success': True, 'reset': len(due), 'anchored': len(anchors)}
+    if due:
+        users = (User.query.options(joinedload(User.limits))
+                 .filter(User.id.in_([r.user_id for r, _ in due])).all())
+        result['quotas'] = sync_user_quotas(users)
+        propagate([{'op': 'quota', 'username': u.username, 'remaining_bytes': u.limits.traffic_remaining_bytes}
+                   for u in users if u.limits])
+        audit('billing.rollover', reset=len(due),
+              bytes=sum(r.traffic_used_bytes for r, _ in due))
+    return result
+
+
+def convert_legacy_usage() -> bool:
+    """
+    Replace the old float `traffic_used_gb` column with `traffic_used_bytes`
+    (run before `flask db migrate`). Returns True if anything was converted.
+    """
+    inspector = inspect(db.engine)
+    if not inspector.has_table('user_limits'):
+        return False
+    columns = {c['name'] for c in inspector.get_columns('user_limits')}
+    if 'traffic_used_gb' not in columns:
+        return False
+    with db.engine.begin() as conn:
+        if 'traffic_used_bytes' not in columns:
+            conn.execute(text('ALTER TABLE user_limits ADD COLUMN traffic_used_bytes BIGINT NOT NULL DEFAULT 0'))
+        conn.execute(text(f'UPDATE user_limits SET traffic_used_bytes = ROUND(traffic_used_gb * {GB})'))
+        conn.execute(text('ALTER TABLE user_limits DROP COLUMN traffic_used_gb'))
+    return True
+
+
+def init_billing(app):
+    @app.cli.group('billing')
+    def billing_cli():
+        """Billing cycle maintenance."""
+
+    @billing_cli.command('rollover')
+    def rollover_command():
+        """Close ended billing cycles and reset their usage."""
+        result = rollover()
+        click.echo(f"Reset {result['reset']} users, anchored {result['anchored']}")
+
+    @billing_cli.command('convert-legacy-usage')
+    def convert_command():
+        """Move traffic_used_gb (float) into traffic_used_bytes."""
+        click.echo('Converted legacy usage' if convert_legacy_usage() else 'Nothing to convert')
@@ -1,9 +1,14 @@
 # app/models.py
 
+import json
 from app import db
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.hybrid import hybrid_property
+
+GB = 1024 * 1024 * 1024
 
 
 # ==============================
@@ -19,6 +24,11 @@ class User(UserMixin, db.Model):
     is_active = db.Column(db.Boolean, default=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     last_login = db.Column(db.DateTime)
+    # changed_since queries of the usage API; bumped only when a field the API
+    # reports changes (see _stamp_user_updated_at), not by logins
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    # reseller that owns this account (None = owned by the admins)
+    owner_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), index=True)
 
     # Relationships
     limits = db.relationship(
@@ -35,6 +45,14 @@ class User(UserMixin, db.Model):
         cascade='all, delete-orphan'
     )
 
+    # only for role == 'reseller'
+    reseller_quota = db.relationship(
+        'ResellerQuota',
+        backref='reseller',
+        uselist=False,
+        cascade='all, delete-orphan'
+    )
+
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
     
@@ -49,6 +67,17 @@ class User(UserMixin, db.Model):
         return f'<User {self.username}>'
 
 
+# User fields reported by the usage API (set-based UPDATEs stamp updated_at themselves)
+USER_SYNC_FIELDS = ('username', 'role', 'is_active', 'owner_id')
+
+
+@event.listens_for(User, 'before_update')
+def _stamp_user_updated_at(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in USER_SYNC_FIELDS):
+        target.updated_at = datetime.utcnow()
+
+
 # ==============================
 # User Limits
 # ==============================
@@ -64,14 +93,39 @@ class UserLimit(db.Model):
     )
     
     traffic_limit_gb = db.Column(db.Integer, default=50, nullable=False)
-    traffic_used_gb = db.Column(db.Float, default=0.0, nullable=False)
+    # exact byte count; GB values are derived at read time only
+    traffic_used_bytes = db.Column(db.BigInteger, default=0, nullable=False)
     max_connections = db.Column(db.Integer, default=2, nullable=False)
     download_speed_mbps = db.Column(db.Integer, default=0, nullable=False)
     expires_at = db.Column(db.DateTime)
 
+    # monthly billing cycle: usage is reset on this day of month
+    # (None = BILLING_CYCLE_DAY from config, 0 = never reset automatically)
+    billing_cycle_day = db.Column(db.SmallInteger)
+    cycle_started_at = db.Column(db.DateTime)
+
+    # also bumped by the traffic daemon with every usage update
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    @hybrid_property
+    def traffic_used_gb(self):
+        return (self.traffic_used_bytes or 0) / GB
+
+    @traffic_used_gb.expression
+    def traffic_used_gb(cls):
+        return cls.traffic_used_bytes / float(GB)
+
+    @property
+    def traffic_limit_bytes(self):
+        return (self.traffic_limit_gb or 0) * GB
+
+    @property
+    def traffic_remaining_bytes(self):
+        return max(0, self.traffic_limit_bytes - (self.traffic_used_bytes or 0))
+
     @property
     def traffic_remaining_gb(self):
-        return max(0, self.traffic_limit_gb - self.traffic_used_gb)
+        return self.traffic_remaining_bytes / GB
     
     @property
     def is_expired(self):
@@ -81,6 +135,47 @@ class UserLimit(db.Model):
         return f'<UserLimit user_id={self.user_id}>'
 
 
+# ==============================
+# Reseller Quotas
+# ==============================
+class ResellerQuota(db.Model):
+    """
+    Budget of a reseller and running totals over the accounts it owns. The
+    totals are kept up to date incrementally (create/update/delete, traffic
+    daemon, billing rollover), never summed over the accounts on request.
+    0 in a limit column means unlimited.
+    """
+    __tablename__ = 'reseller_quotas'
+
+    reseller_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+
+    # limits
+    max_users = db.Column(db.Integer, default=0, nullable=False)
+    traffic_quota_gb = db.Column(db.Integer, default=0, nullable=False)
+    connection_quota = db.Column(db.Integer, default=0, nullable=False)
+
+    # running totals over the owned accounts
+    users_count = db.Column(db.Integer, default=0, nullable=False)
+    traffic_allocated_gb = db.Column(db.Integer, default=0, nullable=False)
+    connections_allocated = db.Column(db.Integer, default=0, nullable=False)
+    traffic_used_bytes = db.Column(db.BigInteger, default=0, nullable=False)
+
+    def to_dict(self):
+        return {
+            'max_users': self.max_users,
+            'traffic_quota_gb': self.traffic_quota_gb,
+            'connection_quota': self.connection_quota,
+            'users_count': self.users_count,
+            'traffic_allocated_gb': self.traffic_allocated_gb,
+            'connections_allocated': self.connections_allocated,
+            'traffic_used_bytes': self.traffic_used_bytes,
+            'traffic_used_gb': round((self.traffic_used_bytes or 0) / GB, 3),
+        }
+
+    def __repr__(self):
+        return f'<ResellerQuota reseller_id={self.reseller_id} users={self.users_count}>'
+
+
 # ==============================
 # User IP Sessions (Traffic)
 # ==============================
@@ -98,6 +193,8 @@ class UserIPSession(db.Model):
     ip_address = db.Column(db.String(45), nullable=False)
     session_id = db.Column(db.String(128), nullable=False)
     nft_rule_name = db.Column(db.String(128), nullable=False)
+    # PID of the sshd [priv] process that opened the session (PAM open/close run in it)
+    sshd_pid = db.Column(db.Integer, index=True)
 
     # traffic counters
     bytes_in = db.Column(db.BigInteger, default=0, nullable=False)
@@ -106,9 +203,193 @@ class UserIPSession(db.Model):
     created_at = db.Column(
         db.DateTime,
         default=datetime.utcnow,
-        nullable=False
+        nullable=False,
+        index=True
     )
-    closed_at = db.Column(db.DateTime)
+    closed_at = db.Column(db.DateTime, index=True)
 
     def __repr__(self):
         return f'<UserIPSession user_id={self.user_id} ip={self.ip_address}>'
+
+
+# ==============================
+# Managed Nodes (node agents)
+# ==============================
+class Node(db.Model):
+    __tablename__ = 'nodes'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    url = db.Column(db.String(255), nullable=False)
+    # shared HMAC secret, used by both sides to sign requests
+    token = db.Column(db.String(128), nullable=False)
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # latest telemetry snapshot pushed (or pulled) from the agent, JSON
+    last_snapshot = db.Column(db.Text)
+    last_seen_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<Node {self.name}>'
+
+
+class NodeUsageCheckpoint(db.Model):
+    """Last traffic counter seen per node and user; usage is counted from the difference."""
+    __tablename__ = 'node_usage_checkpoints'
+
+    node_id = db.Column(db.Integer, db.ForeignKey('nodes.id', ondelete='CASCADE'), primary_key=True)
+    username = db.Column(db.String(80), primary_key=True)
+    last_bytes = db.Column(db.BigInteger, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<NodeUsageCheckpoint node_id={self.node_id} {self.username}={self.last_bytes}>'
+
+
+# ==============================
+# API Tokens (external integrations)
+# ==============================
+class ApiToken(db.Model):
+    __tablename__ = 'api_tokens'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    # sha256 of the token; the token itself is shown once at creation
+    token_hash = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    prefix = db.Column(db.String(12), nullable=False)
+    is_active = db.Column(db.Boolean, default=True, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'prefix': self.prefix,
+            'is_active': self.is_active,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'last_used_at': self.last_used_at.strftime('%Y-%m-%d %H:%M:%S') if self.last_used_at else None,
+        }
+
+    def __repr__(self):
+        return f'<ApiToken {self.name}>'
+
+
+# ==============================
+# Audit Journal (append-only)
+# ==============================
+class AuditEvent(db.Model):
+    __tablename__ = 'audit_events'
+    __table_args__ = (
+        db.Index('ix_audit_events_target_created', 'target_user_id', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    actor_id = db.Column(db.Integer, index=True)          # None = system / CLI
+    actor = db.Column(db.String(64))
+    action = db.Column(db.String(64), nullable=False, index=True)
+    # no FK: events must outlive the user they describe
+    target_user_id = db.Column(db.Integer)
+    target = db.Column(db.String(64))
+    details = db.Column(db.Text)                          # JSON
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'actor': self.actor,
+            'action': self.action,
+            'target_user_id': self.target_user_id,
+            'target': self.target,
+            'details': json.loads(self.details) if self.details else {},
+        }
+
+    def __repr__(self):
+        return f'<AuditEvent {self.action} {self.target}>'
+
+
+# ==============================
+# Traffic Accounting
+# ==============================
+class TrafficCheckpoint(db.Model):
+    """Last counter value the traffic daemon accounted for, per nft rule."""
+    __tablename__ = 'traffic_checkpoints'
+
+    rule_name = db.Column(db.String(128), primary_key=True)
+    # nft rule handle: a different handle means the rule was re-created
+    rule_handle = db.Column(db.BigInteger)
+    last_bytes = db.Column(db.BigInteger, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<TrafficCheckpoint {self.rule_name}={self.last_bytes}>'
+
+
+class TrafficDaily(db.Model):
+    """Bytes accounted per UTC day, incremented by the traffic daemon."""
+    __tablename__ = 'traffic_daily'
+
+    day = db.Column(db.Date, primary_key=True)
+    bytes = db.Column(db.BigInteger, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<TrafficDaily {self.day}={self.bytes}>'
+
+
+class UserTrafficDaily(db.Model):
+    """Bytes accounted per user and UTC day (the day the traffic happened)."""
+    __tablename__ = 'user_traffic_daily'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True, index=True)
+    bytes = db.Column(db.BigInteger, default=0, nullable=False)
+
+    def __repr__(self):
+        return f'<UserTrafficDaily user_id={self.user_id} {self.day}={self.bytes}>'
+
+
+class ReapedSession(db.Model):
+    """An idle SSH session terminated by the traffic daemon's reaper."""
+    __tablename__ = 'reaped_sessions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    # no FK: the record outlives the user
+    user_id = db.Column(db.Integer, index=True)
+    username = db.Column(db.String(80), nullable=False)
+    sshd_pid = db.Column(db.Integer)
+    peer = db.Column(db.String(64))
+    idle_seconds = db.Column(db.Integer, default=0, nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'user_id': self.user_id,
+            'username': self.username,
+            'sshd_pid': self.sshd_pid,
+            'peer': self.peer,
+            'idle_seconds': self.idle_seconds,
+        }
+
+    def __repr__(self):
+        return f'<ReapedSession {self.username} pid={self.sshd_pid}>'
+
+
+class UsagePeriod(db.Model):
+    """Usage of one closed billing cycle (written by the monthly rollover)."""
+    __tablename__ = 'usage_periods'
+    __table_args__ = (
+        db.Index('ix_usage_periods_user_started', 'user_id', 'started_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    started_at = db.Column(db.DateTime)
+    ended_at = db.Column(db.DateTime, nullable=False)
+    bytes_used = db.Column(db.BigInteger, default=0, nullable=False)
+    traffic_limit_gb = db.Column(db.Integer)
+
+    def __repr__(self):
+        return f'<UsagePeriod user_id={self.user_id} {self.ended_at}>'
@@ -0,0 +1,7 @@
+# app/nodes/__init__.py
+"""
+Multi-node management: one panel provisions users on many SSH servers through
+a small agent running on each of them (agent.py), over a signed JSON protocol
+(protocol.py). client.py fans requests out to the agents in parallel and
+aggregates their telemetry.
+"""
@@ -0,0 +1,142 @@
+# app/nodes/agent.py
+"""
+Node agent: runs on every SSH server managed by a central panel.
+
+    python -m app.nodes.agent --listen 0.0.0.0:7070 --name node-1 --token SECRET \
+        [--panel-url https://panel.example.com/<PANEL_PATH>] [--push-interval 15]
+
+Endpoints (all requests must be signed, see protocol.py):
+    GET  /v1/health      -> {"ok": true, "node": ..., "backend": ...}
+    GET  /v1/telemetry   -> telemetry snapshot
+    POST /v1/provision   -> apply a provisioning batch
+
+With --panel-url the agent also pushes a telemetry snapshot to the panel
+every --push-interval seconds. --fake swaps the host for an in-memory
+FakeSystem so several stand-in agents can run on one machine.
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+import urllib.request
+from urllib.parse import urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from app.user_mgmt.backends import BACKENDS
+from .protocol import NonceCache, apply_ops, signed_headers, verify
+
+MAX_BODY = 16 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class NodeAgent:
+    def __init__(self, name: str, token: str, backend):
+        self.name = name
+        self.token = token
+        self.backend = backend
+        # replay protection: each nonce once, nothing signed before this start
+        self.nonces = NonceCache()
+        self.started_at = time.time()
+
+    def snapshot(self) -> dict:
+        return {'node': self.name, 'taken_at': int(time.time()), 'users': self.backend.snapshot()}
+
+    def handle(self, method: str, path: str, body: bytes):
+        """Return (status, payload) for one request."""
+        if method == 'GET' and path == '/v1/health':
+            return 200, {'ok': True, 'node': self.name, 'backend': self.backend.name}
+        if method == 'GET' and path == '/v1/telemetry':
+            return 200, self.snapshot()
+        if method == 'POST' and path == '/v1/provision':
+            try:
+                ops = json.loads(body or b'{}').get('ops', [])
+            except ValueError:
+                return 400, {'ok': False, 'message': 'Invalid JSON'}
+            return 200, {'ok': True, 'node': self.name, 'results': apply_ops(self.backend, ops)}
+        return 404, {'ok': False, 'message': 'Not found'}
+
+    def push_loop(self, panel_url: str, interval: float, stop: threading.Event):
+        path_url = panel_url.rstrip('/') + '/nodes/api/telemetry'
+        path = urlparse(path_url).path
+        while not stop.wait(interval):
+            try:
+                body = json.dumps(self.snapshot()).encode()
+                req = urllib.request.Request(
+                    path_url, data=body, method='POST',
+                    headers=signed_headers(self.token, 'POST', path, body, node_name=self.name),
+                )
+                urllib.request.urlopen(req, timeout=10).close()
+            except Exception as e:
+                logger.warning('[agent %s] telemetry push failed: %s', self.name, e)
+
+
+def make_handler(agent: NodeAgent):
+    class Handler(BaseHTTPRequestHandler):
+        def _dispatch(self, method):
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > MAX_BODY:
+                return self._reply(413, {'ok': False, 'message': 'Request too large'})
+            body = self.rfile.read(length) if length else b''
+            if not verify(agent.token, method, self.path, body, self.headers,
+                          nonces=agent.nonces, not_before=agent.started_at):
+                return self._reply(401, {'ok': False, 'message': 'Bad signature'})
+            status, payload = agent.handle(method, self.path, body)
+            self._reply(status, payload)
+
+        def _reply(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._dispatch('GET')
+
+        def do_POST(self):
+            self._dispatch('POST')
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def serve_in_thread(agent: NodeAgent, host: str = '127.0.0.1', port: int = 0) -> ThreadingHTTPServer:
+    """Start an agent on a background thread; port 0 picks a free port (server.server_port)."""
+    server = ThreadingHTTPServer((host, port), make_handler(agent))
+    threading.Thread(target=server.serve_forever, daemon=True, name=f'agent-{agent.name}').start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IT Bity SSH Panel node agent')
+    parser.add_argument('--listen', default='0.0.0.0:7070')
+    parser.add_argument('--name', required=True)
+    parser.add_argument('--token', required=True)
+    parser.add_argument('--fake', action='store_true', help='in-memory host (testing)')
+    parser.add_argument('--panel-url')
+    parser.add_argument('--push-interval', type=float, default=15)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    agent = NodeAgent(args.name, args.token, BACKENDS['fake' if args.fake else 'linux']())
+    host, port = args.listen.rsplit(':', 1)
+
+    stop = threading.Event()
+    if args.panel_url:
+        threading.Thread(target=agent.push_loop, args=(args.panel_url, args.push_interval, stop),
+                         daemon=True).start()
+
+    server = ThreadingHTTPServer((host, int(port)), make_handler(agent))
+    logger.info('[agent %s] listening on %s (%s backend)', args.name, args.listen, agent.backend.name)
+    try:
+        server.serve_forever()
+    finally:
+        stop.set()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+# app/nodes/client.py
+"""
+Panel side of the node protocol: parallel fan-out and aggregation.
+
+A user can log in on the panel host and on every node, so the remaining
+traffic is split between them: each host's nft quota gets
+remaining / host_count() bytes. What nodes use comes back with their
+telemetry (per-user counters) and is added to the user's usage and to the
+daily tables (traffic_daily, user_traffic_daily), so the next quota sync
+hands out shares of what is really left and the charts include node traffic.
+The node row and its checkpoints are locked while a snapshot is applied: a
+pushed and a pulled snapshot can never count the same delta twice.
+"""
+import json
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+from flask import current_app
+from app import db
+from app.models import (Node, NodeUsageCheckpoint, ResellerQuota, TrafficDaily, User, UserLimit,
+                        UserTrafficDaily)
+from .protocol import signed_headers
+
+
+def _request(node: Node, method: str, path: str, payload=None, timeout: float = 5) -> dict:
+    url = node.url.rstrip('/') + path
+    body = json.dumps(payload).encode() if payload is not None else b''
+    req = urllib.request.Request(
+        url, data=body if method != 'GET' else None, method=method,
+        headers=signed_headers(node.token, method, urlparse(url).path, body),
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return {'ok': True, 'data': json.loads(resp.read() or b'{}')}
+    except urllib.error.HTTPError as e:
+        return {'ok': False, 'error': f'HTTP {e.code}'}
+    except Exception as e:
+        return {'ok': False, 'error': str(e)}
+
+
+def fan_out(nodes, method: str, path: str, payload=None) -> dict[str, dict]:
+    """Send the same request to every node in parallel; {node_name: {'ok', 'data'|'error'}}."""
+    nodes = list(nodes)
+    if not nodes:
+        return {}
+    timeout = current_app.config.get('NODE_REQUEST_TIMEOUT', 5)
+    workers = min(len(nodes), current_app.config.get('NODES_CONCURRENCY', 16))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='node-fanout') as pool:
+        futures = {n.name: pool.submit(_request, n, method, path, payload, timeout) for n in nodes}
+        return {name: f.result() for name, f in futures.items()}
+
+
+def active_nodes() -> list[Node]:
+    return Node.query.filter_by(is_active=True).order_by(Node.name).all()
+
+
+def host_count() -> int:
+    """Hosts a user can consume traffic on: the panel host plus every active node."""
+    return 1 + Node.query.filter_by(is_active=True).count()
+
+
+def quota_share(remaining: int, hosts: int) -> int:
+    return max(0, int(remaining)) // max(1, hosts)
+
+
+def propagate(ops: list[dict]):
+    """
+    Push a provisioning batch to every active node. Returns None when the
+    panel manages no nodes, else {node_name: {'ok', 'failed': [...]|'error'}}.
+    `quota` ops carry the user's whole remaining bytes; each node gets its share.
+    """
+    nodes = active_nodes()
+    if not nodes or not ops:
+        return None
+    hosts = 1 + len(nodes)
+    ops = [dict(op, remaining_bytes=quota_share(op['remaining_bytes'], hosts)) if op.get('op') == 'quota' else op
+           for op in ops]
+    summary = {}
+    for name, res in fan_out(nodes, 'POST', '/v1/provision', {'ops': ops}).items():
+        if not res['ok']:
+            summary[name] = {'ok': False, 'error': res['error']}
+            continue
+        failed = [r for r in res['data'].get('results', []) if not r.get('ok')]
+        summary[name] = {'ok': not failed, 'failed': failed}
+    return summary
+
+
+def store_snapshot(node: Node, snapshot: dict) -> bool:
+    """
+    Keep the node's latest snapshot and add its traffic to the users' usage.
+    A snapshot not newer than the stored one (replay, reordered push) is
+    ignored; returns False then.
+    """
+    # re-read under a row lock: a concurrent push / pull of this node waits
+    node = Node.query.filter_by(id=node.id).with_for_update().populate_existing().one()
+    previous = json.loads(node.last_snapshot) if node.last_snapshot else {}
+    taken_at = snapshot.get('taken_at')
+    if not isinstance(taken_at, (int, float)) or taken_at <= previous.get('taken_at', 0):
+        return False
+    node.last_snapshot = json.dumps(snapshot)
+    node.last_seen_at = datetime.utcnow()
+    ingest_usage(node, snapshot.get('users') or {}, day=datetime.utcfromtimestamp(taken_at).date())
+    return True
+
+
+def ingest_usage(node: Node, users: dict, day=None) -> int:
+    """
+    Add what each user's counter on `node` moved since the last snapshot to
+    user_limits.traffic_used_bytes (and the owning reseller's total) and to
+    `day`'s rows of the daily tables. A counter below its checkpoint was
+    reset (agent host reboot): all of it is new. A user's first snapshot
+    from a node only sets the baseline.
+    """
+    checkpoints = {c.username: c for c in
+                   NodeUsageCheckpoint.query.filter_by(node_id=node.id).with_for_update()}
+    deltas = {}
+    for username, u in users.items():
+        try:
+            current = int(u.get('traffic_bytes', 0))
+        except (TypeError, ValueError):
+            continue
+        checkpoint = checkpoints.get(username)
+        if checkpoint is None:
+            db.session.add(NodeUsageCheckpoint(node_id=node.id, username=username, last_bytes=current))
+            continue
+        delta = current - checkpoint.last_bytes if current >= checkpoint.last_bytes else current
+        checkpoint.last_bytes = current
+        if delta > 0:
+            deltas[username] = delta
+    if not deltas:
+        return 0
+
+    rows = (db.session.query(UserLimit, User.username, User.owner_id).join(User, User.id == UserLimit.user_id)
+            .filter(User.username.in_(list(deltas))).all())
+    # increments in SQL (bytes = bytes + delta): the traffic daemon updates the same rows
+    per_owner, per_user = {}, {}
+    for limits, username, owner_id in rows:
+        delta = deltas[username]
+        limits.traffic_used_bytes = UserLimit.traffic_used_bytes + delta
+        per_user[limits.user_id] = delta
+        if owner_id:
+            per_owner[owner_id] = per_owner.get(owner_id, 0) + delta
+    for quota in ResellerQuota.query.filter(ResellerQuota.reseller_id.in_(list(per_owner))) if per_owner else ():
+        quota.traffic_used_bytes = ResellerQuota.traffic_used_bytes + per_owner[quota.reseller_id]
+    _add_daily(day or datetime.utcnow().date(), per_user)
+    return sum(deltas.values())
+
+
+def _add_daily(day, per_user: dict[int, int]) -> None:
+    """Credit node traffic to `day` in user_traffic_daily and traffic_daily, like the daemon does."""
+    if not per_user:
+        return
+    existing = {r.user_id: r for r in UserTrafficDaily.query.filter(
+        UserTrafficDaily.day == day, UserTrafficDaily.user_id.in_(list(per_user)))}
+    for user_id, delta in per_user.items():
+        if user_id in existing:
+            existing[user_id].bytes = UserTrafficDaily.bytes + delta
+        else:
+            db.session.add(UserTrafficDaily(user_id=user_id, day=day, bytes=delta))
+    total = db.session.get(TrafficDaily, day)
+    if total is None:
+        db.session.add(TrafficDaily(day=day, bytes=sum(per_user.values())))
+    else:
+        total.bytes = TrafficDaily.bytes + sum(per_user.values())
+
+
+def collect_snapshots() -> dict[str, dict]:
+    """
+    Latest snapshot of every active node: pushed snapshots younger than
+    NODE_SNAPSHOT_MAX_AGE are used as is, the rest are pulled in parallel.
+    """
+    nodes = active_nodes()
+    max_age = timedelta(seconds=current_app.config.get('NODE_SNAPSHOT_MAX_AGE', 60))
+    now = datetime.utcnow()
+
+    snapshots, stale = {}, []
+    for node in nodes:
+        if node.last_snapshot and node.last_seen_at and now - node.last_seen_at <= max_age:
+            snapshots[node.name] = json.loads(node.last_snapshot)
+        else:
+            stale.append(node)
+
+    if stale:
+        by_name = {n.name: n for n in stale}
+        for name, res in fan_out(stale, 'GET', '/v1/telemetry').items():
+            if res['ok']:
+                snapshots[name] = res['data']
+                store_snapshot(by_name[name], res['data'])
+        db.session.commit()
+    return snapshots
+
+
+def aggregate_usage(snapshots: dict[str, dict]) -> dict[str, dict]:
+    """Per-username totals across nodes, with the per-node breakdown."""
+    usage: dict[str, dict] = {}
+    for node_name, snap in snapshots.items():
+        for username, u in (snap.get('users') or {}).items():
+            entry = usage.setdefault(username, {'connections': 0, 'traffic_bytes': 0, 'nodes': {}})
+            entry['connections'] += int(u.get('connections', 0))
+            entry['traffic_bytes'] += int(u.get('traffic_bytes', 0))
+            entry['nodes'][node_name] = u
+    return usage
@@ -0,0 +1,154 @@
+# app/nodes/protocol.py
+"""
+Panel <-> node agent protocol.
+
+Plain JSON over HTTP. Every request (both directions) carries an HMAC-SHA256
+signature of `timestamp, nonce, method, path, body` made with the node's
+shared token, so it cannot be re-targeted at another endpoint and is only
+valid for MAX_SKEW seconds. Within that window a replay is refused too:
+the agent remembers every nonce it accepted (NonceCache) and refuses
+requests signed before it started; the panel only accepts telemetry newer
+than the node's last snapshot (`taken_at`). Use HTTPS (or a private
+network) between panel and agents: provisioning batches contain passwords.
+
+Provisioning batch:
+    {"ops": [
+        {"op": "create",     "username": "...", "password": "..."},
+        {"op": "delete",     "username": "..."},
+        {"op": "rename",     "username": "...", "new_username": "..."},
+        {"op": "password",   "username": "...", "password": "..."},
+        {"op": "quota",      "username": "...", "remaining_bytes": 123},   # this host's share
+        {"op": "drop_quota", "username": "..."}
+    ]}
+Results come back in the same order: [{"op", "username", "ok", "message"}].
+
+Telemetry snapshot:
+    {"node": "...", "taken_at": 1700000000,
+     "users": {"<username>": {"connections": 1, "traffic_bytes": 123}}}
+"""
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+NODE_HEADER = 'X-Node-Name'
+TIMESTAMP_HEADER = 'X-Node-Timestamp'
+NONCE_HEADER = 'X-Node-Nonce'
+SIGNATURE_HEADER = 'X-Node-Signature'
+MAX_SKEW = 300
+
+USER_OPS = {'create', 'delete', 'rename', 'password'}
+QUOTA_OPS = {'quota', 'drop_quota'}
+
+
+class NonceCache:
+    """Nonces seen in the last 2 * MAX_SKEW seconds (a request older than that fails the time check)."""
+
+    def __init__(self, ttl: float = 2 * MAX_SKEW):
+        self.ttl = ttl
+        self._seen: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def add(self, nonce: str) -> bool:
+        """Remember `nonce`; False if it was already used."""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_prune:
+                self._seen = {n: exp for n, exp in self._seen.items() if exp > now}
+                self._next_prune = now + 30
+            if self._seen.get(nonce, 0) > now:
+                return False
+            self._seen[nonce] = now + self.ttl
+            return True
+
+
+def sign(token: str, method: str, path: str, body: bytes, timestamp: str, nonce: str = '') -> str:
+    message = b'\n'.join([timestamp.encode(), nonce.encode(), method.upper().encode(), path.encode(), body or b''])
+    return hmac.new(token.encode(), message, hashlib.sha256).hexdigest()
+
+
+def signed_headers(token: str, method: str, path: str, body: bytes, node_name: str = None) -> dict:
+    timestamp = str(int(time.time()))
+    nonce = secrets.token_hex(16)
+    headers = {
+        'Content-Type': 'application/json',
+        TIMESTAMP_HEADER: timestamp,
+        NONCE_HEADER: nonce,
+        SIGNATURE_HEADER: sign(token, method, path, body, timestamp, nonce),
+    }
+    if node_name:
+        headers[NODE_HEADER] = node_name
+    return headers
+
+
+def verify(token: str, method: str, path: str, body: bytes, headers,
+           nonces: NonceCache = None, not_before: float = None) -> bool:
+    """
+    Check the signature and age of a request. With `nonces` a nonce is only
+    accepted once; with `not_before` (epoch seconds) requests signed earlier
+    are refused (the nonce cache of a restarted process is empty).
+    """
+    timestamp = headers.get(TIMESTAMP_HEADER, '')
+    nonce = headers.get(NONCE_HEADER, '')
+    signature = headers.get(SIGNATURE_HEADER, '')
+    if not token or not timestamp.isdigit() or len(nonce) < 16 or abs(time.time() - int(timestamp)) > MAX_SKEW:
+        return False
+    if not_before is not None and int(timestamp) < int(not_before):
+        return False
+    if not hmac.compare_digest(sign(token, method, path, body, timestamp, nonce), signature):
+        return False
+    # only a correctly signed nonce is remembered
+    return nonces is None or nonces.add(nonce)
+
+
+def apply_ops(backend, ops: list[dict]) -> list[dict]:
+    """
+    Apply a provisioning batch on `backend`: user operations run through the
+    bounded per-user executor (parallel across users, ordered per user, one
+    sshd reload). Quota removals are applied as one batch before them (the
+    UID must still exist), new quotas as one batch after (it must exist).
+    """
+    from app.user_mgmt.executor import run_per_user
+
+    handlers = {
+        'create': lambda op: (backend.create_user, op['username'], op['password']),
+        'delete': lambda op: (backend.delete_user, op['username']),
+        'rename': lambda op: (backend.rename_user, op['username'], op['new_username']),
+        'password': lambda op: (backend.reset_password, op['username'], op['password']),
+    }
+
+    results: list = [None] * len(ops)
+    jobs, job_slots = [], {}
+    quotas, removed, quota_slots, drop_slots = {}, [], [], []
+    for i, op in enumerate(ops):
+        kind, username = op.get('op'), op.get('username')
+        try:
+            if kind in USER_OPS:
+                fn, *args = handlers[kind](op)
+                jobs.append((username, fn, *args))
+                job_slots.setdefault(username, []).append(i)
+            elif kind == 'quota':
+                quotas[username] = int(op['remaining_bytes'])
+                quota_slots.append(i)
+            elif kind == 'drop_quota':
+                removed.append(username)
+                drop_slots.append(i)
+            else:
+                results[i] = {'op': kind, 'username': username, 'ok': False, 'message': 'Unknown op'}
+        except (KeyError, TypeError, ValueError) as e:
+            results[i] = {'op': kind, 'username': username, 'ok': False, 'message': f'Bad op: {e}'}
+
+    def apply_quota_batch(slots, *args):
+        if slots:
+            ok, msg = backend.apply_quotas(*args)
+            for i in slots:
+                results[i] = {'op': ops[i]['op'], 'username': ops[i]['username'], 'ok': ok, 'message': msg}
+
+    apply_quota_batch(drop_slots, {}, removed)
+    for username, user_results in run_per_user(jobs).items():
+        for i, r in zip(job_slots[username], user_results):
+            results[i] = {'op': ops[i]['op'], 'username': username, **r}
+    apply_quota_batch(quota_slots, quotas)
+    return results
@@ -0,0 +1,113 @@
+# app/nodes/routes.py
+import json
+from flask import Blueprint, request, jsonify
+from flask_login import login_required
+from app import db
+from app.models import Node
+from app.user_mgmt.utils import admin_required
+from .client import fan_out, collect_snapshots, aggregate_usage, store_snapshot
+from .protocol import NODE_HEADER, verify
+
+nodes_bp = Blueprint('nodes', __name__)
+
+
+def _node_dict(node: Node) -> dict:
+    return {
+        'id': node.id,
+        'name': node.name,
+        'url': node.url,
+        'is_active': node.is_active,
+        'last_seen_at': node.last_seen_at.strftime('%Y-%m-%d %H:%M:%S') if node.last_seen_at else None,
+    }
+
+
+@nodes_bp.route('/api/nodes', methods=['GET'])
+@login_required
+@admin_required
+def list_nodes():
+    nodes = Node.query.order_by(Node.name).all()
+    return jsonify({'success': True, 'nodes': [_node_dict(n) for n in nodes]})
+
+
+@nodes_bp.route('/api/nodes', methods=['POST'])
+@login_required
+@admin_required
+def add_node():
+    data = request.get_json() or {}
+    name = (data.get('name') or '').strip()
+    url = (data.get('url') or '').strip()
+    token = data.get('token') or ''
+    if not name or not url.startswith(('http://', 'https://')) or len(token) < 16:
+        return jsonify({'success': False, 'message': 'name, http(s) url and a token of 16+ characters are required'}), 400
+    if Node.query.filter_by(name=name).first():
+        return jsonify({'success': False, 'message': 'Node already exists'}), 400
+
+    node = Node(name=name, url=url, token=token, is_active=bool(data.get('is_active', True)))
+    db.session.add(node)
+    db.session.commit()
+    return jsonify({'success': True, 'node': _node_dict(node)})
+
+
+@nodes_bp.route('/api/nodes/<int:node_id>', methods=['PUT'])
+@login_required
+@admin_required
+def update_node(node_id):
+    node = Node.query.get_or_404(node_id)
+    data = request.get_json() or {}
+    if 'url' in data:
+        node.url = data['url'].strip()
+    if data.get('token'):
+        node.token = data['token']
+    if 'is_active' in data:
+        node.is_active = bool(data['is_active'])
+    db.session.commit()
+    return jsonify({'success': True, 'node': _node_dict(node)})
+
+
+@nodes_bp.route('/api/nodes/<int:node_id>', methods=['DELETE'])
+@login_required
+@admin_required
+def delete_node(node_id):
+    node = Node.query.get_or_404(node_id)
+    db.session.delete(node)
+    db.session.commit()
+    return jsonify({'success': True, 'message': 'Node removed'})
+
+
+@nodes_bp.route('/api/nodes/health', methods=['GET'])
+@login_required
+@admin_required
+def nodes_health():
+    nodes = Node.query.filter_by(is_active=True).all()
+    results = fan_out(nodes, 'GET', '/v1/health')
+    return jsonify({'success': True, 'nodes': results})
+
+
+@nodes_bp.route('/api/nodes/usage', methods=['GET'])
+@login_required
+@admin_required
+def nodes_usage():
+    snapshots = collect_snapshots()
+    return jsonify({
+        'success': True,
+        'nodes': sorted(snapshots),
+        'users': aggregate_usage(snapshots),
+    })
+
+
+@nodes_bp.route('/api/telemetry', methods=['POST'])
+def push_telemetry():
+    """Telemetry pushed by agents; authenticated by the node's HMAC signature, not a session."""
+    node = Node.query.filter_by(name=request.headers.get(NODE_HEADER, ''), is_active=True).first()
+    body = request.get_data()
+    if not node or not verify(node.token, 'POST', request.path, body, request.headers):
+        return jsonify({'success': False, 'message': 'Bad signature'}), 401
+    try:
+        snapshot = json.loads(body)
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Invalid JSON'}), 400
+
+    if not store_snapshot(node, snapshot):
+        return jsonify({'success': False, 'message': 'Stale snapshot'}), 409
+    db.session.commit()
+    return jsonify({'success': True})
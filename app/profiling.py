@@ -0,0 +1,221 @@
+# app/profiling.py
+"""
+On-demand request profiling.
+
+An admin arms the profiler for the next N requests to one endpoint (settings
+page / `POST /settings/api/profiling`). The switch lives in a small JSON file
+under PROFILE_DIR so every gunicorn worker sees it; workers look at its
+mtime at most every PROFILE_CHECK_INTERVAL seconds, which is the only cost
+while the switch is off.
+
+Modes:
+    sample   - stdlib sampling profiler: a helper thread records the request
+               thread's stack every `interval_ms`; output is collapsed stacks
+               (`frame;frame;frame count`, for flamegraph.pl / speedscope).
+    cprofile - deterministic cProfile of the request thread; output is a
+               .pstats file (`python -m pstats`, snakeviz).
+"""
+import cProfile
+import fcntl
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from flask import g, request
+
+MODES = ('sample', 'cprofile')
+SWITCH_FILE = 'armed.json'
+_SAFE_NAME = re.compile(r'[^A-Za-z0-9_.-]+')
+
+
+class SamplingProfiler:
+    """Samples one thread's stack from a helper thread (no tracing hooks)."""
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='request-sampler')
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    def __init__(self):
+        self.directory = None
+        self.check_interval = 2.0
+        self._armed = None          # cached switch contents (None = off)
+        self._next_check = 0.0
+        self._mtime = None
+
+    # ---- switch ------------------------------------------------------------
+    @property
+    def switch_path(self):
+        return os.path.join(self.directory, SWITCH_FILE)
+
+    def init_app(self, app):
+        self.directory = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+        self.check_interval = app.config.get('PROFILE_CHECK_INTERVAL', self.check_interval)
+        app.before_request(self._before)
+        app.teardown_request(self._teardown)
+
+    def _locked_switch(self, update):
+        """Read-modify-write the switch file under an exclusive lock; returns update()'s result."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(self.switch_path) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = None
+            new_state, result = update(state)
+            if new_state is None:
+                if state is not None:
+                    os.remove(self.switch_path)
+            else:
+                tmp = self.switch_path + '.tmp'
+                with open(tmp, 'w') as f:
+                    json.dump(new_state, f)
+                os.replace(tmp, self.switch_path)
+        self._next_check = 0.0
+        return result
+
+    def arm(self, endpoint: str, requests: int, mode: str = 'sample', interval_ms: float = 5) -> dict:
+        state = {'endpoint': endpoint, 'remaining': int(requests), 'mode': mode,
+                 'interval_ms': float(interval_ms), 'armed_at': datetime.utcnow().isoformat(timespec='seconds')}
+        return self._locked_switch(lambda _: (state, state))
+
+    def disarm(self):
+        self._locked_switch(lambda _: (None, None))
+
+    def status(self):
+        try:
+            with open(self.switch_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _claim(self, endpoint):
+        """Take one of the remaining slots for `endpoint` (atomic across workers)."""
+        def update(state):
+            if not state or state.get('endpoint') != endpoint or state.get('remaining', 0) <= 0:
+                return state, None
+            state = dict(state, remaining=state['remaining'] - 1)
+            return (state if state['remaining'] > 0 else None), state
+        return self._locked_switch(update)
+
+    def _poll(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return self._armed
+        self._next_check = now + self.check_interval
+        try:
+            mtime = os.stat(self.switch_path).st_mtime_ns
+        except OSError:
+            self._armed, self._mtime = None, None
+            return None
+        if mtime != self._mtime:
+            self._mtime = mtime
+            self._armed = self.status()
+        return self._armed
+
+    # ---- request hooks -----------------------------------------------------
+    def _before(self):
+        armed = self._poll()
+        if not armed or request.endpoint != armed.get('endpoint'):
+            return
+        state = self._claim(request.endpoint)
+        if state is None:
+            return
+        if state['mode'] == 'cprofile':
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # another profiler/tracer already owns this thread
+                return
+        else:
+            profiler = SamplingProfiler(threading.get_ident(), state['interval_ms'] / 1000)
+            profiler.start()
+        g._profiler = (profiler, state['mode'], time.perf_counter())
+
+    def _teardown(self, exc=None):
+        entry = g.pop('_profiler', None)
+        if entry is None:
+            return
+        profiler, mode, started = entry
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        stamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')
+        base = os.path.join(self.directory, f"{stamp}-{_SAFE_NAME.sub('_', request.endpoint or 'unknown')}-{os.getpid()}")
+        try:
+            if mode == 'cprofile':
+                profiler.disable()
+                profiler.dump_stats(base + '.pstats')
+            else:
+                profiler.stop()
+                with open(base + '.collapsed', 'w') as f:
+                    f.write(profiler.collapsed())
+            with open(base + '.json', 'w') as f:
+                json.dump({'endpoint': request.endpoint, 'path': request.full_path, 'method': request.method,
+                           'mode': mode, 'duration_ms': round(elapsed_ms, 2), 'pid': os.getpid()}, f)
+        except OSError as e:
+            print(f'[profiling] could not write profile: {e}')
+
+    # ---- results -----------------------------------------------------------
+    def list_profiles(self) -> list[dict]:
+        profiles = []
+        try:
+            names = sorted(os.listdir(self.directory), reverse=True)
+        except OSError:
+            return profiles
+        for name in names:
+            if not name.endswith(('.collapsed', '.pstats')):
+                continue
+            meta = {}
+            try:
+                with open(os.path.join(self.directory, name.rsplit('.', 1)[0] + '.json')) as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                pass
+            profiles.append({'name': name, 'size': os.path.getsize(os.path.join(self.directory, name)), **meta})
+        return profiles
+
+    def clear(self):
+        for profile in self.list_profiles():
+            base = os.path.join(self.directory, profile['name'].rsplit('.', 1)[0])
+            for ext in ('.collapsed', '.pstats', '.json'):
+                try:
+                    os.remove(base + ext)
+                except OSError:
+                    pass
+
+
+profiler = RequestProfiler()
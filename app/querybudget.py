@@ -0,0 +1,184 @@
+# app/querybudget.py
+"""
+Query budgets / N+1 detection (development and tests, off by default).
+
+With QUERY_BUDGET = 'warn' or 'strict' every SQL statement sent through the
+engine is counted for the current request and fingerprinted (literals and
+`IN (...)` lists collapsed, so the same shape with other values is the same
+fingerprint). After each request:
+
+- more statements than the endpoint's budget (`@query_budget(n)` on the
+  view, or QUERY_BUDGET_DEFAULT) is a violation,
+- one fingerprint repeated QUERY_REPEAT_THRESHOLD times or more (the lazy
+  load inside a loop) is a violation.
+
+'warn' prints the violations; 'strict' raises QueryBudgetExceeded, which
+turns the request into a 500 (or an exception in the Flask test client).
+Every tracked response carries an `X-Query-Count` header.
+
+Service calls and CLI code can be checked the same way:
+
+    with track_queries(budget=3) as tracker:
+        build_users_payload()
+    tracker.count, tracker.repeated()
+"""
+import re
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from flask import current_app, g, request
+from sqlalchemy import event
+
+MODES = ('off', 'warn', 'strict')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*(?:\?|%s|:\w+)\s*,?)+\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def fingerprint(statement: str) -> str:
+    """Statement shape: literals -> ?, IN lists -> IN (?), whitespace collapsed."""
+    shape = _STRING.sub('?', statement)
+    shape = _NUMBER.sub('?', shape)
+    shape = _IN_LIST.sub('IN (?)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+class QueryTracker:
+    def __init__(self, name: str = None, budget: int = None, repeat_threshold: int = None):
+        self.name = name
+        self.budget = budget
+        self.repeat_threshold = repeat_threshold
+        self.count = 0
+        self.shapes = Counter()
+
+    def record(self, statement: str):
+        self.count += 1
+        self.shapes[fingerprint(statement)] += 1
+
+    def repeated(self, threshold: int = None) -> list[tuple[str, int]]:
+        threshold = threshold or self.repeat_threshold or 2
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    def violations(self) -> list[str]:
+        problems = []
+        if self.budget is not None and self.count > self.budget:
+            problems.append(f'{self.count} queries, budget {self.budget}')
+        if self.repeat_threshold:
+            problems.extend(f'{n}x {shape}' for shape, n in self.repeated())
+        return problems
+
+
+# trackers of the current thread (a request and any track_queries() inside it)
+_local = threading.local()
+
+
+def _active() -> list:
+    stack = getattr(_local, 'trackers', None)
+    if stack is None:
+        stack = _local.trackers = []
+    return stack
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    for tracker in _active():
+        tracker.record(statement)
+
+
+def instrument(engines):
+    """Attach the statement counter to these engines (idempotent)."""
+    for engine in engines:
+        if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+
+
+def _report(tracker: QueryTracker, mode: str):
+    problems = tracker.violations()
+    if not problems:
+        return
+    message = f'[querybudget] {tracker.name}: ' + '; '.join(problems)
+    if mode == 'strict':
+        raise QueryBudgetExceeded(message)
+    print(message)
+
+
+@contextmanager
+def track_queries(name: str = 'block', budget: int = None, repeat_threshold: int = None, mode: str = None):
+    """
+    Count the statements run inside the block (in this thread; needs an app
+    context). With `mode` ('warn' / 'strict') violations are reported on exit
+    like for a request.
+    """
+    from app import db
+    if current_app:
+        instrument(db.engines.values())
+    tracker = QueryTracker(name, budget, repeat_threshold)
+    stack = _active()
+    stack.append(tracker)
+    try:
+        yield tracker
+    finally:
+        stack.remove(tracker)
+    if mode in ('warn', 'strict'):
+        _report(tracker, mode)
+
+
+def query_budget(n: int):
+    """Maximum number of statements one request to this view may run."""
+    def decorator(f):
+        f._query_budget = n
+        return f
+    return decorator
+
+
+class QueryBudget:
+    def __init__(self):
+        self.mode = 'off'
+
+    def init_app(self, app):
+        self.mode = app.config.get('QUERY_BUDGET') or 'off'
+        if self.mode not in MODES:
+            raise ValueError(f'QUERY_BUDGET must be one of {", ".join(MODES)}')
+        if self.mode == 'off':
+            return
+        from app import db
+        with app.app_context():
+            instrument(db.engines.values())
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+
+    def _budget_for(self, endpoint):
+        view = current_app.view_functions.get(endpoint)
+        budget = getattr(view, '_query_budget', None)
+        if budget is None:
+            budget = current_app.config.get('QUERY_BUDGET_DEFAULT') or None
+        return budget
+
+    def _before(self):
+        tracker = QueryTracker(request.endpoint, self._budget_for(request.endpoint),
+                               current_app.config.get('QUERY_REPEAT_THRESHOLD'))
+        _active().append(tracker)
+        g._query_tracker = tracker
+
+    def _after(self, response):
+        tracker = g.get('_query_tracker')
+        if tracker is None:
+            return response
+        response.headers['X-Query-Count'] = str(tracker.count)
+        # streamed bodies run their queries later and are not counted
+        _report(tracker, self.mode)
+        return response
+
+    def _teardown(self, exc=None):
+        tracker = g.pop('_query_tracker', None)
+        if tracker is not None and tracker in _active():
+            _active().remove(tracker)
+
+
+budget = QueryBudget()
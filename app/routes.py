@@ -1,5 +1,7 @@
-from flask import Blueprint, render_template, redirect, url_for, current_app
+from flask import Blueprint, render_template, redirect, url_for, current_app, jsonify
 from flask_login import login_required, current_user
+from app.querybudget import query_budget
+from app.user_mgmt.services.telemetry.snapshot import get_summary, get_user_usage
 
 main_bp = Blueprint('main', __name__)
 
@@ -14,5 +16,26 @@ def index():
 def dashboard():
     if current_user.role == 'admin':
         return render_template('admindashboard.html')
+    elif current_user.role == 'reseller':
+        return redirect(url_for('user_management.users_page'))
     else:
-        return render_template('userdashboard.html')
\ No newline at end of file
+        return render_template('userdashboard.html')
+
+@main_bp.route('/dashboard/api/usage')
+@login_required
+@query_budget(6)
+def my_usage():
+    """Self-service usage of the logged-in user, served from the telemetry snapshot."""
+    usage = get_user_usage(current_user.username)
+    if usage is None:
+        return jsonify({'success': False, 'message': 'No usage data yet'}), 404
+    return jsonify({'success': True, 'usage': usage})
+
+@main_bp.route('/dashboard/api/summary')
+@login_required
+@query_budget(6)
+def dashboard_summary():
+    """Admin dashboard counters, served from the telemetry snapshot."""
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'message': 'Admin privileges required'}), 403
+    return jsonify({'success': True, 'summary': get_summary()})
@@ -1,4 +1,5 @@
-from flask import Blueprint, render_template, request, jsonify, flash, redirect, url_for
+from flask import (Blueprint, Response, current_app, render_template, request, jsonify, flash, redirect,
+                   send_from_directory, url_for, stream_with_context)
 from flask_login import login_required, current_user
 from flask_babel import gettext as _
 from functools import wraps
@@ -102,12 +103,130 @@ def toggle_user_panel():
 @login_required
 @admin_required
 def create_backup():
-    """Create system backup - TODO: Implement"""
-    return jsonify({'success': False, 'message': 'Not implemented yet'}), 501
+    """Stream a gzip-compressed NDJSON backup (DB tables, Linux users, nft counters)"""
+    from app.audit import audit
+    from app.backup import backup_filename, generate_backup
+    audit('backup.create')
+    return Response(
+        stream_with_context(generate_backup()),
+        mimetype='application/gzip',
+        headers={
+            'Content-Disposition': f'attachment; filename="{backup_filename()}"',
+            'X-Accel-Buffering': 'no',
+            'Cache-Control': 'no-store',
+        },
+    )
 
 @settings_bp.route('/api/backup/restore', methods=['POST'])
 @login_required
 @admin_required
 def restore_backup():
-    """Restore from backup - TODO: Implement"""
-    return jsonify({'success': False, 'message': 'Not implemented yet'}), 501
\ No newline at end of file
+    """Restore from a backup sent as the raw request body (or a `file` upload)"""
+    from app.audit import audit
+    from app.backup import BackupError, restore_backup as restore
+    upload = request.files.get('file')
+    stream = upload.stream if upload else request.stream
+    reprovision = request.args.get('reprovision', '1') != '0'
+    try:
+        result = restore(stream, reprovision=reprovision)
+    except BackupError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    audit('backup.restore', counts=result['counts'])
+    return jsonify(result)
+
+# Request Profiling
+@settings_bp.route('/api/profiling', methods=['GET'])
+@login_required
+@admin_required
+def profiling_status():
+    """Current switch, recorded profiles and the endpoints that can be profiled"""
+    from app.profiling import profiler
+    endpoints = sorted({r.endpoint for r in current_app.url_map.iter_rules() if r.endpoint != 'static'})
+    return jsonify({
+        'success': True,
+        'armed': profiler.status(),
+        'profiles': profiler.list_profiles(),
+        'endpoints': endpoints,
+    })
+
+@settings_bp.route('/api/profiling', methods=['POST'])
+@login_required
+@admin_required
+def arm_profiling():
+    """Profile the next N requests to an endpoint: {endpoint, requests, mode, interval_ms}"""
+    from app.audit import audit
+    from app.profiling import MODES, profiler
+    data = request.get_json() or {}
+    endpoint = data.get('endpoint')
+    mode = data.get('mode', 'sample')
+    if endpoint not in current_app.view_functions:
+        return jsonify({'success': False, 'message': 'Unknown endpoint'}), 400
+    if mode not in MODES:
+        return jsonify({'success': False, 'message': f'mode must be one of {", ".join(MODES)}'}), 400
+    try:
+        requests_n = max(1, min(int(data.get('requests', 10)), 1000))
+        interval_ms = max(1.0, float(data.get('interval_ms', 5)))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'requests and interval_ms must be numbers'}), 400
+    state = profiler.arm(endpoint, requests_n, mode, interval_ms)
+    audit('profiling.arm', endpoint=endpoint, requests=requests_n, mode=mode)
+    return jsonify({'success': True, 'armed': state})
+
+@settings_bp.route('/api/profiling', methods=['DELETE'])
+@login_required
+@admin_required
+def disarm_profiling():
+    from app.profiling import profiler
+    profiler.disarm()
+    if request.args.get('clear') == '1':
+        profiler.clear()
+    return jsonify({'success': True})
+
+@settings_bp.route('/api/profiling/<path:name>', methods=['GET'])
+@login_required
+@admin_required
+def download_profile(name):
+    from app.profiling import profiler
+    if not name.endswith(('.collapsed', '.pstats')):
+        return jsonify({'success': False, 'message': 'Not found'}), 404
+    return send_from_directory(profiler.directory, name, as_attachment=True)
+
+# API tokens (external billing systems, /api/v1/usage)
+@settings_bp.route('/api/tokens', methods=['GET'])
+@login_required
+@admin_required
+def list_tokens():
+    from app.models import ApiToken
+    tokens = ApiToken.query.order_by(ApiToken.id.desc()).all()
+    return jsonify({'success': True, 'tokens': [t.to_dict() for t in tokens]})
+
+@settings_bp.route('/api/tokens', methods=['POST'])
+@login_required
+@admin_required
+def create_api_token():
+    """New token: {name}. The plaintext token is only returned here."""
+    from app.api_tokens import create_token
+    from app.audit import audit
+    name = ((request.get_json() or {}).get('name') or '').strip()
+    if not name:
+        return jsonify({'success': False, 'message': 'Name is required'}), 400
+    row, token = create_token(name[:64])
+    audit('api_token.create', token_id=row.id, name=row.name)
+    return jsonify({'success': True, 'token': token, 'api_token': row.to_dict()})
+
+@settings_bp.route('/api/tokens/<int:token_id>', methods=['DELETE'])
+@login_required
+@admin_required
+def revoke_api_token(token_id):
+    from app import db
+    from app.audit import audit
+    from app.models import ApiToken
+    row = db.session.get(ApiToken, token_id)
+    if row is None:
+        return jsonify({'success': False, 'message': 'Not found'}), 404
+    row.is_active = False
+    db.session.commit()
+    audit('api_token.revoke', token_id=row.id, name=row.name)
+    return jsonify({'success': True})
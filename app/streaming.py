@@ -0,0 +1,86 @@
+# app/streaming.py
+"""
+Helpers for large downloads/uploads that must keep memory flat: rows are read
+with server-side cursors in `yield_per` batches and written out (optionally
+gzip-compressed) chunk by chunk.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from app import db
+
+CHUNK_SIZE = 64 * 1024
+ROW_BATCH = 1000
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def ndjson(record: dict) -> bytes:
+    return (json.dumps(record, default=_default, ensure_ascii=False) + '\n').encode()
+
+
+def csv_lines(columns, rows):
+    """CSV bytes: the header line first (sent at once), then one line per row dict."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+
+    def line(values):
+        buf.seek(0)
+        buf.truncate()
+        writer.writerow(values)
+        return buf.getvalue().encode()
+
+    yield line(columns)
+    for row in rows:
+        yield line([_csv_value(row.get(c)) for c in columns])
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def stream_rows(stmt, batch: int = ROW_BATCH):
+    """Yield result rows as dicts, `batch` rows per round trip (server-side cursor)."""
+    result = db.session.execute(stmt, execution_options={'yield_per': batch})
+    for row in result.mappings():
+        yield dict(row)
+
+
+def buffered(chunks, size: int = CHUNK_SIZE):
+    """Merge many small byte strings into ~`size` chunks (the first one is passed through)."""
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is not None:
+        yield first
+    buf, length = [], 0
+    for chunk in chunks:
+        buf.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b''.join(buf)
+            buf, length = [], 0
+    if buf:
+        yield b''.join(buf)
+
+
+def gzip_stream(chunks, level: int = 6):
+    """Gzip-compress a byte stream incrementally."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for i, chunk in enumerate(buffered(chunks)):
+        data = compressor.compress(chunk)
+        if i == 0:
+            # push the gzip header and first chunk out now instead of at 64 KB
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,163 @@
+# app/user_mgmt/backends.py
+"""
+System backends: the operations a host must support to be managed by the
+panel (local machine or a node agent).
+
+`LinuxSystem` drives the real host through linux.py / nft.py, `FakeSystem`
+keeps everything in memory so agents and the panel can run on one machine
+without touching users, sshd or nftables.
+"""
+import threading
+from typing import Protocol
+from . import linux, nft
+
+
+class SystemBackend(Protocol):
+    name: str
+
+    def user_exists(self, username: str) -> bool: ...
+    def list_users(self) -> list[str]: ...
+    def create_user(self, username: str, password: str) -> tuple[bool, str]: ...
+    def delete_user(self, username: str) -> tuple[bool, str]: ...
+    def rename_user(self, old_username: str, new_username: str) -> tuple[bool, str]: ...
+    def reset_password(self, username: str, password: str) -> tuple[bool, str]: ...
+    def apply_quotas(self, quotas: dict[str, int], removed=()) -> tuple[bool, str]: ...
+    def snapshot(self) -> dict[str, dict]: ...
+
+
+class LinuxSystem(SystemBackend):
+    name = 'linux'
+
+    def user_exists(self, username):
+        return linux.check_linux_user_exists(username)
+
+    def list_users(self):
+        return linux.get_all_linux_users()
+
+    def create_user(self, username, password):
+        return linux.create_linux_user(username, password)
+
+    def delete_user(self, username):
+        return linux.delete_linux_user(username)
+
+    def rename_user(self, old_username, new_username):
+        return linux.rename_linux_user(old_username, new_username)
+
+    def reset_password(self, username, password):
+        return linux.reset_linux_password(username, password)
+
+    def apply_quotas(self, quotas, removed=()):
+        uids = {}
+        for username in list(quotas) + list(removed):
+            uid = linux.get_linux_uid(username)
+            if uid is not None:
+                uids[username] = uid
+        return nft.apply_quotas(
+            {uids[u]: b for u, b in quotas.items() if u in uids},
+            removed=[uids[u] for u in removed if u in uids],
+        )
+
+    def snapshot(self):
+        from .services.telemetry.connections import get_all_conns
+        connections = get_all_conns()
+        traffic = nft.read_uid_counters()
+        users = {}
+        for username in self.list_users():
+            uid = linux.get_linux_uid(username)
+            users[username] = {
+                'connections': connections.get(username, 0),
+                'traffic_bytes': traffic.get(uid, 0),
+            }
+        return users
+
+
+class FakeSystem(SystemBackend):
+    """In-memory host for stand-in agents, load tests and local development."""
+    name = 'fake'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.users: dict[str, dict] = {}
+        self.quotas: dict[str, int] = {}
+        self.connections: dict[str, int] = {}
+        self.traffic: dict[str, int] = {}
+        self._next_uid = 1000
+
+    def user_exists(self, username):
+        return username in self.users
+
+    def list_users(self):
+        return sorted(self.users)
+
+    def create_user(self, username, password):
+        with self._lock:
+            if username in self.users:
+                return False, "Linux user already exists"
+            self.users[username] = {'uid': self._next_uid, 'password': password}
+            self._next_uid += 1
+        return True, "User created successfully"
+
+    def delete_user(self, username):
+        with self._lock:
+            self.users.pop(username, None)
+            self.quotas.pop(username, None)
+        return True, "User deleted successfully"
+
+    def rename_user(self, old_username, new_username):
+        with self._lock:
+            if old_username not in self.users:
+                return False, "Old user not found"
+            if new_username in self.users:
+                return False, "New username already exists"
+            self.users[new_username] = self.users.pop(old_username)
+            if old_username in self.quotas:
+                self.quotas[new_username] = self.quotas.pop(old_username)
+        return True, "User renamed successfully"
+
+    def reset_password(self, username, password):
+        with self._lock:
+            if username not in self.users:
+                return False, "User does not exist"
+            self.users[username]['password'] = password
+        return True, "Password updated"
+
+    def apply_quotas(self, quotas, removed=()):
+        with self._lock:
+            for username in removed:
+                self.quotas.pop(username, None)
+            self.quotas.update({u: b for u, b in quotas.items() if u in self.users})
+        return True, f"Synced {len(quotas)} quotas, removed {len(removed)}"
+
+    def snapshot(self):
+        return {
+            u: {'connections': self.connections.get(u, 0), 'traffic_bytes': self.traffic.get(u, 0)}
+            for u in self.list_users()
+        }
+
+
+BACKENDS = {'linux': LinuxSystem, 'fake': FakeSystem}
+
+_backend: SystemBackend = LinuxSystem()
+
+
+def set_system_backend(backend: SystemBackend) -> None:
+    global _backend
+    _backend = backend
+
+
+def get_system_backend() -> SystemBackend:
+    return _backend
+
+
+def init_system_backend(app) -> None:
+    """Select the backend from SYSTEM_BACKEND ('linux' or 'fake')."""
+    name = app.config.get('SYSTEM_BACKEND', 'linux')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown SYSTEM_BACKEND {name!r} (expected one of {', '.join(BACKENDS)})")
+    if _backend.name == name:
+        return
+    set_system_backend(BACKENDS[name]())
+    if name == 'fake':
+        # nothing to count on a fake host
+        from .services.telemetry.connections import NullConnections, set_connections_provider
+        set_connections_provider(NullConnections())
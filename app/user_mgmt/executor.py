@@ -0,0 +1,81 @@
+# app/user_mgmt/executor.py
+"""
+Bounded-concurrency executor for per-user Linux operations.
+
+Jobs for different users run in parallel (at most `max_workers` at a time),
+jobs for the same user run one after another, and every sshd reload issued
+by the jobs is coalesced into a single reload at the end of the batch.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, has_app_context
+from .linux import coalesced_sshd_reload
+
+DEFAULT_CONCURRENCY = 8
+
+# One lock per username so overlapping batches (two admins) never interleave
+_user_locks: dict[str, threading.Lock] = {}
+_user_locks_guard = threading.Lock()
+
+
+def _user_lock(username: str) -> threading.Lock:
+    with _user_locks_guard:
+        lock = _user_locks.get(username)
+        if lock is None:
+            lock = _user_locks[username] = threading.Lock()
+        return lock
+
+
+def _concurrency() -> int:
+    if has_app_context():
+        return int(current_app.config.get('LINUX_OPS_CONCURRENCY', DEFAULT_CONCURRENCY))
+    return DEFAULT_CONCURRENCY
+
+
+def _run_user_jobs(username: str, jobs: list) -> list[dict]:
+    results = []
+    with _user_lock(username):
+        for fn, args in jobs:
+            try:
+                ok, msg = fn(*args)
+            except Exception as e:
+                ok, msg = False, f"Error: {e}"
+            results.append({'ok': bool(ok), 'message': msg})
+    return results
+
+
+def run_per_user(jobs, max_workers: int = None) -> dict[str, list[dict]]:
+    """
+    Run `(username, fn, *args)` jobs, where `fn` returns `(ok, message)` like
+    the helpers in linux.py.
+
+    Returns {username: [{'ok': bool, 'message': str}, ...]} with one entry per
+    job, in submission order.
+    """
+    grouped: OrderedDict[str, list] = OrderedDict()
+    for username, fn, *args in jobs:
+        grouped.setdefault(username, []).append((fn, args))
+    if not grouped:
+        return {}
+
+    workers = max(1, min(max_workers or _concurrency(), len(grouped)))
+    with coalesced_sshd_reload():
+        if workers == 1:
+            return {u: _run_user_jobs(u, js) for u, js in grouped.items()}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='linux-ops') as pool:
+            futures = {u: pool.submit(_run_user_jobs, u, js) for u, js in grouped.items()}
+            return {u: f.result() for u, f in futures.items()}
+
+
+def succeeded(results: dict[str, list[dict]]) -> list[str]:
+    """Usernames whose jobs all succeeded."""
+    return [u for u, rs in results.items() if all(r['ok'] for r in rs)]
+
+
+def failures(results: dict[str, list[dict]]) -> dict[str, str]:
+    """{username: first error message} for users with a failed job."""
+    return {
+        u: next(r['message'] for r in rs if not r['ok'])
+        for u, rs in results.items() if not all(r['ok'] for r in rs)
+    }
@@ -2,24 +2,59 @@
 import subprocess
 import pwd
 import os
+import re
 import shutil
+import threading
+from contextlib import contextmanager
 
 # Automatically detect sudo path, fallback if missing
 SUDO_PATH = shutil.which("sudo") or "/usr/bin/sudo"
 
-
-def _run(cmd, check=True, text=True):
+# sshd_config is edited in place (tee -a / sed -i); concurrent edits would lose writes
+_sshd_config_lock = threading.Lock()
+
+SSHD_CONFIG = "/etc/ssh/sshd_config"
+
+# Per-user `Match User` block written by create_linux_user (VPN/tunnel-only, no shell)
+SSHD_MATCH_DEFAULTS = {
+    "PermitTunnel": "yes",
+    "AllowTcpForwarding": "yes",
+    "X11Forwarding": "no",
+    "AllowAgentForwarding": "no",
+    "PermitTTY": "no",
+    "ForceCommand": "internal-sftp",
+}
+# the only directives / values accepted in a block from a backup
+SSHD_MATCH_ALLOWED = {
+    "PermitTunnel": {"yes", "no", "point-to-point", "ethernet"},
+    "AllowTcpForwarding": {"yes", "no", "local", "remote", "all"},
+    "X11Forwarding": {"yes", "no"},
+    "AllowAgentForwarding": {"yes", "no"},
+    "PermitTTY": {"yes", "no"},
+    "ForceCommand": {"internal-sftp"},
+}
+# names safe to put in sshd_config (and in sed addresses)
+_USERNAME = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_.-]{0,31}$")
+
+# Reload coalescing (see coalesced_sshd_reload)
+_reload_lock = threading.Lock()
+_reload_depth = 0
+_reload_pending = False
+
+
+def _run(cmd, check=True, text=True, input=None):
     """
     Execute a system command safely.
     - Adds sudo automatically when running as www-data
     - Captures stderr/stdout for debugging
+    - Optional `input` is fed to the command's stdin (e.g. `nft -f -`)
     """
     # Only prepend sudo if not root
     if os.geteuid() != 0 and SUDO_PATH and not cmd[0].startswith(SUDO_PATH):
         cmd = [SUDO_PATH] + cmd
 
     try:
-        result = subprocess.run(cmd, check=check, text=text, capture_output=True)
+        result = subprocess.run(cmd, check=check, text=text, capture_output=True, input=input)
         return result
     except FileNotFoundError as e:
         raise RuntimeError(f"Sudo not found at {SUDO_PATH}. Install sudo or fix PATH.") from e
@@ -28,7 +63,37 @@ def _run(cmd, check=True, text=True):
 
 
 def reload_sshd():
-    """Reload SSHD service (ssh or sshd)."""
+    """Reload SSHD service (ssh or sshd), or defer it inside coalesced_sshd_reload()."""
+    global _reload_pending
+    with _reload_lock:
+        if _reload_depth:
+            _reload_pending = True
+            return True
+    return _reload_sshd_now()
+
+
+@contextmanager
+def coalesced_sshd_reload():
+    """
+    Collapse every reload_sshd() issued inside the block (from any thread)
+    into a single reload when the outermost block exits.
+    """
+    global _reload_depth, _reload_pending
+    with _reload_lock:
+        _reload_depth += 1
+    try:
+        yield
+    finally:
+        with _reload_lock:
+            _reload_depth -= 1
+            run_now = _reload_depth == 0 and _reload_pending
+            if run_now:
+                _reload_pending = False
+        if run_now:
+            _reload_sshd_now()
+
+
+def _reload_sshd_now():
     for svc in ("ssh", "sshd"):
         try:
             _run(["systemctl", "reload", svc])
@@ -55,6 +120,14 @@ def check_linux_user_exists(username: str) -> bool:
         return False
 
 
+def get_linux_uid(username: str):
+    """Return the UID of a Linux user, or None if the user does not exist."""
+    try:
+        return pwd.getpwnam(username).pw_uid
+    except KeyError:
+        return None
+
+
 def safe_kill_user_processes(username: str):
     """Kill all processes belonging to the given user."""
     _run(["pkill", "-KILL", "-u", username], check=False)
@@ -74,15 +147,7 @@ def create_linux_user(username: str, password: str):
         proc.communicate(f"{username}:{password}")
 
         # 3️⃣ Generate SSHD rule (VPN/tunnel-only, no shell)
-        ssh_config = f"""
-Match User {username}
-    PermitTunnel yes
-    AllowTcpForwarding yes
-    X11Forwarding no
-    AllowAgentForwarding no
-    PermitTTY no
-    ForceCommand internal-sftp
-"""
+        ssh_config = "\n" + sshd_match_block(username)
 
         tmp_file = f"/tmp/ssh_user_{username}.conf"
         with open(tmp_file, "w") as f:
@@ -90,7 +155,7 @@ Match User {username}
 
         # 4️⃣ Append rule to sshd_config via tee
         cmd = [SUDO_PATH, "tee", "-a", "/etc/ssh/sshd_config"]
-        with open(tmp_file, "r") as f:
+        with open(tmp_file, "r") as f, _sshd_config_lock:
             proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, text=True)
             proc.communicate(f.read())
         if proc.returncode != 0:
@@ -129,9 +194,10 @@ def rename_linux_user(old_username: str, new_username: str):
 
         _run(["usermod", "-l", new_username, old_username])
         _run(["usermod", "-d", f"/home/{new_username}", "-m", new_username])
-        _run(["sed", "-i",
-              f"s/^Match User {old_username}$/Match User {new_username}/",
-              "/etc/ssh/sshd_config"])
+        with _sshd_config_lock:
+            _run(["sed", "-i",
+                  f"s/^Match User {old_username}$/Match User {new_username}/",
+                  "/etc/ssh/sshd_config"])
         reload_sshd()
         return True, "User renamed successfully"
     except Exception as e:
@@ -145,13 +211,139 @@ def delete_linux_user(username: str):
             return True, "User does not exist"
         safe_kill_user_processes(username)
         _run(["userdel", "-r", username])
-        _run(["sed", "-i", f"/^Match User {username}$/,/^$/d", "/etc/ssh/sshd_config"])
+        with _sshd_config_lock:
+            _run(["sed", "-i", f"/^Match User {username}$/,/^$/d", "/etc/ssh/sshd_config"])
         reload_sshd()
         return True, "User deleted successfully"
     except Exception as e:
         return False, f"Error deleting user: {e}"
 
 
+def get_password_hashes(usernames) -> dict[str, str]:
+    """{username: shadow hash} for the given users (used by backups)."""
+    wanted = set(usernames)
+    try:
+        result = _run(["getent", "shadow"])
+    except Exception:
+        return {}
+    hashes = {}
+    for line in result.stdout.splitlines():
+        fields = line.split(":")
+        if len(fields) > 1 and fields[0] in wanted:
+            hashes[fields[0]] = fields[1]
+    return hashes
+
+
+def set_password_hashes(hashes: dict[str, str]):
+    """Set many already-hashed passwords in one `chpasswd -e` call."""
+    if not hashes:
+        return True, "Nothing to set"
+    try:
+        _run(["chpasswd", "-e"], input="".join(f"{u}:{h}\n" for u, h in hashes.items()))
+        return True, f"Set {len(hashes)} password hashes"
+    except Exception as e:
+        return False, f"Error setting password hashes: {e}"
+
+
+def get_sshd_match_blocks(usernames) -> dict[str, str]:
+    """{username: its `Match User` block} as written by create_linux_user."""
+    wanted = set(usernames)
+    blocks, current = {}, None
+    try:
+        with open("/etc/ssh/sshd_config") as f:
+            for line in f:
+                if line.startswith("Match User "):
+                    name = line.split()[2]
+                    current = name if name in wanted else None
+                    if current:
+                        blocks[current] = line
+                elif current and line.strip():
+                    blocks[current] += line
+                else:
+                    current = None
+    except OSError:
+        pass
+    return blocks
+
+
+def sshd_match_block(username: str, directives: dict = None) -> str:
+    """The `Match User` block for `username` as the panel writes it."""
+    directives = directives or SSHD_MATCH_DEFAULTS
+    return f"Match User {username}\n" + "".join(f"    {k} {v}\n" for k, v in directives.items())
+
+
+def parse_sshd_match_block(username: str, text: str):
+    """
+    Directives of a `Match User <username>` block, or None unless it is one
+    the panel could have written (its directives only, known values).
+    """
+    if not _USERNAME.match(username):
+        return None
+    lines = [line.strip() for line in (text or "").strip().splitlines()]
+    if not lines or lines[0] != f"Match User {username}":
+        return None
+    directives = {}
+    for line in lines[1:]:
+        parts = line.split()
+        if (len(parts) != 2 or parts[1] not in SSHD_MATCH_ALLOWED.get(parts[0], ())
+                or parts[0] in directives):
+            return None
+        directives[parts[0]] = parts[1]
+    return directives or None
+
+
+def _drop_match_blocks(config: str, usernames) -> str:
+    """sshd_config without the `Match User` blocks of `usernames` (each up to its blank line)."""
+    starts = {f"Match User {u}" for u in usernames}
+    out, skipping = [], False
+    for line in config.splitlines(keepends=True):
+        if skipping:
+            if not line.strip():
+                skipping = False
+                continue
+            if not line.startswith("Match "):
+                continue
+            skipping = False
+        if line.rstrip("\n") in starts:
+            skipping = True
+            continue
+        out.append(line)
+    return "".join(out)
+
+
+def set_sshd_match_blocks(blocks: dict[str, str]):
+    """
+    Make each user's `Match User` block equal to `blocks[username]` (restore).
+    Blocks that do not pass parse_sshd_match_block, or whose Linux user does
+    not exist, are rejected. sshd_config is rewritten once, then one reload.
+    """
+    wanted, rejected = {}, []
+    for username, text in blocks.items():
+        directives = parse_sshd_match_block(username, text)
+        if directives is None or not check_linux_user_exists(username):
+            rejected.append(username)
+        else:
+            wanted[username] = sshd_match_block(username, directives)
+    note = f"; rejected: {', '.join(sorted(rejected))}" if rejected else ""
+
+    current = get_sshd_match_blocks(wanted)
+    changed = {u: b for u, b in wanted.items() if current.get(u, "").strip() != b.strip()}
+    if not changed:
+        return True, "sshd blocks up to date" + note
+    try:
+        with _sshd_config_lock:
+            with open(SSHD_CONFIG) as f:
+                config = _drop_match_blocks(f.read(), changed)
+            if config and not config.endswith("\n"):
+                config += "\n"
+            config += "".join(f"\n{b}" for b in changed.values())
+            _run(["tee", SSHD_CONFIG], input=config)
+        reload_sshd()
+        return True, f"Restored {len(changed)} sshd blocks" + note
+    except Exception as e:
+        return False, f"Error restoring sshd blocks: {e}"
+
+
 # Optional placeholders for later extensions
 def get_current_connections(username: str) -> int:
     """Count active SSH connections (to be implemented)."""
@@ -0,0 +1,126 @@
+# app/user_mgmt/nft.py
+"""
+In-kernel traffic quota enforcement.
+
+Every managed UID gets a named nft `quota` object inside the accounting table
+(`inet itbity_traffic`). A single rule in the `users` chain looks the packet's
+socket UID up in the `user_quotas` map and drops the packet once that UID's
+quota is exhausted, so the kernel cuts traffic at the exact byte without any
+polling from userspace.
+
+All changes are applied as one `nft -f -` transaction per batch. Every batch
+also re-creates the table, chain, map and (if it is missing) the drop rule,
+so enforcement comes back after a reboot (`flush ruleset` in nftables.conf)
+or an `nft flush` with the next sync; `flask quotas sync` (itbity-quotas
+.service, at boot and when the traffic daemon sees the rule missing) re-installs
+every quota.
+"""
+import json
+import shutil
+from .linux import _run
+
+NFT_BIN = shutil.which("nft") or "/usr/sbin/nft"
+
+NFT_TABLE = "inet itbity_traffic"
+NFT_CHAIN = "users"
+QUOTA_MAP = "user_quotas"
+
+
+def quota_name(uid: int) -> str:
+    return f"user_quota_{uid}"
+
+
+def _map_header(with_rule: bool = False) -> list[str]:
+    # `add` is idempotent for tables, chains and maps, so every batch is self-contained
+    lines = [
+        f"add table {NFT_TABLE}",
+        f"add chain {NFT_TABLE} {NFT_CHAIN} {{ type filter hook input priority 0 ; policy accept ; }}",
+        f"add map {NFT_TABLE} {QUOTA_MAP} {{ type uid : quota ; }}",
+    ]
+    if with_rule:
+        # rules are not idempotent: only added when has_enforce_rule() says it is gone
+        lines.append(f"insert rule {NFT_TABLE} {NFT_CHAIN} quota name meta skuid map @{QUOTA_MAP} drop")
+    return lines
+
+
+def has_enforce_rule() -> bool:
+    """Is the `quota name meta skuid map @user_quotas drop` rule installed?"""
+    try:
+        # same command as read_uid_counters (the only `list` allowed in sudoers)
+        result = _run([NFT_BIN, "-j", "list", "chain", *NFT_TABLE.split(), NFT_CHAIN], check=False)
+    except Exception:
+        return False
+    # the counter rules are commented user_uid_<uid>; only the drop rule names the map
+    return result.returncode == 0 and QUOTA_MAP in result.stdout
+
+
+def _drop_lines(uid: int) -> list[str]:
+    """
+    Delete the map element and quota object of a UID even if they do not
+    exist yet: `add` first (no-op when present), then `delete`.
+    """
+    name = quota_name(uid)
+    return [
+        f"add quota {NFT_TABLE} {name} {{ over 0 bytes }}",
+        f'add element {NFT_TABLE} {QUOTA_MAP} {{ {uid} : "{name}" }}',
+        f"delete element {NFT_TABLE} {QUOTA_MAP} {{ {uid} }}",
+        f"delete quota {NFT_TABLE} {name}",
+    ]
+
+
+def build_quota_script(quotas: dict[int, int], removed=(), with_rule: bool = False) -> str:
+    """
+    Build one nft transaction that (re)installs `quotas` ({uid: remaining_bytes})
+    and removes the quota of every uid in `removed` (plus the drop rule when
+    `with_rule`).
+
+    Re-creating a quota object resets its consumed counter, so the new size is
+    always measured from "now".
+    """
+    lines = _map_header(with_rule)
+    for uid in removed:
+        lines += _drop_lines(uid)
+    for uid, remaining in quotas.items():
+        name = quota_name(uid)
+        lines += _drop_lines(uid)
+        lines += [
+            f"add quota {NFT_TABLE} {name} {{ over {max(0, int(remaining))} bytes }}",
+            f'add element {NFT_TABLE} {QUOTA_MAP} {{ {uid} : "{name}" }}',
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def apply_quotas(quotas: dict[int, int], removed=()):
+    """Apply a batch of quota changes in a single nft transaction."""
+    with_rule = not has_enforce_rule()
+    if not quotas and not removed and not with_rule:
+        return True, "Nothing to sync"
+    try:
+        _run([NFT_BIN, "-f", "-"], input=build_quota_script(quotas, removed, with_rule))
+        return True, f"Synced {len(quotas)} quotas, removed {len(removed)}"
+    except Exception as e:
+        return False, f"Error applying nft quotas: {e}"
+
+
+def remove_quotas(uids):
+    return apply_quotas({}, removed=list(uids))
+
+
+def read_uid_counters() -> dict[int, int]:
+    """{uid: bytes} from the per-UID counter rules (comment user_uid_<uid>)."""
+    try:
+        result = _run([NFT_BIN, "-j", "list", "chain", *NFT_TABLE.split(), NFT_CHAIN])
+        data = json.loads(result.stdout)
+    except Exception:
+        return {}
+
+    counters = {}
+    for item in data.get("nftables", []):
+        rule = item.get("rule")
+        comment = (rule or {}).get("comment") or ""
+        if not comment.startswith("user_uid_"):
+            continue
+        for expr in rule.get("expr", []):
+            if "counter" in expr:
+                counters[int(comment[len("user_uid_"):])] = int(expr["counter"].get("bytes", 0))
+    return counters
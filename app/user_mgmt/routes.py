@@ -1,27 +1,41 @@
 # app/user_mgmt/routes.py
-from flask import Blueprint, render_template, request, jsonify
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, render_template, request, jsonify, stream_with_context
 from flask_login import login_required
-from .utils import admin_required
+from app import db
+from app.audit import query_events
+from app.models import ReapedSession
+from app.querybudget import query_budget
+from .services.telemetry.rates import top_users
+from .services.exports import FORMATS, USER_COLUMNS, SESSION_COLUMNS, users_stmt, sessions_stmt, export_stream
+from .utils import admin_required, staff_required
 from .services import (
     build_users_payload, action_repair_all, action_repair_user, action_clean_orphans,
-    action_import_linux_user, create_user_full, update_user_full, delete_user_full
+    action_import_linux_user, action_sync_quotas, create_user_full, update_user_full, delete_user_full,
+    bulk_update_users, acting_reseller, list_resellers, create_reseller, update_reseller, delete_reseller
 )
 
 user_management_bp = Blueprint('user_management', __name__)
 
 @user_management_bp.route('/users')
 @login_required
-@admin_required
+@staff_required
 def users_page():
     return render_template('user_management.html')
 
 @user_management_bp.route('/api/users', methods=['GET'])
 @login_required
-@admin_required
+@staff_required
+@query_budget(6)
 def get_users():
     try:
         users, orphans = build_users_payload()
-        return jsonify({'success': True, 'users': users, 'orphaned_linux_users': orphans})
+        body = {'success': True, 'users': users, 'orphaned_linux_users': orphans}
+        reseller = acting_reseller()
+        if reseller is not None:
+            # یک ردیف؛ مستقل از تعداد کاربران فروشنده
+            body['reseller'] = reseller.reseller_quota.to_dict() if reseller.reseller_quota else None
+        return jsonify(body)
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
@@ -44,6 +58,10 @@ def sync_users():
         if action == 'clean_orphans':
             return jsonify(action_clean_orphans())
 
+        if action == 'sync_quotas':
+            result = action_sync_quotas()
+            return jsonify(result), 200 if result.get('success') else 500
+
         if action == 'import_linux_user':
             result = action_import_linux_user(data.get('username'))
             if isinstance(result, tuple):
@@ -57,7 +75,7 @@ def sync_users():
 
 @user_management_bp.route('/api/users', methods=['POST'])
 @login_required
-@admin_required
+@staff_required
 def create_user():
     try:
         payload = request.get_json() or {}
@@ -71,7 +89,7 @@ def create_user():
 
 @user_management_bp.route('/api/users/<int:user_id>', methods=['PUT'])
 @login_required
-@admin_required
+@staff_required
 def update_user(user_id):
     try:
         data = request.get_json() or {}
@@ -83,9 +101,22 @@ def update_user(user_id):
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
 
-@user_management_bp.route('/api/users/<int:user_id>', methods=['DELETE'])
+@user_management_bp.route('/api/users/bulk', methods=['POST'])
 @login_required
 @admin_required
+def bulk_update():
+    try:
+        result = bulk_update_users(request.get_json() or {})
+        if isinstance(result, tuple):
+            body, code = result
+            return jsonify(body), code
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@user_management_bp.route('/api/users/<int:user_id>', methods=['DELETE'])
+@login_required
+@staff_required
 def delete_user(user_id):
     try:
         result = delete_user_full(user_id)
@@ -95,3 +126,140 @@ def delete_user(user_id):
         return jsonify(result)
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@user_management_bp.route('/api/resellers', methods=['GET'])
+@login_required
+@admin_required
+def get_resellers():
+    return jsonify({'success': True, 'resellers': list_resellers()})
+
+@user_management_bp.route('/api/resellers', methods=['POST'])
+@login_required
+@admin_required
+def create_reseller_route():
+    try:
+        result = create_reseller(request.get_json() or {})
+        if isinstance(result, tuple):
+            body, code = result
+            return jsonify(body), code
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@user_management_bp.route('/api/resellers/<int:reseller_id>', methods=['PUT'])
+@login_required
+@admin_required
+def update_reseller_route(reseller_id):
+    try:
+        result = update_reseller(reseller_id, request.get_json() or {})
+        if isinstance(result, tuple):
+            body, code = result
+            return jsonify(body), code
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@user_management_bp.route('/api/resellers/<int:reseller_id>', methods=['DELETE'])
+@login_required
+@admin_required
+def delete_reseller_route(reseller_id):
+    try:
+        result = delete_reseller(reseller_id)
+        if isinstance(result, tuple):
+            body, code = result
+            return jsonify(body), code
+        return jsonify(result)
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+
+@user_management_bp.route('/api/audit', methods=['GET'])
+@login_required
+@admin_required
+def get_audit_events():
+    """?user_id=&action=&since=2024-01-01&until=2024-02-01T12:00&before_id=&limit=100"""
+    try:
+        args = request.args
+        since = datetime.fromisoformat(args['since']) if args.get('since') else None
+        until = datetime.fromisoformat(args['until']) if args.get('until') else None
+        events = query_events(
+            user_id=args.get('user_id', type=int),
+            action=args.get('action'),
+            since=since, until=until,
+            before_id=args.get('before_id', type=int),
+            limit=args.get('limit', 100, type=int),
+        )
+        return jsonify({'success': True, 'events': events})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+
+@user_management_bp.route('/api/reaper', methods=['GET'])
+@login_required
+@admin_required
+def get_reaped_sessions():
+    """Connection slots reclaimed by the idle reaper: totals and the latest ?limit= sessions."""
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    since = datetime.utcnow() - timedelta(hours=24)
+    total = db.session.query(db.func.count(ReapedSession.id)).scalar()
+    last_24h = (db.session.query(db.func.count(ReapedSession.id))
+                .filter(ReapedSession.created_at >= since).scalar())
+    recent = ReapedSession.query.order_by(ReapedSession.id.desc()).limit(limit).all()
+    return jsonify({
+        'success': True,
+        'reclaimed_total': total,
+        'reclaimed_24h': last_24h,
+        'sessions': [r.to_dict() for r in recent],
+    })
+
+
+@user_management_bp.route('/api/traffic/top', methods=['GET'])
+@login_required
+@admin_required
+def get_top_consumers():
+    """Top ?n= users by live rate over ?window= seconds (60, 300 or 900)."""
+    n = max(1, min(request.args.get('n', 10, type=int), 500))
+    result = top_users(n, request.args.get('window', 60, type=int))
+    if isinstance(result, tuple):
+        body, code = result
+        return jsonify(body), code
+    return jsonify(result)
+
+
+def _export_response(name, stmt, columns):
+    fmt = request.args.get('format', 'csv')
+    if fmt not in FORMATS:
+        return jsonify({'success': False, 'message': 'format must be csv or ndjson'}), 400
+    compress = request.args.get('gzip') == '1'
+    filename = f"{name}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{fmt}" + ('.gz' if compress else '')
+    return Response(
+        stream_with_context(export_stream(stmt, columns, fmt, compress)),
+        mimetype='application/gzip' if compress else FORMATS[fmt],
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Accel-Buffering': 'no',
+            'Cache-Control': 'no-store',
+        },
+    )
+
+@user_management_bp.route('/api/export/users', methods=['GET'])
+@login_required
+@admin_required
+def export_users():
+    """?format=csv|ndjson&gzip=1"""
+    return _export_response('users', users_stmt(), USER_COLUMNS)
+
+@user_management_bp.route('/api/export/sessions', methods=['GET'])
+@login_required
+@admin_required
+def export_sessions():
+    """?since=2024-01-01&until=2024-02-01&user_id=&format=csv|ndjson&gzip=1"""
+    try:
+        args = request.args
+        since = datetime.fromisoformat(args['since']) if args.get('since') else None
+        until = datetime.fromisoformat(args['until']) if args.get('until') else None
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    stmt = sessions_stmt(since, until, args.get('user_id', type=int))
+    return _export_response('sessions', stmt, SESSION_COLUMNS)
@@ -4,10 +4,15 @@ from .users import (
     create_user_full, update_user_full, delete_user_full
 )
 from .linux_orphans import list_linux_only_usernames, import_linux_user, clean_orphans
-from .sync import repair_all, repair_user
+from .sync import repair_all, repair_user, sync_quotas
+from .bulk import bulk_update_users
+from .resellers import acting_reseller, list_resellers, create_reseller, update_reseller, delete_reseller
 
 def build_users_payload():
     users_data, db_usernames, linux_usernames = _build_users_payload_core()
+    if acting_reseller() is not None:
+        # فروشنده فقط کاربران خودش را می‌بیند
+        return users_data, []
     # الحاق linux-only به خروجی نهایی
     linux_only = sorted(list(linux_usernames - db_usernames))
     for lx in linux_only:
@@ -32,3 +37,4 @@ action_repair_all = repair_all
 action_repair_user = repair_user
 action_import_linux_user = import_linux_user
 action_clean_orphans = clean_orphans
+action_sync_quotas = sync_quotas
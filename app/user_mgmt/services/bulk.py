@@ -0,0 +1,159 @@
+# app/user_mgmt/services/bulk.py
+"""
+Bulk limit / expiry / activation changes.
+
+    {"selector": {"ids": [1, 2, 3]}          # or
+                 {"filter": {"is_active": true, "expired": true,
+                             "expires_within_days": 3, "username_contains": "vip"}}  # or
+                 {"all": true},                # every managed SSH account
+     "patch": {"extend_days": 30, "expiry_days": 30, "traffic_limit": 100,
+               "max_connections": 2, "download_speed": 0,
+               "is_active": true, "reset_traffic": true, "billing_cycle_day": 1}}
+
+The patch is applied with set-based UPDATEs in one transaction (no per-user
+load/commit), the totals of the resellers owning the affected accounts are
+rebuilt in the same transaction; the nft quotas of the affected users are re-installed in one
+batch and the same quota batch is pushed to the node agents.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models import User, UserLimit
+from app.audit import audit
+from app.nodes.client import propagate
+from .quotas import QUOTA_FIELDS, sync_user_quotas, remaining_bytes
+from .limits import validate_limits
+from .resellers import recount
+
+# فیلدهایی که جمع‌های فروشنده را تغییر می‌دهند
+RESELLER_FIELDS = {'traffic_limit', 'max_connections', 'reset_traffic'}
+PATCH_FIELDS = {'expiry_days', 'extend_days', 'traffic_limit', 'max_connections',
+                'download_speed', 'is_active', 'reset_traffic', 'billing_cycle_day'}
+FILTER_FIELDS = {'is_active', 'expired', 'expires_within_days', 'username_contains'}
+
+
+def _add_days(column, days: int):
+    """`column + days` in SQL; NULL (never expires) counts from now."""
+    base = func.coalesce(column, datetime.utcnow())
+    if db.engine.dialect.name == 'sqlite':
+        return func.datetime(base, f'{days:+d} days')
+    return func.date_add(base, db.text(f'INTERVAL {days:d} DAY'))
+
+
+def _select_ids(selector: dict):
+    stmt = select(User.id).where(User.role == 'user')
+
+    if selector.get('ids') is not None:
+        ids = [int(i) for i in selector['ids']]
+        return stmt.where(User.id.in_(ids)) if ids else None
+
+    if selector.get('filter') is not None:
+        f = selector['filter']
+        unknown = set(f) - FILTER_FIELDS
+        if unknown:
+            raise ValueError(f'Unknown filter fields: {", ".join(sorted(unknown))}')
+        now = datetime.utcnow()
+        if 'is_active' in f:
+            stmt = stmt.where(User.is_active == bool(f['is_active']))
+        if f.get('username_contains'):
+            stmt = stmt.where(User.username.contains(f['username_contains']))
+        if 'expired' in f or 'expires_within_days' in f:
+            stmt = stmt.join(UserLimit, UserLimit.user_id == User.id)
+        if 'expired' in f:
+            stmt = stmt.where(UserLimit.expires_at <= now if f['expired'] else
+                              (UserLimit.expires_at.is_(None)) | (UserLimit.expires_at > now))
+        if 'expires_within_days' in f:
+            stmt = stmt.where(UserLimit.expires_at.between(now, now + timedelta(days=int(f['expires_within_days']))))
+        return stmt
+
+    if selector.get('all'):
+        return stmt
+    raise ValueError('selector must contain ids, filter or all')
+
+
+def _limit_values(patch: dict) -> dict:
+    validate_limits(patch)
+    values = {}
+    if 'traffic_limit' in patch:
+        values['traffic_limit_gb'] = int(patch['traffic_limit'])
+    if 'max_connections' in patch:
+        values['max_connections'] = int(patch['max_connections'])
+    if 'download_speed' in patch:
+        values['download_speed_mbps'] = int(patch['download_speed'])
+    if 'expiry_days' in patch:
+        values['expires_at'] = datetime.utcnow() + timedelta(days=int(patch['expiry_days']))
+    elif 'extend_days' in patch:
+        values['expires_at'] = _add_days(UserLimit.expires_at, int(patch['extend_days']))
+    if 'billing_cycle_day' in patch:
+        day = patch['billing_cycle_day']
+        values['billing_cycle_day'] = None if day in (None, '') else int(day)
+    if patch.get('reset_traffic'):
+        values['traffic_used_bytes'] = 0
+    return values
+
+
+def bulk_update_users(payload: dict):
+    selector = payload.get('selector') or {}
+    patch = payload.get('patch') or {}
+
+    unknown = set(patch) - PATCH_FIELDS
+    if unknown:
+        return {'success': False, 'message': f'Unknown patch fields: {", ".join(sorted(unknown))}'}, 400
+    if not patch:
+        return {'success': False, 'message': 'patch is empty'}, 400
+    try:
+        stmt = _select_ids(selector)
+        limit_values = _limit_values(patch)
+    except (TypeError, ValueError) as e:
+        return {'success': False, 'message': str(e)}, 400
+
+    # ids are materialised first: MySQL cannot UPDATE a table filtered by a
+    # subquery on the same table, and the quota batch needs them anyway
+    ids = db.session.execute(stmt).scalars().all() if stmt is not None else []
+    if not ids:
+        return {'success': True, 'message': 'No users matched', 'matched': 0,
+                'updated': {'users': 0, 'limits': 0}}
+
+    users_updated = limits_updated = 0
+    try:
+        if 'is_active' in patch:
+            users_updated = db.session.execute(
+                update(User).where(User.id.in_(ids))
+                .values(is_active=bool(patch['is_active']), updated_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        if limit_values:
+            limits_updated = db.session.execute(
+                update(UserLimit).where(UserLimit.user_id.in_(ids)).values(**limit_values)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+        if RESELLER_FIELDS & patch.keys():
+            recount(db.session.execute(
+                select(User.owner_id).where(User.id.in_(ids), User.owner_id.isnot(None)).distinct()
+            ).scalars().all())
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    result = {
+        'success': True,
+        'message': f'Updated {len(ids)} users',
+        'matched': len(ids),
+        'updated': {'users': users_updated, 'limits': limits_updated},
+    }
+
+    # اثر روی nft: همه‌ی quotaها در یک تراکنش، همان batch برای نودها
+    if QUOTA_FIELDS & patch.keys():
+        users = User.query.options(joinedload(User.limits)).filter(User.id.in_(ids)).all()
+        result['quotas'] = sync_user_quotas(users)
+        nodes = propagate([
+            {'op': 'quota', 'username': u.username, 'remaining_bytes': remaining_bytes(u.limits)}
+            for u in users if u.limits
+        ])
+        if nodes is not None:
+            result['nodes'] = nodes
+
+    audit('user.bulk_update', patch=patch, selector=selector, matched=len(ids))
+    return result
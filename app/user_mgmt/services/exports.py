@@ -0,0 +1,61 @@
+# app/user_mgmt/services/exports.py
+"""
+Usage exports for billing reconciliation. Rows are read with server-side
+cursors (yield_per) and streamed as CSV or NDJSON, so memory stays constant
+and the first bytes leave before the query has finished.
+"""
+from datetime import datetime
+from sqlalchemy import select
+from app.models import User, UserLimit, UserIPSession
+from app.streaming import buffered, csv_lines, gzip_stream, ndjson, stream_rows
+
+FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+USER_COLUMNS = [
+    'id', 'username', 'role', 'is_active', 'created_at', 'last_login',
+    'traffic_limit_gb', 'traffic_used_bytes', 'max_connections', 'download_speed_mbps', 'expires_at',
+    'billing_cycle_day', 'cycle_started_at',
+]
+SESSION_COLUMNS = [
+    'id', 'user_id', 'username', 'ip_address', 'session_id', 'sshd_pid',
+    'bytes_in', 'bytes_out', 'created_at', 'closed_at',
+]
+
+
+def users_stmt():
+    return (
+        select(User.id, User.username, User.role, User.is_active, User.created_at, User.last_login,
+               UserLimit.traffic_limit_gb, UserLimit.traffic_used_bytes, UserLimit.max_connections,
+               UserLimit.download_speed_mbps, UserLimit.expires_at,
+               UserLimit.billing_cycle_day, UserLimit.cycle_started_at)
+        .outerjoin(UserLimit, UserLimit.user_id == User.id)
+        .order_by(User.id)
+    )
+
+
+def sessions_stmt(since: datetime = None, until: datetime = None, user_id: int = None):
+    """Sessions opened in [since, until), optionally for one user."""
+    stmt = (
+        select(UserIPSession.id, UserIPSession.user_id, User.username, UserIPSession.ip_address,
+               UserIPSession.session_id, UserIPSession.sshd_pid, UserIPSession.bytes_in,
+               UserIPSession.bytes_out, UserIPSession.created_at, UserIPSession.closed_at)
+        .join(User, User.id == UserIPSession.user_id)
+        .order_by(UserIPSession.id)
+    )
+    if since:
+        stmt = stmt.where(UserIPSession.created_at >= since)
+    if until:
+        stmt = stmt.where(UserIPSession.created_at < until)
+    if user_id:
+        stmt = stmt.where(UserIPSession.user_id == user_id)
+    return stmt
+
+
+def export_stream(stmt, columns, fmt: str = 'csv', compress: bool = False):
+    """Chunks of the export; wrap in stream_with_context for a response."""
+    rows = stream_rows(stmt)
+    if fmt == 'ndjson':
+        lines = (ndjson(row) for row in rows)
+    else:
+        lines = csv_lines(columns, rows)
+    return gzip_stream(lines) if compress else buffered(lines)
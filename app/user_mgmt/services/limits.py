@@ -2,6 +2,15 @@
 from datetime import datetime, timedelta
 from app.models import User
 
+# ورودی‌های منفی، جمع‌های فروشنده را کم می‌کنند؛ پذیرفته نمی‌شوند
+NON_NEGATIVE_FIELDS = ('traffic_limit', 'max_connections', 'download_speed', 'expiry_days')
+
+def validate_limits(data: dict) -> None:
+    """Raise ValueError unless every limit given in `data` is an integer >= 0."""
+    for field in NON_NEGATIVE_FIELDS:
+        if field in data and int(data[field]) < 0:
+            raise ValueError(f'{field} must be >= 0')
+
 def apply_limits_updates(user: User, data: dict) -> None:
     if not user.limits:
         return
@@ -13,3 +22,8 @@ def apply_limits_updates(user: User, data: dict) -> None:
         user.limits.download_speed_mbps = int(data['download_speed'])
     if 'expiry_days' in data:
         user.limits.expires_at = datetime.utcnow() + timedelta(days=int(data['expiry_days']))
+    if 'billing_cycle_day' in data:
+        day = data['billing_cycle_day']
+        user.limits.billing_cycle_day = None if day in (None, '') else int(day)
+    if data.get('reset_traffic'):
+        user.limits.traffic_used_bytes = 0
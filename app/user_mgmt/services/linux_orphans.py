@@ -2,20 +2,22 @@
 from datetime import datetime, timedelta
 from app import db
 from app.models import User, UserLimit
-from ..linux import (
-    get_all_linux_users, check_linux_user_exists, reset_linux_password, delete_linux_user
-)
+from ..backends import get_system_backend
+from ..executor import run_per_user, succeeded, failures
+from .quotas import sync_user_quotas, drop_user_quotas
+from app.audit import audit
 
 def list_linux_only_usernames() -> list[str]:
     db_usernames = {u.username for u in User.query.all()}
-    linux_usernames = set(get_all_linux_users())
+    linux_usernames = set(get_system_backend().list_users())
     return sorted(list(linux_usernames - db_usernames))
 
 def import_linux_user(username: str):
     username = (username or '').strip()
     if not username:
         return {'success': False, 'message': 'username is required'}, 400
-    if not check_linux_user_exists(username):
+    backend = get_system_backend()
+    if not backend.user_exists(username):
         return {'success': False, 'message': 'Linux user not found'}, 404
     if User.query.filter_by(username=username).first():
         return {'success': False, 'message': 'User already exists in database'}, 400
@@ -23,7 +25,7 @@ def import_linux_user(username: str):
     # پسورد جدید روی لینوکس تا ادمین credential داشته باشد
     from ..utils import generate_random_password
     new_password = generate_random_password()
-    ok, msg = reset_linux_password(username, new_password)
+    ok, msg = backend.reset_password(username, new_password)
     if not ok:
         return {'success': False, 'message': msg}, 500
 
@@ -36,13 +38,16 @@ def import_linux_user(username: str):
     expires_at = datetime.utcnow() + timedelta(days=30)
     limits = UserLimit(
         user_id=new_user.id,
-        traffic_limit_gb=50, traffic_used_gb=0.0,
+        traffic_limit_gb=50, traffic_used_bytes=0,
         max_connections=2, download_speed_mbps=0,
         expires_at=expires_at
     )
     db.session.add(limits)
     db.session.commit()
 
+    sync_user_quotas([new_user])
+    audit('user.import', target=new_user)
+
     return {
         'success': True,
         'message': 'Linux user imported to DB',
@@ -55,12 +60,14 @@ def import_linux_user(username: str):
     }
 
 def clean_orphans():
-    linux_users = get_all_linux_users()
-    db_usernames = [u.username for u in User.query.all()]
+    backend = get_system_backend()
+    linux_users = backend.list_users()
+    db_usernames = {u.username for u in User.query.all()}
     orphans = [u for u in linux_users if u not in db_usernames]
-    cleaned = 0
-    for username in orphans:
-        ok, _ = delete_linux_user(username)
-        if ok:
-            cleaned += 1
-    return {'success': True, 'message': f'Cleaned {cleaned} orphaned users'}
+    # quota object and map element go first, while the UIDs still exist
+    drop_user_quotas(orphans)
+    results = run_per_user((username, backend.delete_user, username) for username in orphans)
+    cleaned = succeeded(results)
+    audit('sync.clean_orphans', cleaned=cleaned, errors=failures(results))
+    return {'success': True, 'message': f'Cleaned {len(cleaned)} orphaned users',
+            'cleaned': cleaned, 'errors': failures(results)}
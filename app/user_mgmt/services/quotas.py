@@ -0,0 +1,76 @@
+# app/user_mgmt/services/quotas.py
+from sqlalchemy.orm import joinedload
+from app.models import User
+from ..backends import get_system_backend
+
+# فیلدهایی که تغییرشان نیاز به sync مجدد quota در nft دارد
+QUOTA_FIELDS = {'traffic_limit', 'reset_traffic'}
+
+
+def remaining_bytes(limits) -> int:
+    return limits.traffic_remaining_bytes
+
+
+def sync_user_quotas(users) -> dict:
+    """
+    Re-install the nft quota of every given user in one batched transaction.
+    With node agents this host only gets its share of the remaining bytes
+    (see app.nodes.client).
+    """
+    from app.nodes.client import host_count, quota_share
+    backend = get_system_backend()
+    hosts = host_count()
+    quotas = {}
+    skipped = 0
+    for user in users:
+        if user.role != 'user' or not user.limits:
+            continue
+        if not backend.user_exists(user.username):
+            skipped += 1
+            continue
+        quotas[user.username] = quota_share(remaining_bytes(user.limits), hosts)
+
+    ok, msg = backend.apply_quotas(quotas)
+    return {'success': ok, 'message': msg, 'synced': len(quotas) if ok else 0, 'skipped': skipped}
+
+
+def sync_all_quotas() -> dict:
+    """Re-install every user's quota here and push the same batch to the node agents."""
+    from app.nodes.client import propagate
+    users = User.query.options(joinedload(User.limits)).filter(User.role == 'user').all()
+    result = sync_user_quotas(users)
+    nodes = propagate([
+        {'op': 'quota', 'username': u.username, 'remaining_bytes': remaining_bytes(u.limits)}
+        for u in users if u.limits
+    ])
+    if nodes is not None:
+        result['nodes'] = nodes
+    return result
+
+
+def init_quotas(app):
+    import click
+
+    @app.cli.group('quotas')
+    def quotas_cli():
+        """nft traffic quota maintenance."""
+
+    @quotas_cli.command('sync')
+    def sync_command():
+        """Re-install the enforcement rule and every user's quota (boot, after `nft flush`)."""
+        result = sync_all_quotas()
+        click.echo(f"{result['message']} (skipped {result['skipped']})")
+        if not result['success']:
+            raise SystemExit(1)
+
+
+def drop_user_quota(username: str) -> None:
+    """Remove the quota of a Linux user; must run before the user (and its UID) is deleted."""
+    drop_user_quotas([username])
+
+
+def drop_user_quotas(usernames) -> None:
+    """drop_user_quota for many users in one nft transaction."""
+    usernames = list(usernames)
+    if usernames:
+        get_system_backend().apply_quotas({}, removed=usernames)
@@ -0,0 +1,209 @@
+# app/user_mgmt/services/resellers.py
+"""
+Resellers: panel accounts (role 'reseller', no Linux user) that own SSH
+accounts within a budget of accounts, allocated traffic and connections.
+
+The totals in `reseller_quotas` are maintained incrementally: `reserve` /
+`release` move them by the change of one account in a single conditional
+UPDATE of the reseller's row, so a quota check never depends on how many
+accounts the reseller has. The traffic daemon adds usage deltas the same way.
+`recount` rebuilds the totals from scratch with set-based subqueries (bulk
+changes, restore, `flask resellers recount`).
+
+Quotas bind the reseller's own requests; changes made by an admin are never
+refused, but still move the totals.
+"""
+import click
+from flask import has_request_context
+from flask_login import current_user
+from sqlalchemy import case, func, select, update
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models import User, UserLimit, ResellerQuota
+from app.audit import audit
+
+LIMIT_FIELDS = {'max_users', 'traffic_quota_gb', 'connection_quota'}
+
+_quotas = ResellerQuota.__table__
+
+
+def acting_reseller():
+    """The logged-in reseller, or None for admins / CLI / daemons."""
+    if has_request_context() and current_user.is_authenticated and current_user.role == 'reseller':
+        return current_user
+    return None
+
+
+def scoped_users():
+    """User query limited to the accounts the logged-in panel user may manage."""
+    query = User.query
+    reseller = acting_reseller()
+    if reseller is not None:
+        query = query.filter(User.owner_id == reseller.id)
+    return query
+
+
+def reserve(reseller_id: int, users: int = 0, traffic_gb: int = 0, connections: int = 0,
+            used_bytes: int = 0, enforce: bool = True) -> bool:
+    """
+    Add to a reseller's totals (negative values free capacity). With
+    `enforce`, growing totals must stay within the limits and shrinking ones
+    at or above 0, otherwise nothing changes and False is returned; without
+    it totals are clamped at 0. Part of the caller's transaction.
+    """
+    c = _quotas.c
+    conditions = [c.reseller_id == reseller_id]
+    values = {}
+    for name, delta, total, limit in (('users_count', users, c.users_count, c.max_users),
+                                      ('traffic_allocated_gb', traffic_gb, c.traffic_allocated_gb, c.traffic_quota_gb),
+                                      ('connections_allocated', connections, c.connections_allocated, c.connection_quota)):
+        if not delta:
+            continue
+        if enforce and delta > 0:
+            conditions.append((limit == 0) | (total + delta <= limit))
+        elif enforce:
+            conditions.append(total + delta >= 0)
+        values[name] = total + delta if enforce else case((total + delta > 0, total + delta), else_=0)
+    if used_bytes:
+        values['traffic_used_bytes'] = case(
+            (c.traffic_used_bytes + used_bytes > 0, c.traffic_used_bytes + used_bytes), else_=0)
+    if not values:
+        return True
+    return db.session.execute(update(_quotas).where(*conditions).values(**values)).rowcount == 1
+
+
+def release(reseller_id: int, limits) -> None:
+    """Give back everything one owned account held (account deleted or moved away)."""
+    reserve(reseller_id, users=-1,
+            traffic_gb=-(limits.traffic_limit_gb if limits else 0),
+            connections=-(limits.max_connections if limits else 0),
+            used_bytes=-(limits.traffic_used_bytes if limits else 0),
+            enforce=False)
+
+
+def claim(reseller_id: int, limits, enforce: bool = True) -> bool:
+    """Count one account (with its limits) against a reseller."""
+    return reserve(reseller_id, users=1,
+                   traffic_gb=limits.traffic_limit_gb if limits else 0,
+                   connections=limits.max_connections if limits else 0,
+                   used_bytes=limits.traffic_used_bytes if limits else 0,
+                   enforce=enforce)
+
+
+def recount(reseller_ids=None) -> int:
+    """Rebuild the totals of the given resellers (all if None) from their accounts."""
+    c = _quotas.c
+    owned = select(User.id).where(User.owner_id == c.reseller_id)
+
+    def limits_sum(column):
+        return (select(func.coalesce(func.sum(column), 0))
+                .where(UserLimit.user_id.in_(owned)).scalar_subquery())
+
+    stmt = update(_quotas).values(
+        users_count=select(func.count(User.id)).where(User.owner_id == c.reseller_id).scalar_subquery(),
+        traffic_allocated_gb=limits_sum(UserLimit.traffic_limit_gb),
+        connections_allocated=limits_sum(UserLimit.max_connections),
+        traffic_used_bytes=limits_sum(UserLimit.traffic_used_bytes),
+    )
+    if reseller_ids is not None:
+        reseller_ids = list(reseller_ids)
+        if not reseller_ids:
+            return 0
+        stmt = stmt.where(c.reseller_id.in_(reseller_ids))
+    return db.session.execute(stmt).rowcount
+
+
+# ---- admin endpoints -------------------------------------------------------
+
+def _limit_values(data: dict) -> dict:
+    values = {}
+    for field in LIMIT_FIELDS & data.keys():
+        value = int(data[field] or 0)
+        if value < 0:
+            raise ValueError(f'{field} must be >= 0')
+        values[field] = value
+    return values
+
+
+def _reseller_dict(user: User) -> dict:
+    return {
+        'id': user.id,
+        'username': user.username,
+        'is_active': user.is_active,
+        'created_at': user.created_at.strftime('%Y-%m-%d %H:%M'),
+        'last_login': user.last_login.strftime('%Y-%m-%d %H:%M') if user.last_login else None,
+        'quota': user.reseller_quota.to_dict() if user.reseller_quota else None,
+    }
+
+
+def list_resellers() -> list:
+    resellers = (User.query.filter(User.role == 'reseller')
+                 .options(joinedload(User.reseller_quota)).order_by(User.username).all())
+    return [_reseller_dict(r) for r in resellers]
+
+
+def create_reseller(payload: dict):
+    username = (payload.get('username') or '').strip()
+    password = payload.get('password') or ''
+    if not username or len(username) < 3:
+        return {'success': False, 'message': 'Username must be at least 3 characters'}, 400
+    if len(password) < 6:
+        return {'success': False, 'message': 'Password must be at least 6 characters'}, 400
+    if User.query.filter_by(username=username).first():
+        return {'success': False, 'message': 'Username already exists in database'}, 400
+    try:
+        limits = _limit_values(payload)
+    except (TypeError, ValueError) as e:
+        return {'success': False, 'message': str(e)}, 400
+
+    reseller = User(username=username, role='reseller', is_active=True)
+    reseller.set_password(password)
+    reseller.reseller_quota = ResellerQuota(**limits)
+    db.session.add(reseller)
+    db.session.commit()
+    audit('reseller.create', target=reseller, **limits)
+    return {'success': True, 'message': 'Reseller created successfully', 'reseller': _reseller_dict(reseller)}
+
+
+def update_reseller(reseller_id: int, data: dict):
+    reseller = User.query.filter_by(id=reseller_id, role='reseller').first_or_404()
+    try:
+        limits = _limit_values(data)
+    except (TypeError, ValueError) as e:
+        return {'success': False, 'message': str(e)}, 400
+
+    if reseller.reseller_quota is None:
+        reseller.reseller_quota = ResellerQuota()
+    for field, value in limits.items():
+        setattr(reseller.reseller_quota, field, value)
+    if data.get('password'):
+        reseller.set_password(data['password'])
+    if 'is_active' in data:
+        reseller.is_active = bool(data['is_active'])
+    db.session.commit()
+    audit('reseller.update', target=reseller, changes={k: v for k, v in data.items() if k != 'password'})
+    return {'success': True, 'message': 'Reseller updated successfully', 'reseller': _reseller_dict(reseller)}
+
+
+def delete_reseller(reseller_id: int):
+    reseller = User.query.filter_by(id=reseller_id, role='reseller').first_or_404()
+    if reseller.reseller_quota and reseller.reseller_quota.users_count:
+        return {'success': False,
+                'message': 'Reseller still owns users; delete or reassign them first'}, 409
+    audit('reseller.delete', target=reseller)
+    db.session.delete(reseller)
+    db.session.commit()
+    return {'success': True, 'message': 'Reseller deleted successfully'}
+
+
+def init_resellers(app):
+    @app.cli.group('resellers')
+    def resellers_cli():
+        """Reseller maintenance."""
+
+    @resellers_cli.command('recount')
+    def recount_command():
+        """Rebuild every reseller's totals from the accounts it owns."""
+        count = recount()
+        db.session.commit()
+        click.echo(f'Recounted {count} resellers')
@@ -1,25 +1,40 @@
 # app/user_mgmt/services/sync.py
 from app.models import User
 from ..utils import generate_random_password
-from ..linux import check_linux_user_exists, create_linux_user
+from ..backends import get_system_backend
+from ..executor import run_per_user, succeeded, failures
+from .quotas import sync_user_quotas, sync_all_quotas
+from app.audit import audit
 
 def repair_all():
-    users = User.query.filter(User.role != 'admin').all()
-    repaired = 0
-    for user in users:
-        if not check_linux_user_exists(user.username):
-            password = generate_random_password()
-            ok, _ = create_linux_user(user.username, password)
-            if ok:
-                repaired += 1
-    return {'success': True, 'message': f'Repaired {repaired} users'}
+    backend = get_system_backend()
+    users = User.query.filter(User.role == 'user').all()
+    missing = {u.username: u for u in users if not backend.user_exists(u.username)}
+    results = run_per_user(
+        (username, backend.create_user, username, generate_random_password())
+        for username in missing
+    )
+    repaired = [missing[u] for u in succeeded(results)]
+    # UIDهای جدید → quota جدید، همه در یک تراکنش nft
+    sync_user_quotas(repaired)
+    audit('sync.repair_all', repaired=[u.username for u in repaired], errors=failures(results))
+    return {'success': True, 'message': f'Repaired {len(repaired)} users',
+            'repaired': [u.username for u in repaired], 'errors': failures(results)}
 
 def repair_user(user_id: int):
     user = User.query.get_or_404(user_id)
-    if not check_linux_user_exists(user.username):
+    backend = get_system_backend()
+    if not backend.user_exists(user.username):
         password = generate_random_password()
-        ok, msg = create_linux_user(user.username, password)
+        ok, msg = backend.create_user(user.username, password)
         if ok:
+            sync_user_quotas([user])
+            audit('sync.repair_user', target=user)
             return {'success': True, 'message': 'User repaired', 'password': password}
         return {'success': False, 'message': msg}, 500
     return {'success': True, 'message': 'User already exists in Linux'}
+
+def sync_quotas():
+    result = sync_all_quotas()
+    audit('sync.quotas', **result)
+    return result
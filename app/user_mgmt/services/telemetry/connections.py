@@ -4,11 +4,15 @@ from typing import Protocol
 
 class ConnectionsProvider(Protocol):
     def get_current_connections(self, username: str) -> int: ...
+    def get_all_connections(self) -> dict[str, int]: ...
 
 class NullConnections(ConnectionsProvider):
     def get_current_connections(self, username: str) -> int:
         return 0
 
+    def get_all_connections(self) -> dict[str, int]:
+        return {}
+
 class WhoConnections(ConnectionsProvider):
     """Get current SSH connections using 'who' command (works only with shell sessions)"""
     
@@ -23,6 +27,20 @@ class WhoConnections(ConnectionsProvider):
         except Exception as e:
             return 0
 
+    def get_all_connections(self) -> dict[str, int]:
+        try:
+            result = subprocess.run(['who'], capture_output=True, text=True, timeout=5)
+            if result.returncode != 0:
+                return {}
+            counts: dict[str, int] = {}
+            for line in result.stdout.split('\n'):
+                if line.strip():
+                    user = line.split()[0]
+                    counts[user] = counts.get(user, 0) + 1
+            return counts
+        except Exception:
+            return {}
+
 class SsConnectionsImproved(ConnectionsProvider):
     """Get current SSH connections using 'ss' with process info (most accurate for SFTP/tunnel users)"""
     
@@ -60,6 +78,38 @@ class SsConnectionsImproved(ConnectionsProvider):
         except Exception as e:
             return 0
 
+    def get_all_connections(self) -> dict[str, int]:
+        """All users at once: one `ss` call and one `ps` call instead of one per pid."""
+        try:
+            import re
+
+            result = subprocess.run(
+                ['/usr/bin/sudo', '/usr/bin/ss', '-tnp', 'state', 'established', '( sport = :22 )'],
+                capture_output=True,
+                text=True,
+                timeout=5
+            )
+            if result.returncode != 0:
+                return {}
+
+            pids = sorted(set(re.findall(r'pid=(\d+)', result.stdout)))
+            if not pids:
+                return {}
+
+            # user:64 - plain `user` prints the UID for names longer than 8 chars
+            ps_result = subprocess.run(
+                ['/usr/bin/ps', '-o', 'user:64=', '-p', ','.join(pids)],
+                capture_output=True,
+                text=True,
+                timeout=5
+            )
+            counts: dict[str, int] = {}
+            for user in ps_result.stdout.split():
+                counts[user] = counts.get(user, 0) + 1
+            return counts
+        except Exception:
+            return {}
+
 _provider: ConnectionsProvider = SsConnectionsImproved()
 
 def set_connections_provider(provider: ConnectionsProvider) -> None:
@@ -67,4 +117,7 @@ def set_connections_provider(provider: ConnectionsProvider) -> None:
     _provider = provider
 
 def get_conns(username: str) -> int:
-    return _provider.get_current_connections(username)
\ No newline at end of file
+    return _provider.get_current_connections(username)
+
+def get_all_conns() -> dict[str, int]:
+    return _provider.get_all_connections()
\ No newline at end of file
@@ -0,0 +1,61 @@
+# app/user_mgmt/services/telemetry/rates.py
+"""
+Live per-user rates, published by the traffic daemon (RATES_FILE) every pass
+as {"generated_at", "windows": [60, 300, 900], "users": {name: [B/s, ...]}}.
+A request only reads the file when it changed (mtime) and picks the top N
+with a heap.
+"""
+import heapq
+import json
+import os
+import threading
+import time
+from flask import current_app
+
+# the daemon writes every ~5 s; older data means it is not running
+STALE_AFTER = 30
+
+_lock = threading.Lock()
+_cache = {'mtime': None, 'data': None}
+
+
+def _read_rates() -> dict | None:
+    path = current_app.config['RATES_FILE']
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    with _lock:
+        if mtime != _cache['mtime']:
+            try:
+                with open(path) as f:
+                    _cache['data'] = json.load(f)
+                _cache['mtime'] = mtime
+            except (OSError, ValueError):
+                # caught mid-replace or truncated: keep the previous data
+                pass
+        return _cache['data']
+
+
+def top_users(n: int = 10, window: int = 60) -> dict:
+    data = _read_rates()
+    if data is None:
+        return {'success': False, 'message': 'No rate data yet (is the traffic daemon running?)'}, 503
+    windows = data.get('windows') or []
+    if window not in windows:
+        return {'success': False, 'message': f'window must be one of {", ".join(map(str, windows))}'}, 400
+    idx = windows.index(window)
+
+    top = heapq.nlargest(n, data.get('users', {}).items(), key=lambda item: item[1][idx])
+    age = time.time() - data.get('generated_at', 0)
+    return {
+        'success': True,
+        'window': window,
+        'generated_at': data.get('generated_at'),
+        'stale': age > STALE_AFTER,
+        'users': [
+            {'username': name,
+             'mbps': {str(w): round(r * 8 / 1e6, 3) for w, r in zip(windows, rates)}}
+            for name, rates in top
+        ],
+    }
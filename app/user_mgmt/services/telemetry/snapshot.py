@@ -0,0 +1,146 @@
+# app/user_mgmt/services/telemetry/snapshot.py
+"""
+Process-local telemetry snapshot.
+
+One refresh = one query over users/limits, one range read of the per-user
+daily totals (user_traffic_daily) and one bulk connections scan; every reader in between gets a dict
+lookup. The dashboard summary (counts by state, live connections, traffic
+today) is derived from the same data at refresh time. Only one thread
+refreshes at a time, the others keep serving the previous snapshot.
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models import GB, User, TrafficDaily, UserTrafficDaily
+from .connections import get_all_conns
+
+DEFAULT_TTL = 30
+RECENT_DAYS = 7
+
+_lock = threading.Lock()
+_snapshot = None
+_built_at = 0.0
+
+
+def _ttl() -> float:
+    if has_app_context():
+        return float(current_app.config.get('TELEMETRY_SNAPSHOT_TTL', DEFAULT_TTL))
+    return DEFAULT_TTL
+
+
+def _recent_usage(since: datetime) -> dict[int, dict[str, float]]:
+    # filled by the traffic daemon on the day the bytes were counted, so a
+    # session spanning several days is split across them
+    rows = (
+        db.session.query(UserTrafficDaily.user_id, UserTrafficDaily.day, UserTrafficDaily.bytes)
+        .filter(UserTrafficDaily.day >= since.date())
+        .all()
+    )
+    usage: dict[int, dict[str, float]] = {}
+    for user_id, d, total in rows:
+        usage.setdefault(user_id, {})[d.strftime('%Y-%m-%d')] = round((total or 0) / GB, 3)
+    return usage
+
+
+def _user_entry(user: User, connections: int, usage: dict[str, float], now: datetime) -> dict:
+    entry = {
+        'id': user.id,
+        'username': user.username,
+        'is_active': user.is_active,
+        'current_connections': connections,
+        'limits': None,
+        'recent_usage': [
+            {'date': d, 'traffic_gb': usage.get(d, 0.0)}
+            for d in ((now - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(RECENT_DAYS - 1, -1, -1))
+        ],
+    }
+    limits = user.limits
+    if limits:
+        entry['limits'] = {
+            'traffic_limit_gb': limits.traffic_limit_gb,
+            'traffic_used_gb': round(limits.traffic_used_gb, 3),
+            'traffic_used_bytes': limits.traffic_used_bytes,
+            'traffic_remaining_gb': round(limits.traffic_remaining_gb, 3),
+            'max_connections': limits.max_connections,
+            'download_speed_mbps': limits.download_speed_mbps,
+            'expires_at': limits.expires_at.strftime('%Y-%m-%d') if limits.expires_at else None,
+            'days_left': max(0, (limits.expires_at - now).days) if limits.expires_at else None,
+            'is_expired': limits.is_expired,
+        }
+    return entry
+
+
+def _summary(users, connections: dict, now: datetime) -> dict:
+    summary = {
+        'users': {'total': 0, 'active': 0, 'inactive': 0, 'expired': 0, 'over_quota': 0,
+                  'admins': 0, 'resellers': 0},
+        'connections': 0,
+        'traffic_today_bytes': 0,
+    }
+    counts = summary['users']
+    for user in users:
+        if user.role != 'user':
+            counts['admins' if user.role == 'admin' else 'resellers'] += 1
+            continue
+        counts['total'] += 1
+        counts['active' if user.is_active else 'inactive'] += 1
+        limits = user.limits
+        if limits:
+            if limits.is_expired:
+                counts['expired'] += 1
+            if limits.traffic_used_bytes > limits.traffic_limit_bytes:
+                counts['over_quota'] += 1
+        summary['connections'] += connections.get(user.username, 0)
+
+    today = db.session.get(TrafficDaily, now.date())
+    summary['traffic_today_bytes'] = today.bytes if today else 0
+    return summary
+
+
+def build_snapshot() -> dict:
+    now = datetime.utcnow()
+    users = User.query.options(joinedload(User.limits)).all()
+    connections = get_all_conns()
+    usage = _recent_usage(now - timedelta(days=RECENT_DAYS))
+
+    entries = {
+        u.username: _user_entry(u, connections.get(u.username, 0), usage.get(u.id, {}), now)
+        for u in users
+    }
+    return {'built_at': now.strftime('%Y-%m-%d %H:%M:%S'), 'users': entries,
+            'summary': _summary(users, connections, now)}
+
+
+def get_snapshot(force: bool = False) -> dict:
+    global _snapshot, _built_at
+    if not force and _snapshot is not None and time.monotonic() - _built_at < _ttl():
+        return _snapshot
+
+    # non-blocking: if someone else is refreshing, serve the previous snapshot
+    if not _lock.acquire(blocking=_snapshot is None or force):
+        return _snapshot
+    try:
+        if force or _snapshot is None or time.monotonic() - _built_at >= _ttl():
+            _snapshot = build_snapshot()
+            _built_at = time.monotonic()
+        return _snapshot
+    finally:
+        _lock.release()
+
+
+def get_summary() -> dict:
+    """Dashboard summary from the cached snapshot."""
+    snapshot = get_snapshot()
+    return dict(snapshot['summary'], snapshot_at=snapshot['built_at'])
+
+
+def get_user_usage(username: str):
+    """Cached usage entry of one user (None if unknown)."""
+    snapshot = get_snapshot()
+    entry = snapshot['users'].get(username)
+    if entry is None:
+        return None
+    return dict(entry, snapshot_at=snapshot['built_at'])
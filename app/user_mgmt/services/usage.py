@@ -0,0 +1,116 @@
+# app/user_mgmt/services/usage.py
+"""
+Usage / limits / expiry for external billing systems (token API).
+
+Every selection is an indexed lookup: ids (primary key), usernames (unique
+index), `changed_since` (users.updated_at / user_limits.updated_at, bumped by
+the panel and by the traffic daemon on every usage update) or an `after_id`
+page of everything for the first full sync. Live connection counts come from
+the cached telemetry snapshot, never from a fresh `ss` scan.
+
+`updated_at` is stamped before the row is committed (the daemon stamps a
+whole pass, the ORM at flush), so a change can become visible with a time
+slightly in the past. `next_changed_since` therefore lags the server clock
+by USAGE_WATERMARK_LAG seconds: consecutive polls overlap, and clients must
+dedupe users by (id, updated_at) and deletions by id.
+
+`deleted` lists the deletions since `changed_since` oldest first, one page
+at a time: when `next_deleted_after_id` is present, ask again with it as
+`deleted_after_id` (same `changed_since`) for the rest.
+"""
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import or_, select
+from app import db
+from app.audit import audit_query_max, query_events
+from app.models import GB, User, UserLimit
+from .telemetry.snapshot import get_snapshot
+
+MAX_BATCH = 1000
+DEFAULT_PAGE = 500
+
+
+def _parse_time(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value).replace('Z', ''))
+
+
+def _row_dict(row, now: datetime, snapshot: dict) -> dict:
+    limit_bytes = row.traffic_limit_gb * GB if row.traffic_limit_gb is not None else None
+    live = snapshot['users'].get(row.username)
+    updated = max(filter(None, (row.updated_at, row.limits_updated_at)), default=None)
+    return {
+        'id': row.id,
+        'username': row.username,
+        'is_active': row.is_active,
+        'owner_id': row.owner_id,
+        'traffic_used_bytes': row.traffic_used_bytes,
+        'traffic_limit_gb': row.traffic_limit_gb,
+        'traffic_limit_bytes': limit_bytes,
+        'traffic_remaining_bytes': max(0, limit_bytes - (row.traffic_used_bytes or 0)) if limit_bytes is not None else None,
+        'max_connections': row.max_connections,
+        'current_connections': live['current_connections'] if live else None,
+        'expires_at': row.expires_at.strftime('%Y-%m-%dT%H:%M:%S') if row.expires_at else None,
+        'is_expired': bool(row.expires_at and now > row.expires_at),
+        'billing_cycle_day': row.billing_cycle_day,
+        'updated_at': updated.strftime('%Y-%m-%dT%H:%M:%S') if updated else None,
+    }
+
+
+def query_usage(ids=None, usernames=None, changed_since=None, after_id=None, limit=DEFAULT_PAGE,
+                deleted_after_id=None):
+    try:
+        changed_since = _parse_time(changed_since)
+        ids = [int(i) for i in ids] if ids is not None else None
+        after_id = int(after_id) if after_id is not None else None
+        deleted_after_id = int(deleted_after_id) if deleted_after_id is not None else None
+        limit = max(1, min(int(limit), MAX_BATCH))
+    except (TypeError, ValueError) as e:
+        return {'success': False, 'message': f'Invalid parameter: {e}'}, 400
+    for name, batch in (('ids', ids), ('usernames', usernames)):
+        if batch is not None and len(batch) > MAX_BATCH:
+            return {'success': False, 'message': f'At most {MAX_BATCH} {name} per request'}, 400
+
+    now = datetime.utcnow()
+    # not `now`: rows stamped earlier may still be committed after this query
+    watermark = now - timedelta(seconds=current_app.config.get('USAGE_WATERMARK_LAG', 120))
+    stmt = (
+        select(User.id, User.username, User.is_active, User.owner_id, User.updated_at,
+               UserLimit.traffic_used_bytes, UserLimit.traffic_limit_gb, UserLimit.max_connections,
+               UserLimit.expires_at, UserLimit.billing_cycle_day,
+               UserLimit.updated_at.label('limits_updated_at'))
+        .outerjoin(UserLimit, UserLimit.user_id == User.id)
+        .where(User.role == 'user')
+    )
+    if ids is not None:
+        stmt = stmt.where(User.id.in_(ids))
+    if usernames is not None:
+        stmt = stmt.where(User.username.in_([str(u) for u in usernames]))
+    if changed_since is not None:
+        stmt = stmt.where(or_(User.updated_at >= changed_since, UserLimit.updated_at >= changed_since))
+    if after_id is not None:
+        stmt = stmt.where(User.id > after_id)
+    rows = db.session.execute(stmt.order_by(User.id).limit(limit)).all()
+
+    snapshot = get_snapshot()
+    result = {
+        'success': True,
+        'server_time': now.strftime('%Y-%m-%dT%H:%M:%S.%f'),
+        'next_changed_since': watermark.strftime('%Y-%m-%dT%H:%M:%S.%f'),
+        'users': [_row_dict(r, now, snapshot) for r in rows],
+        'snapshot_at': snapshot['built_at'],
+    }
+    if len(rows) == limit:
+        result['next_after_id'] = rows[-1].id
+    if changed_since is not None:
+        page = min(MAX_BATCH, audit_query_max())
+        events = query_events(action='user.delete', since=changed_since, after_id=deleted_after_id,
+                              oldest_first=True, limit=page)
+        result['deleted'] = [
+            {'id': e['target_user_id'], 'username': e['target'], 'deleted_at': e['created_at'].replace(' ', 'T')}
+            for e in events
+        ]
+        if len(events) == page:
+            result['next_deleted_after_id'] = events[-1]['id']
+    return result
@@ -1,20 +1,23 @@
 # app/user_mgmt/services/users.py
 from datetime import datetime, timedelta
 from flask_babel import gettext as _
+from sqlalchemy.orm import joinedload
 from app import db
 from app.models import User, UserLimit
-from ..linux import (
-    get_all_linux_users, check_linux_user_exists, reset_linux_password,
-    rename_linux_user, delete_linux_user
-)
-from .limits import apply_limits_updates
+from ..backends import get_system_backend
+from .limits import apply_limits_updates, validate_limits
+from .resellers import acting_reseller, scoped_users, reserve, release, claim
+from .quotas import QUOTA_FIELDS, sync_user_quotas, drop_user_quota, remaining_bytes
+from app.nodes.client import propagate
+from app.audit import audit
 from ..utils import generate_random_password
-from .telemetry.traffic import get_traffic_gb
 from .telemetry.connections import get_conns
 
 def build_users_payload():
-    db_users = User.query.all()
-    linux_usernames = set(get_all_linux_users())
+    # فروشنده‌ها کاربر لینوکسی ندارند و جدا (api/resellers) نمایش داده می‌شوند
+    # limits در همان کوئری خوانده می‌شود (بدون N+1)
+    db_users = scoped_users().filter(User.role != 'reseller').options(joinedload(User.limits)).all()
+    linux_usernames = set(get_system_backend().list_users())
     db_usernames = {u.username for u in db_users}
 
     users_data = []
@@ -31,6 +34,7 @@ def build_users_payload():
             'id': user.id,
             'username': user.username,
             'role': user.role,
+            'owner_id': user.owner_id,
             'is_active': user.is_active,
             'created_at': user.created_at.strftime('%Y-%m-%d %H:%M'),
             'last_login': user.last_login.strftime('%Y-%m-%d %H:%M') if user.last_login else _('Never'),
@@ -39,19 +43,15 @@ def build_users_payload():
         }
 
         if user.limits:
-            current_traffic = get_traffic_gb(user.username)
-            if current_traffic != user.limits.traffic_used_gb:
-                user.limits.traffic_used_gb = current_traffic
-                db.session.commit()
-
-            over_traffic = (user.limits.traffic_limit_gb is not None and
-                            current_traffic > (user.limits.traffic_limit_gb or 0))
+            over_traffic = user.limits.traffic_used_bytes > user.limits.traffic_limit_bytes
             is_expired = bool(user.limits.is_expired)
             max_conns = user.limits.max_connections
 
             data['limits'] = {
                 'traffic_limit_gb': user.limits.traffic_limit_gb,
-                'traffic_used_gb': user.limits.traffic_used_gb,
+                'traffic_used_gb': round(user.limits.traffic_used_gb, 3),
+                'traffic_used_bytes': user.limits.traffic_used_bytes,
+                'billing_cycle_day': user.limits.billing_cycle_day,
                 'max_connections': user.limits.max_connections,
                 'download_speed_mbps': user.limits.download_speed_mbps,
                 'expires_at': user.limits.expires_at.strftime('%Y-%m-%d') if user.limits.expires_at else None,
@@ -69,29 +69,53 @@ def build_users_payload():
     # Linux-only (ردیف‌های مصنوعی) اینجا اضافه نمی‌کنیم؛ در linux_orphans انجام می‌شود
     return users_data, db_usernames, linux_usernames
 
+def _with_nodes(result: dict, ops: list) -> dict:
+    # همان تغییرات روی node agentها هم اعمال می‌شود (اگر نودی تعریف شده باشد)
+    nodes = propagate(ops)
+    if nodes is not None:
+        result['nodes'] = nodes
+    return result
+
 def create_user_full(payload: dict):
     username = payload.get('username', '').strip()
     password = payload.get('password') or generate_random_password()
-    traffic_limit = int(payload.get('traffic_limit', 50))
-    max_connections = int(payload.get('max_connections', 2))
-    download_speed = int(payload.get('download_speed', 0))
-    expiry_days = int(payload.get('expiry_days', 30))
+    try:
+        validate_limits(payload)
+        traffic_limit = int(payload.get('traffic_limit', 50))
+        max_connections = int(payload.get('max_connections', 2))
+        download_speed = int(payload.get('download_speed', 0))
+        expiry_days = int(payload.get('expiry_days', 30))
+    except (TypeError, ValueError) as e:
+        return {'success': False, 'message': str(e)}, 400
 
     if not username or len(username) < 3:
         return {'success': False, 'message': 'Username must be at least 3 characters'}, 400
     if User.query.filter_by(username=username).first():
         return {'success': False, 'message': 'Username already exists in database'}, 400
-    if check_linux_user_exists(username):
+    backend = get_system_backend()
+    if backend.user_exists(username):
         return {'success': False, 'message': 'Username already exists in system'}, 400
 
+    # کاربرِ ساخته‌شده توسط فروشنده مال خود اوست؛ ادمین می‌تواند owner_id بدهد
+    reseller = acting_reseller()
+    owner_id = reseller.id if reseller else payload.get('owner_id')
+    if owner_id:
+        owner_id = int(owner_id)
+        if reseller is None and not User.query.filter_by(id=owner_id, role='reseller').first():
+            return {'success': False, 'message': 'Unknown reseller'}, 400
+        if not reserve(owner_id, users=1, traffic_gb=traffic_limit, connections=max_connections,
+                       enforce=reseller is not None):
+            db.session.rollback()
+            return {'success': False, 'message': 'Reseller quota exceeded'}, 403
+
     # ایجاد کاربر لینوکسی
-    from ..linux import create_linux_user
-    ok, msg = create_linux_user(username, password)
+    ok, msg = backend.create_user(username, password)
     if not ok:
+        db.session.rollback()
         return {'success': False, 'message': msg}, 500
 
     # ایجاد رکورد DB
-    new_user = User(username=username, role='user', is_active=True)
+    new_user = User(username=username, role='user', is_active=True, owner_id=owner_id or None)
     new_user.set_password(password)
     db.session.add(new_user)
     db.session.flush()
@@ -105,46 +129,117 @@ def create_user_full(payload: dict):
     db.session.add(limits)
     db.session.commit()
 
-    return {'success': True, 'message': 'User created successfully',
-            'user': {'id': new_user.id, 'username': username,
-                     'password': password, 'expires_at': expires_at.strftime('%Y-%m-%d')}}
+    sync_user_quotas([new_user])
+    audit('user.create', target=new_user, traffic_limit=traffic_limit, max_connections=max_connections,
+          download_speed=download_speed, expiry_days=expiry_days)
+
+    ops = [{'op': 'create', 'username': username, 'password': password},
+           {'op': 'quota', 'username': username, 'remaining_bytes': remaining_bytes(limits)}]
+    return _with_nodes({'success': True, 'message': 'User created successfully',
+                        'user': {'id': new_user.id, 'username': username,
+                                 'password': password, 'expires_at': expires_at.strftime('%Y-%m-%d')}}, ops)
+
+def _move_quota(user: User, data: dict):
+    """
+    Move the owning reseller's totals by this update, before anything else
+    changes. Returns (new_owner_id, error response or None).
+    """
+    reseller = acting_reseller()
+    new_owner = user.owner_id
+    if 'owner_id' in data and reseller is None:
+        new_owner = int(data['owner_id']) if data['owner_id'] else None
+        if new_owner is not None and not User.query.filter_by(id=new_owner, role='reseller').first():
+            return new_owner, ({'success': False, 'message': 'Unknown reseller'}, 400)
+
+    if new_owner != user.owner_id:
+        # admin reassignment: the new owner is charged after the limits are applied
+        if user.owner_id:
+            release(user.owner_id, user.limits)
+    elif user.owner_id and user.limits:
+        limits = user.limits
+        traffic = int(data['traffic_limit']) - limits.traffic_limit_gb if 'traffic_limit' in data else 0
+        conns = int(data['max_connections']) - limits.max_connections if 'max_connections' in data else 0
+        used = -limits.traffic_used_bytes if data.get('reset_traffic') else 0
+        if not reserve(user.owner_id, traffic_gb=traffic, connections=conns, used_bytes=used,
+                       enforce=reseller is not None):
+            db.session.rollback()
+            return new_owner, ({'success': False, 'message': 'Reseller quota exceeded'}, 403)
+    return new_owner, None
 
 def update_user_full(user_id: int, data: dict):
-    user = User.query.get_or_404(user_id)
+    user = scoped_users().filter(User.id == user_id).first_or_404()
+    if user.role == 'reseller':
+        return {'success': False, 'message': 'Use the reseller endpoints for resellers'}, 400
+    try:
+        validate_limits(data)
+    except (TypeError, ValueError) as e:
+        return {'success': False, 'message': str(e)}, 400
+    backend = get_system_backend()
+    ops = []
+
+    new_owner, error = _move_quota(user, data)
+    if error:
+        return error
 
     if 'username' in data:
         new_u = data['username'].strip()
         if new_u and new_u != user.username:
             if User.query.filter_by(username=new_u).first():
+                db.session.rollback()
                 return {'success': False, 'message': 'Username already exists in database'}, 400
-            if check_linux_user_exists(user.username):
-                ok, msg = rename_linux_user(user.username, new_u)
+            if backend.user_exists(user.username):
+                ok, msg = backend.rename_user(user.username, new_u)
                 if not ok:
+                    db.session.rollback()
                     return {'success': False, 'message': msg}, 500
+            ops.append({'op': 'rename', 'username': user.username, 'new_username': new_u})
             user.username = new_u
 
     if data.get('password'):
-        ok, msg = reset_linux_password(user.username, data['password'])
+        ok, msg = backend.reset_password(user.username, data['password'])
         if not ok:
+            db.session.rollback()
             return {'success': False, 'message': msg}, 500
         user.set_password(data['password'])
+        ops.append({'op': 'password', 'username': user.username, 'password': data['password']})
 
     apply_limits_updates(user, data)
 
+    if new_owner != user.owner_id:
+        user.owner_id = new_owner
+        if new_owner:
+            claim(new_owner, user.limits, enforce=False)
+
     if 'is_active' in data:
         user.is_active = bool(data['is_active'])
 
     db.session.commit()
-    return {'success': True, 'message': 'User updated successfully'}
+
+    if QUOTA_FIELDS & data.keys():
+        sync_user_quotas([user])
+        if user.limits:
+            ops.append({'op': 'quota', 'username': user.username,
+                        'remaining_bytes': remaining_bytes(user.limits)})
+
+    audit('user.update', target=user, changes=data)
+
+    return _with_nodes({'success': True, 'message': 'User updated successfully'}, ops)
 
 def delete_user_full(user_id: int):
-    user = User.query.get_or_404(user_id)
+    user = scoped_users().filter(User.id == user_id).first_or_404()
     if user.role == 'admin':
         return {'success': False, 'message': 'Cannot delete admin user'}, 403
+    if user.role == 'reseller':
+        return {'success': False, 'message': 'Use the reseller endpoints for resellers'}, 400
     username = user.username
-    ok, msg = delete_linux_user(username)
+    drop_user_quota(username)
+    ok, msg = get_system_backend().delete_user(username)
     if not ok:
         return {'success': False, 'message': msg}, 500
+    audit('user.delete', target=user)
+    if user.owner_id:
+        release(user.owner_id, user.limits)
     db.session.delete(user)
     db.session.commit()
-    return {'success': True, 'message': 'User deleted successfully'}
+    ops = [{'op': 'drop_quota', 'username': username}, {'op': 'delete', 'username': username}]
+    return _with_nodes({'success': True, 'message': 'User deleted successfully'}, ops)
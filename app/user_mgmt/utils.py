@@ -15,6 +15,17 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated
 
+def staff_required(f):
+    """Admins and resellers (resellers only see the accounts they own)."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if (not current_user.is_authenticated or not current_user.is_active
+                or current_user.role not in ('admin', 'reseller')):
+            flash(_('Access denied. Admin privileges required.'), 'error')
+            return redirect(url_for('main.dashboard'))
+        return f(*args, **kwargs)
+    return decorated
+
 def generate_random_password(length: int = 16) -> str:
     alphabet = string.ascii_letters + string.digits + "!@#$%^&*"
     return ''.join(secrets.choice(alphabet) for _ in range(length))
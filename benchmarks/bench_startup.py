@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark / import-time budget for the panel.
+
+Measures, in fresh interpreters, how long `from app import create_app;
+create_app()` takes and fails if the median exceeds the budget or if any
+module that must stay lazy (paramiko, alembic, ...) got imported.
+
+    python benchmarks/bench_startup.py --runs 10 --budget-ms 600
+    python benchmarks/bench_startup.py --json bench_output.txt
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported on demand
+LAZY_MODULES = ('paramiko', 'nacl', 'alembic', 'flask_migrate')
+
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+create_app()
+t2 = time.perf_counter()
+import resource
+print(json.dumps({
+    'import_ms': (t1 - t0) * 1000,
+    'create_app_ms': (t2 - t1) * 1000,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'lazy_loaded': [m for m in LAZY if m in sys.modules],
+}))
+"""
+
+
+def run_once(env) -> dict:
+    code = f"LAZY = {LAZY_MODULES!r}\n{PROBE}"
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def top_imports(env, n=10) -> list:
+    """Slowest imports of the first two levels (cumulative µs) from -X importtime."""
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'from app import create_app; create_app()'],
+                         cwd=ROOT, env=env, capture_output=True, text=True)
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if cumulative.strip().isdigit() and depth <= 1:
+            rows.append((int(cumulative), name.strip()))
+    return [{'module': m, 'cumulative_ms': round(us / 1000, 1)} for us, m in sorted(rows, reverse=True)[:n]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--budget-ms', type=float, default=float(os.environ.get('STARTUP_BUDGET_MS', 800)))
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    # no DB is touched during startup, any URL works
+    env.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    totals = [r['import_ms'] + r['create_app_ms'] for r in runs]
+    result = {
+        'runs': args.runs,
+        'median_total_ms': round(statistics.median(totals), 1),
+        'min_total_ms': round(min(totals), 1),
+        'median_import_ms': round(statistics.median(r['import_ms'] for r in runs), 1),
+        'median_create_app_ms': round(statistics.median(r['create_app_ms'] for r in runs), 1),
+        'max_rss_kb': max(r['max_rss_kb'] for r in runs),
+        'lazy_loaded': sorted({m for r in runs for m in r['lazy_loaded']}),
+        'budget_ms': args.budget_ms,
+        'top_imports': top_imports(env),
+    }
+
+    print(json.dumps(result, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    failed = False
+    if result['median_total_ms'] > args.budget_ms:
+        print(f"FAIL: startup {result['median_total_ms']} ms > budget {args.budget_ms} ms", file=sys.stderr)
+        failed = True
+    if result['lazy_loaded']:
+        print(f"FAIL: eagerly imported {', '.join(result['lazy_loaded'])}", file=sys.stderr)
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+End-to-end HTTP load test for the panel API.
+
+Starts the real app in a local gunicorn (gunicorn.conf.py) against a fresh
+SQLite database and the in-memory fake system backend, logs every client in
+as an admin (Flask-Login session cookie) and drives a weighted mix of list,
+create, update and sync calls from many concurrent clients. Reports
+throughput and p50/p95/p99 latency per endpoint.
+
+    python benchmarks/loadtest.py --clients 32 --duration 30
+    python benchmarks/loadtest.py --workers 4 --threads 8 --mix list=50,create=10,update=35,sync=5 \
+        --json loadtest.json
+
+With --query-budget strict a request that exceeds its query budget or runs
+the same statement shape in a loop (app/querybudget.py) fails with a 500 and
+is counted as an error.
+"""
+import argparse
+import http.cookiejar
+import itertools
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PANEL_PATH = 'loadtest'
+ADMIN_USER, ADMIN_PASSWORD = 'loadtest-admin', 'loadtest-password'
+
+DEFAULT_MIX = 'list=55,create=10,update=30,sync=5'
+
+SEED = r"""
+import sys
+from werkzeug.security import generate_password_hash
+from app import create_app, db
+from app.models import User, UserLimit
+from app.user_mgmt.backends import get_system_backend
+
+app = create_app()
+with app.app_context():
+    db.create_all()
+    admin = User(username=ADMIN_USER, role='admin')
+    admin.set_password(ADMIN_PASSWORD)
+    db.session.add(admin)
+    password_hash = generate_password_hash('x')
+    for i in range(SEED_USERS):
+        user = User(username=f'seed{i:05d}', password_hash=password_hash)
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(UserLimit(user_id=user.id))
+    db.session.commit()
+"""
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+
+class Panel:
+    """A gunicorn serving the app on a temp SQLite DB with SYSTEM_BACKEND=fake."""
+
+    def __init__(self, workers, threads, seed_users, query_budget='off'):
+        self.tmp = tempfile.mkdtemp(prefix='itbity-loadtest-')
+        self.port = free_port()
+        self.base = f'http://127.0.0.1:{self.port}/{PANEL_PATH}'
+        self.env = dict(
+            os.environ,
+            DATABASE_URL=f"sqlite:///{os.path.join(self.tmp, 'panel.db')}",
+            SYSTEM_BACKEND='fake',
+            PANEL_PATH=PANEL_PATH,
+            SECRET_KEY='loadtest',
+            GUNICORN_BIND=f'127.0.0.1:{self.port}',
+            GUNICORN_WORKERS=str(workers),
+            GUNICORN_THREADS=str(threads),
+            GUNICORN_ACCESS_LOG=os.devnull,
+            GUNICORN_ERROR_LOG=os.path.join(self.tmp, 'error.log'),
+            QUERY_BUDGET=query_budget,
+        )
+        self.seed_users = seed_users
+        self.proc = None
+
+    def __enter__(self):
+        code = f'ADMIN_USER={ADMIN_USER!r}\nADMIN_PASSWORD={ADMIN_PASSWORD!r}\nSEED_USERS={self.seed_users}\n{SEED}'
+        subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=self.env, check=True)
+        self.proc = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+            cwd=ROOT, env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f'gunicorn exited, see {self.env["GUNICORN_ERROR_LOG"]}')
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=0.2).close()
+                return self
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError('gunicorn did not start in 30 s')
+
+    def __exit__(self, *exc):
+        if self.proc:
+            self.proc.terminate()
+            try:
+                self.proc.wait(10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+class Client:
+    """One logged-in admin browser: own cookie jar, own connection."""
+
+    _names = itertools.count()
+
+    def __init__(self, base, known_ids, lock):
+        self.base = base
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        self.known_ids = known_ids
+        self.lock = lock
+        self.prefix = f'lt{os.getpid()}x{next(self._names)}'
+        self.created = 0
+
+    def request(self, method, path, payload=None, form=None):
+        data, headers = None, {}
+        if payload is not None:
+            data, headers = json.dumps(payload).encode(), {'Content-Type': 'application/json'}
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+        req = urllib.request.Request(self.base + path, data=data, method=method, headers=headers)
+        try:
+            with self.opener.open(req, timeout=60) as resp:
+                body = resp.read()
+                return resp.status, body
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def login(self):
+        status, _ = self.request('POST', '/login', form={
+            'username': ADMIN_USER, 'password': ADMIN_PASSWORD, 'user_type': 'admin'})
+        # the API answers a logged-out client with a redirect to the login page
+        status, body = self.request('GET', '/user_management/api/users')
+        if status != 200 or not json.loads(body).get('success'):
+            raise RuntimeError('login failed')
+        with self.lock:
+            self.known_ids.extend(u['id'] for u in json.loads(body)['users'] if u['id'] and u['role'] != 'admin')
+
+    # ---- operations ------------------------------------------------------
+    def op_list(self):
+        return self.request('GET', '/user_management/api/users')
+
+    def op_create(self):
+        self.created += 1
+        status, body = self.request('POST', '/user_management/api/users', {
+            'username': f'{self.prefix}n{self.created}', 'password': 'loadtest-pass',
+            'traffic_limit': random.randint(10, 200), 'max_connections': random.randint(1, 4),
+            'expiry_days': 30,
+        })
+        if status == 200:
+            with self.lock:
+                self.known_ids.append(json.loads(body)['user']['id'])
+        return status, body
+
+    def op_update(self):
+        with self.lock:
+            user_id = random.choice(self.known_ids) if self.known_ids else None
+        if user_id is None:
+            return self.op_list()
+        return self.request('PUT', f'/user_management/api/users/{user_id}', {
+            'traffic_limit': random.randint(10, 200), 'max_connections': random.randint(1, 4),
+        })
+
+    def op_sync(self):
+        return self.request('POST', '/user_management/api/users/sync', {'action': 'sync_quotas'})
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(','):
+        name, weight = part.split('=')
+        if not hasattr(Client, f'op_{name}'):
+            raise SystemExit(f'unknown operation in --mix: {name}')
+        mix[name] = float(weight)
+    return mix
+
+
+def run(args):
+    mix = parse_mix(args.mix)
+    ops, weights = list(mix), list(mix.values())
+    known_ids, lock = [], threading.Lock()
+    samples = {op: [] for op in ops}   # (latency_s, ok)
+    stop_at = []
+    barrier = threading.Barrier(args.clients + 1)
+
+    with Panel(args.workers, args.threads, args.seed_users, args.query_budget) as panel:
+        clients = [Client(panel.base, known_ids, lock) for _ in range(args.clients)]
+        for c in clients:
+            c.login()
+
+        def worker(client, rnd):
+            local = {op: [] for op in ops}
+            barrier.wait()
+            warm_until = time.monotonic() + args.warmup
+            while time.monotonic() < stop_at[0]:
+                op = rnd.choices(ops, weights)[0]
+                t0 = time.perf_counter()
+                try:
+                    status, _ = getattr(client, f'op_{op}')()
+                    ok = status == 200
+                except Exception:
+                    ok = False
+                if time.monotonic() >= warm_until:
+                    local[op].append((time.perf_counter() - t0, ok))
+            with lock:
+                for op, values in local.items():
+                    samples[op].extend(values)
+
+        threads = [threading.Thread(target=worker, args=(c, random.Random(i)))
+                   for i, c in enumerate(clients)]
+        for t in threads:
+            t.start()
+        stop_at.append(time.monotonic() + args.warmup + args.duration)
+        barrier.wait()
+        started = time.monotonic()
+        for t in threads:
+            t.join()
+        elapsed = max(1e-9, time.monotonic() - started - args.warmup)
+
+    return report(samples, elapsed, args)
+
+
+def report(samples, elapsed, args):
+    endpoints = {}
+    total = errors = 0
+    for op, values in samples.items():
+        latencies = sorted(v for v, _ in values)
+        failed = sum(1 for _, ok in values if not ok)
+        total += len(values)
+        errors += failed
+        endpoints[op] = {
+            'requests': len(values),
+            'errors': failed,
+            'rps': round(len(values) / elapsed, 1),
+            **{f'p{p}_ms': round(percentile(latencies, p) * 1000, 2) if latencies else None for p in (50, 95, 99)},
+            'max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+        }
+    return {
+        'config': {'clients': args.clients, 'workers': args.workers, 'threads': args.threads,
+                   'duration_s': args.duration, 'warmup_s': args.warmup, 'mix': args.mix,
+                   'seed_users': args.seed_users, 'query_budget': args.query_budget},
+        'total': {'requests': total, 'errors': errors, 'rps': round(total / elapsed, 1)},
+        'endpoints': endpoints,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=16, help='concurrent logged-in clients')
+    parser.add_argument('--duration', type=float, default=20, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=3, help='unmeasured seconds first')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('GUNICORN_WORKERS', 3)))
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('GUNICORN_THREADS', 4)))
+    parser.add_argument('--seed-users', type=int, default=500)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'weighted operations (default {DEFAULT_MIX})')
+    parser.add_argument('--query-budget', choices=('off', 'warn', 'strict'), default='off',
+                        help='QUERY_BUDGET of the panel under test (default off)')
+    parser.add_argument('--json', help='also write the report to this file')
+    args = parser.parse_args()
+
+    result = run(args)
+    text = json.dumps(result, indent=2)
+    print(text)
+    if args.json:
+        with open(args.json, 'w') as f:
+            f.write(text + '\n')
+    return 1 if result['total']['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,6 +4,27 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _engine_options(uri):
+    """Engine/pool settings tuned for the selected backend."""
+    if uri.startswith('sqlite'):
+        return {
+            # busy_timeout: wait for the writer lock instead of "database is locked"
+            'connect_args': {
+                'timeout': float(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5),
+                'check_same_thread': False,
+            },
+        }
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE') or 5),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW') or 5),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT') or 10),
+        # recycle before MariaDB's wait_timeout and ping after quiet periods
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE') or 1800),
+        'pool_pre_ping': True,
+    }
+
+
 class Config:
     # Security
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-me'
@@ -11,15 +32,74 @@ class Config:
     # Panel Path
     PANEL_PATH = os.environ.get('PANEL_PATH') or 'admin'
     
-    # Database - MariaDB
+    # Database - DATABASE_URL (e.g. sqlite:////var/lib/itbity-ssh-panel/panel.db)
+    # or MariaDB from the DB_* variables
     DB_HOST = os.environ.get('DB_HOST') or 'localhost'
     DB_USER = os.environ.get('DB_USER') or 'root'
     DB_PASSWORD = os.environ.get('DB_PASSWORD') or ''
     DB_NAME = os.environ.get('DB_NAME') or 'itbitysshpanel'
     
-    SQLALCHEMY_DATABASE_URI = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}?charset=utf8mb4"
+    SQLALCHEMY_DATABASE_URI = (
+        os.environ.get('DATABASE_URL') or
+        f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}?charset=utf8mb4"
+    )
+    SQLALCHEMY_ENGINE_OPTIONS = _engine_options(SQLALCHEMY_DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # SQLite only: applied to every new connection (WAL lets gunicorn workers
+    # read while the traffic daemon writes)
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(float(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5) * 1000),
+        'foreign_keys': 'ON',
+        'temp_store': 'MEMORY',
+    }
+    
+    # 'linux' manages this host; 'fake' keeps users/quotas in memory (load tests, development)
+    SYSTEM_BACKEND = os.environ.get('SYSTEM_BACKEND') or 'linux'
+    
+    # Max parallel per-user Linux operations (useradd/userdel/...) in bulk actions
+    LINUX_OPS_CONCURRENCY = int(os.environ.get('LINUX_OPS_CONCURRENCY') or 8)
+    
+    # Seconds a telemetry snapshot (usage, connections) is served from cache
+    TELEMETRY_SNAPSHOT_TTL = int(os.environ.get('TELEMETRY_SNAPSHOT_TTL') or 30)
+    
+    # Live per-user rates published by the traffic daemon (top-N endpoint)
+    RATES_FILE = os.environ.get('RATES_FILE') or '/run/itbity-traffic/rates.json'
+    
+    # Default day of month on which usage resets (0 = never; per-user override
+    # in user_limits.billing_cycle_day)
+    BILLING_CYCLE_DAY = int(os.environ.get('BILLING_CYCLE_DAY') or 0)
+    
+    # Audit journal: buffered events are written in one INSERT per interval / batch
+    AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL') or 2)
+    AUDIT_FLUSH_SIZE = int(os.environ.get('AUDIT_FLUSH_SIZE') or 200)
+    AUDIT_BUFFER_MAX = int(os.environ.get('AUDIT_BUFFER_MAX') or 10000)
+    
+    # Request profiling: output directory (default <instance>/profiles) and
+    # how often workers look at the on/off switch
+    PROFILE_DIR = os.environ.get('PROFILE_DIR')
+    PROFILE_CHECK_INTERVAL = float(os.environ.get('PROFILE_CHECK_INTERVAL') or 2)
+    
+    # Usage API: seconds next_changed_since lags behind the server clock. Rows
+    # are stamped before they are committed (traffic daemon pass, ORM flush),
+    # so a change may become visible with an updated_at slightly in the past
+    USAGE_WATERMARK_LAG = int(os.environ.get('USAGE_WATERMARK_LAG') or 120)
+    
+    # Query budgets / N+1 detection (dev, tests, load tests): off | warn | strict.
+    # Per-view budgets come from @query_budget(n), the rest use QUERY_BUDGET_DEFAULT
+    # (0 = none); one statement shape repeated this often in a request is flagged
+    QUERY_BUDGET = os.environ.get('QUERY_BUDGET') or 'off'
+    QUERY_BUDGET_DEFAULT = int(os.environ.get('QUERY_BUDGET_DEFAULT') or 0)
+    QUERY_REPEAT_THRESHOLD = int(os.environ.get('QUERY_REPEAT_THRESHOLD') or 10)
+    
+    # Node agents (multi-server mode)
+    NODE_REQUEST_TIMEOUT = float(os.environ.get('NODE_REQUEST_TIMEOUT') or 5)
+    NODES_CONCURRENCY = int(os.environ.get('NODES_CONCURRENCY') or 16)
+    # pushed snapshots older than this are re-pulled from the agent
+    NODE_SNAPSHOT_MAX_AGE = int(os.environ.get('NODE_SNAPSHOT_MAX_AGE') or 60)
+    
     # Server
     HOST = os.environ.get('HOST') or '127.0.0.1'
     PORT = int(os.environ.get('PORT') or 5000)
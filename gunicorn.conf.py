@@ -0,0 +1,32 @@
+# gunicorn.conf.py
+# gunicorn -c gunicorn.conf.py wsgi:app
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 3))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+# gthread: the worker heartbeats from its main loop, so a long streaming
+# response (backup download/restore) is not killed after `timeout` seconds
+# the way a sync worker would be
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '/var/log/itbity-panel-access.log')
+errorlog = os.environ.get('GUNICORN_ERROR_LOG', '/var/log/itbity-panel-error.log')
+
+# Import the app once in the master; workers share those pages copy-on-write
+# and start in milliseconds after a deploy
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'True') == 'True'
+
+
+def post_fork(server, worker):
+    """
+    create_app() opens no DB connection, but if anything in the master did
+    (e.g. a CLI hook), never let two processes share a pooled socket.
+    """
+    if not preload_app:
+        return
+    from app import db
+    app = worker.app.wsgi()
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -19,6 +19,11 @@ SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 PROJECT_DIR="/var/www/itbity-ssh-panel"
 VENV_DIR="$PROJECT_DIR/venv"
 DB_NAME="itbitysshpanel"
+# Database backend: "mariadb" (default) or "sqlite" for small single-node boxes
+#   sudo DB_BACKEND=sqlite bash install.sh
+DB_BACKEND="${DB_BACKEND:-mariadb}"
+SQLITE_DIR="/var/lib/itbity-ssh-panel"
+SQLITE_PATH="$SQLITE_DIR/panel.db"
 
 echo "========================================"
 echo "  IT Bity SSH Panel - Installation"
@@ -48,6 +53,19 @@ SERVER_IP=$(hostname -I | awk '{print $1}')
 echo -e "${GREEN}[1/14] Updating system...${NC}"
 apt update && apt upgrade -y
 
+if [ "$DB_BACKEND" = "sqlite" ]; then
+echo -e "${GREEN}[2/14] Using SQLite (WAL) database, skipping MariaDB...${NC}"
+apt install -y sqlite3
+
+echo -e "${GREEN}[3/14] Creating database directory...${NC}"
+mkdir -p "$SQLITE_DIR"
+# www-data (panel) owns the db; root (PAM hooks, traffic daemon) can always write
+chown www-data:www-data "$SQLITE_DIR"
+chmod 750 "$SQLITE_DIR"
+
+echo -e "${GREEN}[4/14] Database will be created at ${SQLITE_PATH}${NC}"
+DB_PASSWORD=""
+else
 echo -e "${GREEN}[2/14] Installing MariaDB...${NC}"
 apt install -y mariadb-server mariadb-client
 
@@ -83,6 +101,7 @@ else
     echo -e "${RED}✗ Database connection failed!${NC}"
     exit 1
 fi
+fi
 
 echo -e "${GREEN}[5/14] Installing Python and dependencies...${NC}"
 apt install -y python3 python3-pip python3-venv python3-dev libmariadb-dev build-essential pkg-config libssl-dev libffi-dev
@@ -132,10 +151,14 @@ www-data ALL=(ALL) NOPASSWD: \
     /usr/bin/systemctl reload ssh, \
     /usr/bin/systemctl reload sshd, \
     /usr/bin/tee -a /etc/ssh/sshd_config, \
+    /usr/bin/tee /etc/ssh/sshd_config, \
     /usr/bin/rm -f /tmp/ssh_user_*.conf, \
     /usr/bin/pkill -KILL -u *, \
     /usr/bin/ss, \
-    /usr/bin/ps
+    /usr/bin/ps, \
+    /usr/bin/getent shadow, \
+    /usr/sbin/nft -f -, \
+    /usr/sbin/nft -j list chain inet itbity_traffic users
 EOF
 
 # Secure permissions
@@ -153,6 +176,9 @@ fi
 
 echo -e "${GREEN}[6.2/14] Configuring PAM for connection limits...${NC}"
 
+# DB wrapper shared by the PAM hooks and the traffic daemon (imported from /usr/local/bin)
+install -m 644 -o root -g root "$SCRIPT_DIR/scripts/itbity_db.py" /usr/local/bin/itbity_db.py
+
 # Backup original sshd PAM file
 if [ ! -f /etc/pam.d/sshd.backup ]; then
     cp /etc/pam.d/sshd /etc/pam.d/sshd.backup
@@ -163,147 +189,8 @@ fi
 if grep -q "check_user_limit.py" /etc/pam.d/sshd; then
     echo -e "${YELLOW}⚠ PAM already configured, skipping...${NC}"
 else
-    # Create the connection limit check script
-    cat > /usr/local/bin/check_user_limit.py << 'LIMIT_SCRIPT'
-#!/usr/bin/env python3
-
-import os
-import sys
-import subprocess
-from datetime import datetime
-
-LOG_FILE = '/var/log/ssh_connection_limits.log'
-ENV_FILE = '/var/www/itbity-ssh-panel/.env'
-
-def log_message(message):
-    try:
-        with open(LOG_FILE, 'a') as f:
-            f.write(f"[{datetime.now()}] {message}\n")
-    except:
-        pass
-
-def load_env():
-    env_vars = {}
-    try:
-        with open(ENV_FILE, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    env_vars[key.strip()] = value.strip().strip("'\"")
-        return env_vars
-    except Exception as e:
-        log_message(f"ERROR: Failed to load .env: {e}")
-        return None
-
-def get_user_limit(username):
-    env = load_env()
-    if not env:
-        return None
-    
-    try:
-        import pymysql
-        
-        conn = pymysql.connect(
-            host=env.get('DB_HOST', 'localhost'),
-            user=env.get('DB_USER'),
-            password=env.get('DB_PASSWORD'),
-            database=env.get('DB_NAME'),
-            charset='utf8mb4'
-        )
-        
-        with conn.cursor() as cursor:
-            query = """
-                SELECT ul.max_connections 
-                FROM users u 
-                JOIN user_limits ul ON u.id = ul.user_id 
-                WHERE u.username = %s AND u.is_active = 1
-            """
-            cursor.execute(query, (username,))
-            result = cursor.fetchone()
-            
-            conn.close()
-            
-            if result:
-                return result[0]
-            return None
-            
-    except Exception as e:
-        log_message(f"ERROR: Database query failed: {e}")
-        return None
-
-def count_user_sessions(username):
-    try:
-        import re
-        
-        result = subprocess.run(
-            ['ss', '-tnp', 'state', 'established', '( sport = :22 )'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        
-        if result.returncode != 0:
-            return 0
-        
-        pids = re.findall(r'pid=(\d+)', result.stdout)
-        
-        count = 0
-        for pid in set(pids):
-            try:
-                ps_result = subprocess.run(
-                    ['ps', '-o', 'user=', '-p', pid],
-                    capture_output=True,
-                    text=True,
-                    timeout=2
-                )
-                if ps_result.returncode == 0 and ps_result.stdout.strip() == username:
-                    count += 1
-            except:
-                continue
-        
-        return count
-        
-    except Exception as e:
-        log_message(f"ERROR: Failed to count sessions: {e}")
-        return 0
-
-def main():
-    username = os.environ.get('PAM_USER')
-    
-    if not username:
-        log_message("ERROR: PAM_USER not found")
-        sys.exit(0)
-    
-    max_connections = get_user_limit(username)
-    
-    if max_connections is None:
-        log_message(f"INFO: No limit configured for user '{username}', allowing login")
-        sys.exit(0)
-    
-    current_sessions = count_user_sessions(username)
-    
-    log_message(f"USER: {username}, CURRENT: {current_sessions}, MAX: {max_connections}")
-    
-    if current_sessions >= max_connections:
-        print("=" * 70)
-        print("CONNECTION LIMIT REACHED!")
-        print(f"Maximum connections allowed: {max_connections}")
-        print(f"Current active connections: {current_sessions}")
-        print("Please disconnect one session or contact your administrator.")
-        print("=" * 70)
-        log_message(f"DENIED: {username} reached limit ({current_sessions}/{max_connections})")
-        sys.exit(1)
-    else:
-        log_message(f"ALLOWED: {username} connection ({current_sessions + 1}/{max_connections})")
-        sys.exit(0)
-
-if __name__ == '__main__':
-    main()
-LIMIT_SCRIPT
-
-    chmod +x /usr/local/bin/check_user_limit.py
-    chown root:root /usr/local/bin/check_user_limit.py
+    # Install the connection limit check script
+    install -m 755 -o root -g root "$SCRIPT_DIR/scripts/check_user_limit.py" /usr/local/bin/check_user_limit.py
     
     touch /var/log/ssh_connection_limits.log
     chmod 666 /var/log/ssh_connection_limits.log
@@ -343,206 +230,24 @@ if ! nft list chain inet itbity_traffic users >/dev/null 2>&1; then
     nft add chain inet itbity_traffic users '{ type filter hook input priority 0; policy accept; }'
 fi
 
-echo -e "${GREEN}✓ NFTables traffic table & chain configured${NC}"
-
-
-echo -e "${GREEN}[6.4/14] Configuring PAM for traffic session tracking (UID-based)...${NC}"
-
-# Create traffic session registration script
-cat > /usr/local/bin/register_session.py << 'TRAFFIC_SCRIPT'
-#!/usr/bin/env python3
-
-import os
-import sys
-import subprocess
-import json
-import pwd
-from datetime import datetime, UTC
-
-LOG_FILE = "/var/log/ssh_session_register.log"
-ENV_FILE = "/var/www/itbity-ssh-panel/.env"
-NFT_BIN = "/usr/sbin/nft"   # nft path on Ubuntu
-
-
-# ===========================================================
-# SAFE LOGGER
-# ===========================================================
-def log(msg: str) -> None:
-    try:
-        with open(LOG_FILE, "a") as f:
-            f.write(f"[{datetime.now(UTC)}] {msg}\n")
-    except Exception:
-        # never break PAM on logging failure
-        pass
-
-
-# ===========================================================
-# LOAD .env
-# ===========================================================
-def load_env():
-    env = {}
-    try:
-        with open(ENV_FILE, "r") as f:
-            for line in f:
-                line = line.strip()
-                if not line or line.startswith("#") or "=" not in line:
-                    continue
-                key, value = line.split("=", 1)
-                env[key.strip()] = value.strip().strip("'\"")
-    except Exception as e:
-        log(f"Failed to load .env: {e}")
-    return env
-
-
-# ===========================================================
-# NFT HELPERS (UID rule)
-# ===========================================================
-def uid_rule_exists(uid: int) -> bool:
-    """Check if we already have a uid-based rule for this uid."""
-    try:
-        result = subprocess.run(
-            [NFT_BIN, "-j", "list", "chain", "inet", "itbity_traffic", "users"],
-            capture_output=True,
-            text=True,
-            timeout=2
-        )
-        if result.returncode != 0:
-            log(f"NFT LIST ERROR: {result.stderr.strip()}")
-            return False
-
-        data = json.loads(result.stdout)
-        comment = f"user_uid_{uid}"
-        for rule in data.get("rules", []):
-            if rule.get("comment") == comment:
-                return True
-    except Exception as e:
-        log(f"NFT uid_rule_exists ERROR: {e}")
-    return False
-
-
-def add_uid_rule(uid: int) -> None:
-    """Add nftables counter rule for this UID if not exists."""
-    comment = f"user_uid_{uid}"
-
-    if uid_rule_exists(uid):
-        log(f"NFT UID RULE EXISTS: UID={uid} rule={comment}")
-        return
-
-    try:
-        subprocess.run(
-            [
-                NFT_BIN,
-                "add", "rule",
-                "inet", "itbity_traffic", "users",
-                "meta", "skuid", str(uid),
-                "counter",
-                "comment", comment
-            ],
-            timeout=2,
-            capture_output=True,
-            text=True,
-        )
-        log(f"NFT UID RULE CREATED: UID={uid} rule={comment}")
-    except Exception as e:
-        log(f"NFT ADD UID RULE ERROR: {e}")
-
-
-# ===========================================================
-# REGISTER SESSION (DB + UID RULE)
-# ===========================================================
-def register_session(username: str, ip: str) -> None:
-    env = load_env()
-    if not env:
-        log("Env not loaded — skipping DB insert")
-        return
-
-    # resolve Linux UID for this ssh/vpn user
-    try:
-        pw = pwd.getpwnam(username)
-        uid = pw.pw_uid
-    except Exception as e:
-        log(f"Failed to get uid for user={username}: {e}")
-        return
-
-    # create UID rule (if needed)
-    add_uid_rule(uid)
-    nft_rule_name = f"user_uid_{uid}"
-
-    try:
-        import pymysql
-
-        conn = pymysql.connect(
-            host=env.get("DB_HOST", "localhost"),
-            user=env.get("DB_USER"),
-            password=env.get("DB_PASSWORD"),
-            database=env.get("DB_NAME"),
-            charset="utf8mb4"
-        )
-        cur = conn.cursor()
-
-        # Fetch panel user_id
-        cur.execute("SELECT id FROM users WHERE username=%s", (username,))
-        row = cur.fetchone()
-        if not row:
-            log(f"Panel user not found: {username}")
-            conn.close()
-            return
-
-        user_id = row[0]
-
-        ts = int(datetime.now(UTC).timestamp())
-        session_id = f"{username}-{uid}-{ts}"
-
-        # Insert session row; all sessions of same UID share same nft_rule_name
-        cur.execute(
-            """
-            INSERT INTO user_ip_sessions
-                (user_id, ip_address, session_id, nft_rule_name, created_at, bytes_in, bytes_out)
-            VALUES
-                (%s, %s, %s, %s, NOW(), 0, 0)
-            """,
-            (user_id, ip, session_id, nft_rule_name),
-        )
-        conn.commit()
-        conn.close()
-
-        log(
-            f"DB session added: user={username}, uid={uid}, "
-            f"ip={ip}, session={session_id}, rule={nft_rule_name}"
-        )
-    except Exception as e:
-        log(f"DB ERROR: {e}")
-
-
-# ===========================================================
-# MAIN ENTRY POINT
-# ===========================================================
-def main() -> None:
-    username = os.environ.get("PAM_USER")
-    ip = os.environ.get("PAM_RHOST")
-
-    # TTY برای ما مهم نیست در نسخه UID، ولی اگر خواستی برای دیباگ:
-    # tty = os.environ.get("PAM_TTY", "notty")
-
-    if not username or not ip:
-        log(f"Missing PAM_USER or PAM_RHOST (user={username}, ip={ip})")
-        sys.exit(0)
+# Per-UID traffic quotas: uid -> named quota object, filled by the panel
+if ! nft list map inet itbity_traffic user_quotas >/dev/null 2>&1; then
+    echo "Creating nftables quota map itbity_traffic user_quotas..."
+    nft add map inet itbity_traffic user_quotas '{ type uid : quota; }'
+fi
 
-    # Ignore root (not managed by panel)
-    if username == "root":
-        log("Skipping root session")
-        sys.exit(0)
+# Single enforcement rule: drop once the socket owner's quota is exhausted
+if ! nft list chain inet itbity_traffic users 2>/dev/null | grep -q "@user_quotas"; then
+    nft insert rule inet itbity_traffic users quota name meta skuid map @user_quotas drop
+fi
 
-    register_session(username, ip)
-    sys.exit(0)
+echo -e "${GREEN}✓ NFTables traffic table & chain configured${NC}"
 
 
-if __name__ == "__main__":
-    main()
-TRAFFIC_SCRIPT
+echo -e "${GREEN}[6.4/14] Configuring PAM for traffic session tracking (UID-based)...${NC}"
 
-chmod +x /usr/local/bin/register_session.py
-chown root:root /usr/local/bin/register_session.py
+# Install traffic session registration script
+install -m 755 -o root -g root "$SCRIPT_DIR/scripts/register_session.py" /usr/local/bin/register_session.py
 
 touch /var/log/ssh_session_register.log
 chmod 666 /var/log/ssh_session_register.log
@@ -558,169 +263,8 @@ echo -e "${GREEN}✓ PAM traffic session tracking (UID-based) configured${NC}"
 
 echo -e "${GREEN}[6.5/14] Installing Traffic Daemon...${NC}"
 
-# Create traffic daemon script
-cat > /usr/local/bin/traffic_daemon.py << 'TRAFFIC_DAEMON'
-#!/usr/bin/env python3
-import time
-import subprocess
-import pymysql
-import json
-from datetime import datetime
-
-ENV_FILE = "/var/www/itbity-ssh-panel/.env"
-LOG_FILE = "/var/log/traffic_daemon.log"
-
-
-def log(msg):
-    try:
-        with open(LOG_FILE, "a") as f:
-            f.write(f"[{datetime.now()}] {msg}\n")
-    except Exception:
-        pass
-
-
-def load_env():
-    env = {}
-    try:
-        with open(ENV_FILE, "r") as f:
-            for line in f:
-                line = line.strip()
-                if "=" in line and not line.startswith("#"):
-                    key, value = line.split("=", 1)
-                    env[key.strip()] = value.strip().strip("'\"")
-    except Exception as e:
-        log(f"Failed to load .env: {e}")
-    return env
-
-
-def db():
-    env = load_env()
-    return pymysql.connect(
-        host=env.get("DB_HOST", "localhost"),
-        user=env.get("DB_USER"),
-        password=env.get("DB_PASSWORD"),
-        database=env.get("DB_NAME"),
-        charset="utf8mb4",
-        autocommit=True,
-    )
-
-
-def get_nft_json():
-    try:
-        result = subprocess.run(
-            ["nft", "-j", "list", "chain", "inet", "itbity_traffic", "users"],
-            capture_output=True,
-            text=True
-        )
-        if result.returncode != 0:
-            log(f"NFT ERROR: {result.stderr}")
-            return None
-
-        return json.loads(result.stdout)
-    except Exception as e:
-        log(f"NFT JSON ERROR: {e}")
-        return None
-
-
-def extract_bytes(rule):
-    """
-    nft JSON structure:
-      rule: { "expr": [ { "counter": { "packets": X, "bytes": Y } }, ... ] }
-    """
-    try:
-        for expr in rule.get("expr", []):
-            if "counter" in expr:
-                return int(expr["counter"].get("bytes", 0))
-    except Exception:
-        pass
-    return 0
-
-
-def main_loop():
-    log("Traffic daemon started.")
-
-    while True:
-        try:
-            nft_data = get_nft_json()
-            if not nft_data:
-                time.sleep(5)
-                continue
-
-            conn = db()
-            cur = conn.cursor()
-
-            # Load active sessions
-            cur.execute("""
-                SELECT s.id, s.user_id, s.nft_rule_name, s.bytes_in, s.bytes_out
-                FROM user_ip_sessions s
-                WHERE s.closed_at IS NULL
-            """)
-            sessions = cur.fetchall()
-
-            # Build quick lookup for nft rules by comment
-            rules_by_comment = {}
-            try:
-                for item in nft_data.get("nftables", []):
-                    if "rule" in item:
-                        rule = item["rule"]
-                        comment = rule.get("comment")
-                        if comment:
-                            rules_by_comment[comment] = rule
-            except Exception as e:
-                log(f"Parse rules error: {e}")
-
-            for sess_id, user_id, nft_rule_name, old_in, old_out in sessions:
-                rule = rules_by_comment.get(nft_rule_name)
-
-                if rule is None:
-                    # Rule no longer present → treat as ended session (only mark closed)
-                    cur.execute(
-                        "UPDATE user_ip_sessions SET closed_at = NOW() WHERE id = %s AND closed_at IS NULL",
-                        (sess_id,)
-                    )
-                    continue
-
-                new_bytes_in = extract_bytes(rule)
-                if new_bytes_in < 0:
-                    new_bytes_in = 0
-
-                delta_in = max(0, new_bytes_in - (old_in or 0))
-
-                # Update session bytes
-                cur.execute(
-                    """
-                    UPDATE user_ip_sessions
-                    SET bytes_in = %s
-                    WHERE id = %s
-                    """,
-                    (new_bytes_in, sess_id)
-                )
-
-                # Add delta to user_limits.traffic_used_gb
-                if delta_in > 0:
-                    gb = float(delta_in) / (1024.0 * 1024.0 * 1024.0)
-                    cur.execute(
-                        """
-                        UPDATE user_limits
-                        SET traffic_used_gb = traffic_used_gb + %s
-                        WHERE user_id = %s
-                        """,
-                        (gb, user_id)
-                    )
-
-            conn.close()
-
-        except Exception as e:
-            log(f"MAIN LOOP ERROR: {e}")
-
-        time.sleep(5)
-
-
-if __name__ == "__main__":
-    main_loop()
-TRAFFIC_DAEMON
-
-chmod +x /usr/local/bin/traffic_daemon.py
+# Install traffic daemon script
+install -m 755 -o root -g root "$SCRIPT_DIR/scripts/traffic_daemon.py" /usr/local/bin/traffic_daemon.py
 touch /var/log/traffic_daemon.log
 chmod 666 /var/log/traffic_daemon.log
 
@@ -735,6 +279,9 @@ Type=simple
 User=root
 Group=root
 ExecStart=/usr/local/bin/traffic_daemon.py
+# live rates for the panel: /run/itbity-traffic/rates.json
+RuntimeDirectory=itbity-traffic
+RuntimeDirectoryMode=0755
 Restart=always
 RestartSec=3
 
@@ -770,6 +317,9 @@ pip install --no-cache-dir -r $PROJECT_DIR/requirements.txt
 # Install gunicorn
 pip install gunicorn
 
+# Optional: brotli variants of static assets (gzip is always built)
+pip install brotli || echo -e "${YELLOW}⚠ brotli not installed, assets will be gzip-only${NC}"
+
 # Generate random secret key and panel path
 SECRET_KEY=$(python3 -c "import secrets; print(secrets.token_hex(32))")
 PANEL_PATH=$(python3 -c "import secrets; print(secrets.token_hex(16))")
@@ -794,6 +344,13 @@ DB_HOST='localhost'
 DB_USER='itbity'
 DB_PASSWORD='$DB_PASSWORD'
 DB_NAME='$DB_NAME'
+$( [ "$DB_BACKEND" = "sqlite" ] && echo "DATABASE_URL='sqlite:///$SQLITE_PATH'" )
+
+# day of month on which usage resets (0 = never)
+BILLING_CYCLE_DAY=${BILLING_CYCLE_DAY:-0}
+
+# terminate SSH sessions idle for this many minutes (0 = off)
+REAPER_IDLE_MINUTES=${REAPER_IDLE_MINUTES:-0}
 
 HOST='127.0.0.1'
 PORT=5000
@@ -889,6 +446,8 @@ if [ ! -d "$PROJECT_DIR/migrations" ]; then
     flask db init
 fi
 
+# usage moved from a float GB column to exact bytes; convert before autogenerating
+flask billing convert-legacy-usage
 flask db migrate -m "Initial migration" 2>/dev/null || echo "Migration already exists"
 flask db upgrade
 
@@ -919,6 +478,14 @@ with app.app_context():
         print('✓ Admin user already exists')
 PYTHON_SCRIPT
 
+# Fingerprinted + precompressed static assets (static/dist)
+flask assets-build
+
+# SQLite file was created by root above; hand it to the panel user
+if [ "$DB_BACKEND" = "sqlite" ]; then
+    chown www-data:www-data "$SQLITE_PATH"*
+fi
+
 echo -e "${GREEN}[14/14] Configuring services...${NC}"
 
 # Nginx configuration
@@ -936,6 +503,43 @@ server {
         proxy_redirect off;
     }
 
+    # Streaming exports: pass rows through as they are produced
+    location /PANEL_PATH_PLACEHOLDER/user_management/api/export/ {
+        proxy_pass http://127.0.0.1:5000;
+        proxy_set_header Host $host;
+        proxy_set_header X-Real-IP $remote_addr;
+        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+        proxy_set_header X-Forwarded-Proto $scheme;
+        proxy_redirect off;
+        proxy_buffering off;
+        proxy_read_timeout 3600s;
+    }
+
+    # Streaming backup download / restore upload: no size cap, no buffering
+    location /PANEL_PATH_PLACEHOLDER/settings/api/backup/ {
+        proxy_pass http://127.0.0.1:5000;
+        proxy_set_header Host $host;
+        proxy_set_header X-Real-IP $remote_addr;
+        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+        proxy_set_header X-Forwarded-Proto $scheme;
+        proxy_redirect off;
+        client_max_body_size 0;
+        proxy_request_buffering off;
+        proxy_buffering off;
+        proxy_read_timeout 3600s;
+        proxy_send_timeout 3600s;
+    }
+
+    # Fingerprinted assets: content-hashed names never change
+    location /static/dist/ {
+        alias /var/www/itbity-ssh-panel/static/dist/;
+        gzip_static on;
+        BROTLI_STATIC_PLACEHOLDER
+        access_log off;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+        add_header Vary "Accept-Encoding";
+    }
+
     # Static files - without panel path prefix
     location /static {
         alias /var/www/itbity-ssh-panel/static/;
@@ -949,6 +553,13 @@ NGINX_CONFIG
 # Replace placeholder with actual panel path
 sed -i "s|PANEL_PATH_PLACEHOLDER|${PANEL_PATH}|g" /etc/nginx/sites-available/itbity-ssh-panel
 
+# Serve .br variants when the nginx brotli module is available
+if apt install -y libnginx-mod-http-brotli-static >/dev/null 2>&1; then
+    sed -i "s|BROTLI_STATIC_PLACEHOLDER|brotli_static on;|" /etc/nginx/sites-available/itbity-ssh-panel
+else
+    sed -i "/BROTLI_STATIC_PLACEHOLDER/d" /etc/nginx/sites-available/itbity-ssh-panel
+fi
+
 ln -sf /etc/nginx/sites-available/itbity-ssh-panel /etc/nginx/sites-enabled/
 rm -f /etc/nginx/sites-enabled/default
 
@@ -973,7 +584,7 @@ User=www-data
 Group=www-data
 WorkingDirectory=/var/www/itbity-ssh-panel
 Environment="PATH=/var/www/itbity-ssh-panel/venv/bin"
-ExecStart=/var/www/itbity-ssh-panel/venv/bin/gunicorn --workers 3 --bind 127.0.0.1:5000 --timeout 120 --access-logfile /var/log/itbity-panel-access.log --error-logfile /var/log/itbity-panel-error.log wsgi:app
+ExecStart=/var/www/itbity-ssh-panel/venv/bin/gunicorn -c /var/www/itbity-ssh-panel/gunicorn.conf.py wsgi:app
 Restart=always
 RestartSec=3
 StandardOutput=journal
@@ -983,6 +594,62 @@ StandardError=journal
 WantedBy=multi-user.target
 SERVICE
 
+# Billing cycles: close ended cycles hourly (BILLING_CYCLE_DAY / per-user day)
+cat > /etc/systemd/system/itbity-billing.service << 'SERVICE'
+[Unit]
+Description=ITBity billing cycle rollover
+After=network.target mariadb.service
+
+[Service]
+Type=oneshot
+User=www-data
+Group=www-data
+WorkingDirectory=/var/www/itbity-ssh-panel
+Environment="PATH=/var/www/itbity-ssh-panel/venv/bin:/usr/sbin:/usr/bin"
+Environment="FLASK_APP=wsgi.py"
+ExecStart=/var/www/itbity-ssh-panel/venv/bin/flask billing rollover
+SERVICE
+
+cat > /etc/systemd/system/itbity-billing.timer << 'TIMER'
+[Unit]
+Description=Hourly ITBity billing cycle rollover
+
+[Timer]
+OnCalendar=hourly
+Persistent=true
+
+[Install]
+WantedBy=timers.target
+TIMER
+
+systemctl daemon-reload
+systemctl enable --now itbity-billing.timer
+
+# Quota enforcement after boot: nftables.service loads /etc/nftables.conf
+# (`flush ruleset`), so re-install the drop rule and every user's quota from
+# the DB. The traffic daemon also starts this unit when the rule disappears.
+cat > /etc/systemd/system/itbity-quotas.service << 'SERVICE'
+[Unit]
+Description=ITBity nft quota re-install
+After=network.target nftables.service mariadb.service
+Before=itbity-traffic.service
+
+[Service]
+Type=oneshot
+User=www-data
+Group=www-data
+WorkingDirectory=/var/www/itbity-ssh-panel
+Environment="PATH=/var/www/itbity-ssh-panel/venv/bin:/usr/sbin:/usr/bin"
+Environment="FLASK_APP=wsgi.py"
+ExecStart=/var/www/itbity-ssh-panel/venv/bin/flask quotas sync
+
+[Install]
+WantedBy=multi-user.target
+SERVICE
+
+systemctl daemon-reload
+systemctl enable itbity-quotas.service
+
 # Set proper permissions
 chown -R www-data:www-data $PROJECT_DIR
 chmod +x $PROJECT_DIR/wsgi.py
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import subprocess
+from datetime import datetime
+from itbity_db import Database  # installed next to this script
+
+LOG_FILE = '/var/log/ssh_connection_limits.log'
+ENV_FILE = '/var/www/itbity-ssh-panel/.env'
+
+def log_message(message):
+    try:
+        with open(LOG_FILE, 'a') as f:
+            f.write(f"[{datetime.now()}] {message}\n")
+    except:
+        pass
+
+def load_env():
+    env_vars = {}
+    try:
+        with open(ENV_FILE, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and '=' in line:
+                    key, value = line.split('=', 1)
+                    env_vars[key.strip()] = value.strip().strip("'\"")
+        return env_vars
+    except Exception as e:
+        log_message(f"ERROR: Failed to load .env: {e}")
+        return None
+
+def get_user_limit(username):
+    env = load_env()
+    if not env:
+        return None
+    
+    try:
+        conn = Database(env)
+        query = """
+            SELECT ul.max_connections 
+            FROM users u 
+            JOIN user_limits ul ON u.id = ul.user_id 
+            WHERE u.username = %s AND u.is_active = 1
+        """
+        result = conn.execute(query, (username,)).fetchone()
+        conn.close()
+        
+        if result:
+            return result[0]
+        return None
+            
+    except Exception as e:
+        log_message(f"ERROR: Database query failed: {e}")
+        return None
+
+def count_user_sessions(username):
+    try:
+        import re
+        
+        result = subprocess.run(
+            ['ss', '-tnp', 'state', 'established', '( sport = :22 )'],
+            capture_output=True,
+            text=True,
+            timeout=5
+        )
+        
+        if result.returncode != 0:
+            return 0
+        
+        pids = re.findall(r'pid=(\d+)', result.stdout)
+        
+        count = 0
+        for pid in set(pids):
+            try:
+                ps_result = subprocess.run(
+                    ['ps', '-o', 'user=', '-p', pid],
+                    capture_output=True,
+                    text=True,
+                    timeout=2
+                )
+                if ps_result.returncode == 0 and ps_result.stdout.strip() == username:
+                    count += 1
+            except:
+                continue
+        
+        return count
+        
+    except Exception as e:
+        log_message(f"ERROR: Failed to count sessions: {e}")
+        return 0
+
+def main():
+    username = os.environ.get('PAM_USER')
+    
+    if not username:
+        log_message("ERROR: PAM_USER not found")
+        sys.exit(0)
+    
+    max_connections = get_user_limit(username)
+    
+    if max_connections is None:
+        log_message(f"INFO: No limit configured for user '{username}', allowing login")
+        sys.exit(0)
+    
+    current_sessions = count_user_sessions(username)
+    
+    log_message(f"USER: {username}, CURRENT: {current_sessions}, MAX: {max_connections}")
+    
+    if current_sessions >= max_connections:
+        print("=" * 70)
+        print("CONNECTION LIMIT REACHED!")
+        print(f"Maximum connections allowed: {max_connections}")
+        print(f"Current active connections: {current_sessions}")
+        print("Please disconnect one session or contact your administrator.")
+        print("=" * 70)
+        log_message(f"DENIED: {username} reached limit ({current_sessions}/{max_connections})")
+        sys.exit(1)
+    else:
+        log_message(f"ALLOWED: {username} connection ({current_sessions + 1}/{max_connections})")
+        sys.exit(0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# itbity_db.py
+"""
+DB access shared by the root-run scripts (traffic_daemon.py and the PAM hooks
+check_user_limit.py / register_session.py). install.sh puts this module next
+to them in /usr/local/bin, where they import it from.
+
+The backend follows the panel's setting: DATABASE_URL (sqlite:///... or
+mysql+pymysql://...) or the legacy DB_* vars. Queries are written with %s
+placeholders and adapted for sqlite3.
+"""
+import os
+
+# SQLite side files; with WAL the panel (www-data) must be able to write all of them
+SQLITE_SUFFIXES = ("", "-wal", "-shm", "-journal")
+
+
+def _hand_over_sqlite(path):
+    """
+    These scripts run as root: a DB file or -wal/-shm file they create would
+    be root-owned and read-only for the panel. Give every file of the DB to
+    the owner of its directory (www-data, see install.sh).
+    """
+    if os.geteuid() != 0:
+        return
+    try:
+        st = os.stat(os.path.dirname(os.path.abspath(path)))
+    except OSError:
+        return
+    for suffix in SQLITE_SUFFIXES:
+        try:
+            f = os.stat(path + suffix)
+            if (f.st_uid, f.st_gid) != (st.st_uid, st.st_gid):
+                os.chown(path + suffix, st.st_uid, st.st_gid)
+        except OSError:
+            pass
+
+
+class Database:
+    """Tiny DB-API wrapper: execute() with %s placeholders, commit, rollback, close."""
+
+    def __init__(self, env, autocommit=False):
+        url = env.get("DATABASE_URL", "")
+        if url.startswith("sqlite:///"):
+            import sqlite3
+            path = url[len("sqlite:///"):]
+            # side files created by this process: group-writable like the panel's
+            old_umask = os.umask(0o002)
+            try:
+                self.conn = sqlite3.connect(
+                    path,
+                    timeout=float(env.get("SQLITE_BUSY_TIMEOUT", 5)),
+                    isolation_level=None if autocommit else "DEFERRED",
+                )
+                self.conn.execute("PRAGMA journal_mode=WAL")
+                self.conn.execute("PRAGMA synchronous=NORMAL")
+                # the first read creates -wal/-shm if nobody has them open
+                self.conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            finally:
+                os.umask(old_umask)
+            _hand_over_sqlite(path)
+            self.placeholder = "?"
+            return
+
+        import pymysql
+        from urllib.parse import urlsplit, unquote
+        if url:
+            parts = urlsplit(url)
+            params = dict(
+                host=parts.hostname or "localhost",
+                port=parts.port or 3306,
+                user=unquote(parts.username or ""),
+                password=unquote(parts.password or ""),
+                database=parts.path.lstrip("/"),
+            )
+        else:
+            params = dict(
+                host=env.get("DB_HOST", "localhost"),
+                user=env.get("DB_USER"),
+                password=env.get("DB_PASSWORD"),
+                database=env.get("DB_NAME"),
+            )
+        self.conn = pymysql.connect(charset="utf8mb4", autocommit=autocommit, **params)
+        self.placeholder = "%s"
+
+    def execute(self, sql, params=()):
+        cur = self.conn.cursor()
+        cur.execute(sql.replace("%s", self.placeholder), params)
+        return cur
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import subprocess
+import json
+import pwd
+from datetime import datetime, UTC
+from itbity_db import Database  # installed next to this script (same backend selection as config.py)
+
+LOG_FILE = "/var/log/ssh_session_register.log"
+ENV_FILE = "/var/www/itbity-ssh-panel/.env"
+NFT_BIN = "/usr/sbin/nft"   # nft path on Ubuntu
+
+
+# ===========================================================
+# SAFE LOGGER
+# ===========================================================
+def log(msg: str) -> None:
+    try:
+        with open(LOG_FILE, "a") as f:
+            f.write(f"[{datetime.now(UTC)}] {msg}\n")
+    except Exception:
+        # never break PAM on logging failure
+        pass
+
+
+# ===========================================================
+# LOAD .env
+# ===========================================================
+def load_env():
+    env = {}
+    try:
+        with open(ENV_FILE, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#") or "=" not in line:
+                    continue
+                key, value = line.split("=", 1)
+                env[key.strip()] = value.strip().strip("'\"")
+    except Exception as e:
+        log(f"Failed to load .env: {e}")
+    return env
+
+
+# ===========================================================
+# NFT HELPERS (UID rule)
+# ===========================================================
+def uid_rule_exists(uid: int) -> bool:
+    """Check if we already have a uid-based rule for this uid."""
+    try:
+        result = subprocess.run(
+            [NFT_BIN, "-j", "list", "chain", "inet", "itbity_traffic", "users"],
+            capture_output=True,
+            text=True,
+            timeout=2
+        )
+        if result.returncode != 0:
+            log(f"NFT LIST ERROR: {result.stderr.strip()}")
+            return False
+
+        data = json.loads(result.stdout)
+        comment = f"user_uid_{uid}"
+        for rule in data.get("rules", []):
+            if rule.get("comment") == comment:
+                return True
+    except Exception as e:
+        log(f"NFT uid_rule_exists ERROR: {e}")
+    return False
+
+
+def add_uid_rule(uid: int) -> None:
+    """Add nftables counter rule for this UID if not exists."""
+    comment = f"user_uid_{uid}"
+
+    if uid_rule_exists(uid):
+        log(f"NFT UID RULE EXISTS: UID={uid} rule={comment}")
+        return
+
+    try:
+        subprocess.run(
+            [
+                NFT_BIN,
+                "add", "rule",
+                "inet", "itbity_traffic", "users",
+                "meta", "skuid", str(uid),
+                "counter",
+                "comment", comment
+            ],
+            timeout=2,
+            capture_output=True,
+            text=True,
+        )
+        log(f"NFT UID RULE CREATED: UID={uid} rule={comment}")
+    except Exception as e:
+        log(f"NFT ADD UID RULE ERROR: {e}")
+
+
+# ===========================================================
+# REGISTER SESSION (DB + UID RULE)
+# ===========================================================
+def register_session(username: str, ip: str, sshd_pid: int) -> None:
+    env = load_env()
+    if not env:
+        log("Env not loaded — skipping DB insert")
+        return
+
+    # resolve Linux UID for this ssh/vpn user
+    try:
+        pw = pwd.getpwnam(username)
+        uid = pw.pw_uid
+    except Exception as e:
+        log(f"Failed to get uid for user={username}: {e}")
+        return
+
+    # create UID rule (if needed)
+    add_uid_rule(uid)
+    nft_rule_name = f"user_uid_{uid}"
+
+    try:
+        conn = Database(env)
+
+        # Fetch panel user_id
+        row = conn.execute("SELECT id FROM users WHERE username=%s", (username,)).fetchone()
+        if not row:
+            log(f"Panel user not found: {username}")
+            conn.close()
+            return
+
+        user_id = row[0]
+
+        now = datetime.now(UTC)
+        session_id = f"{username}-{uid}-{sshd_pid}-{int(now.timestamp())}"
+
+        # Insert session row; all sessions of same UID share same nft_rule_name
+        # (created_at is naive UTC, like the panel's datetime.utcnow defaults)
+        conn.execute(
+            """
+            INSERT INTO user_ip_sessions
+                (user_id, ip_address, session_id, nft_rule_name, sshd_pid, created_at, bytes_in, bytes_out)
+            VALUES
+                (%s, %s, %s, %s, %s, %s, 0, 0)
+            """,
+            (user_id, ip, session_id, nft_rule_name, sshd_pid, now.strftime("%Y-%m-%d %H:%M:%S")),
+        )
+        conn.commit()
+        conn.close()
+
+        log(
+            f"DB session added: user={username}, uid={uid}, "
+            f"ip={ip}, session={session_id}, rule={nft_rule_name}, pid={sshd_pid}"
+        )
+    except Exception as e:
+        log(f"DB ERROR: {e}")
+
+
+# ===========================================================
+# CLOSE SESSION (PAM_TYPE=close_session)
+# ===========================================================
+def close_session(username: str, sshd_pid: int) -> None:
+    env = load_env()
+    if not env:
+        log("Env not loaded — skipping DB close")
+        return
+
+    try:
+        conn = Database(env)
+        cur = conn.execute(
+            """
+            UPDATE user_ip_sessions
+            SET closed_at = %s
+            WHERE sshd_pid = %s
+              AND closed_at IS NULL
+              AND user_id = (SELECT id FROM users WHERE username = %s)
+            """,
+            (datetime.now(UTC).strftime("%Y-%m-%d %H:%M:%S"), sshd_pid, username),
+        )
+        conn.commit()
+        conn.close()
+        log(f"DB session closed: user={username}, pid={sshd_pid}, rows={cur.rowcount}")
+    except Exception as e:
+        log(f"DB ERROR (close): {e}")
+
+
+# ===========================================================
+# MAIN ENTRY POINT
+# ===========================================================
+def main() -> None:
+    username = os.environ.get("PAM_USER")
+    ip = os.environ.get("PAM_RHOST")
+    pam_type = os.environ.get("PAM_TYPE", "open_session")
+
+    # pam_exec runs us as a child of the sshd [priv] process for this
+    # connection; open_session and close_session both come from it
+    sshd_pid = os.getppid()
+
+    # TTY برای ما مهم نیست در نسخه UID، ولی اگر خواستی برای دیباگ:
+    # tty = os.environ.get("PAM_TTY", "notty")
+
+    # Ignore root (not managed by panel)
+    if username == "root":
+        log("Skipping root session")
+        sys.exit(0)
+
+    if pam_type == "close_session":
+        if username:
+            close_session(username, sshd_pid)
+        sys.exit(0)
+
+    if pam_type != "open_session":
+        sys.exit(0)
+
+    if not username or not ip:
+        log(f"Missing PAM_USER or PAM_RHOST (user={username}, ip={ip})")
+        sys.exit(0)
+
+    register_session(username, ip, sshd_pid)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
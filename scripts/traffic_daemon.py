@@ -0,0 +1,600 @@
+#!/usr/bin/env python3
+import os
+import pwd
+import re
+import signal
+import time
+import subprocess
+import json
+from datetime import datetime, timedelta
+from itbity_db import Database  # installed next to this script
+
+ENV_FILE = "/var/www/itbity-ssh-panel/.env"
+LOG_FILE = "/var/log/traffic_daemon.log"
+
+# Closed-session reconciliation (startup + periodic safety net for missed PAM close events)
+RECONCILE_INTERVAL = 600
+
+# Per-user daily totals (user_traffic_daily) kept for the usage charts
+USER_DAILY_RETENTION_DAYS = 35
+
+# Live per-user rates: sliding windows (seconds) over per-pass counter deltas,
+# published for the panel (RATES_FILE in .env)
+RATE_WINDOWS = (60, 300, 900)
+RATE_BUCKET_SECONDS = 5
+DEFAULT_RATES_FILE = "/run/itbity-traffic/rates.json"
+
+# Idle session reaper (REAPER_IDLE_MINUTES in .env, 0 = off)
+REAPER_SCAN_INTERVAL = 30
+# bytes a connection must move between two scans to count as active;
+# ClientAlive / TCP keepalive chatter stays far below this
+DEFAULT_REAPER_ACTIVITY_BYTES = 4096
+
+# Quota enforcement: when the `@user_quotas` drop rule is gone (reboot with
+# `flush ruleset`, `nft flush`) the panel re-installs it and every quota
+QUOTA_SYNC_UNIT = "itbity-quotas.service"
+QUOTA_SYNC_RETRY = 60
+
+
+def log(msg):
+    try:
+        with open(LOG_FILE, "a") as f:
+            f.write(f"[{datetime.now()}] {msg}\n")
+    except Exception:
+        pass
+
+
+def load_env():
+    env = {}
+    try:
+        with open(ENV_FILE, "r") as f:
+            for line in f:
+                line = line.strip()
+                if "=" in line and not line.startswith("#"):
+                    key, value = line.split("=", 1)
+                    env[key.strip()] = value.strip().strip("'\"")
+    except Exception as e:
+        log(f"Failed to load .env: {e}")
+    return env
+
+
+def db():
+    return Database(load_env(), autocommit=True)
+
+
+def utcnow():
+    """Naive UTC timestamp, matching the panel's datetime.utcnow columns."""
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def get_nft_json():
+    try:
+        result = subprocess.run(
+            ["nft", "-j", "list", "chain", "inet", "itbity_traffic", "users"],
+            capture_output=True,
+            text=True
+        )
+        if result.returncode != 0:
+            log(f"NFT ERROR: {result.stderr}")
+            return None
+
+        return json.loads(result.stdout)
+    except Exception as e:
+        log(f"NFT JSON ERROR: {e}")
+        return None
+
+
+def quotas_enforced(nft_data):
+    """True if the chain still has the `quota name meta skuid map @user_quotas drop` rule."""
+    for item in (nft_data or {}).get("nftables", []):
+        if "rule" in item and "user_quotas" in json.dumps(item["rule"]):
+            return True
+    return False
+
+
+def request_quota_sync():
+    """Start the oneshot unit that runs `flask quotas sync` as the panel user."""
+    try:
+        subprocess.run(["systemctl", "start", "--no-block", QUOTA_SYNC_UNIT],
+                       capture_output=True, text=True, timeout=10)
+        log(f"Quota drop rule missing: started {QUOTA_SYNC_UNIT}")
+    except Exception as e:
+        log(f"QUOTA SYNC ERROR: {e}")
+
+
+def extract_bytes(rule):
+    """
+    nft JSON structure:
+      rule: { "expr": [ { "counter": { "packets": X, "bytes": Y } }, ... ] }
+    """
+    try:
+        for expr in rule.get("expr", []):
+            if "counter" in expr:
+                return max(0, int(expr["counter"].get("bytes", 0)))
+    except Exception:
+        pass
+    return 0
+
+
+def read_uid_rules(nft_data):
+    """{rule comment: (rule handle, counter bytes)} for the per-UID counter rules."""
+    rules = {}
+    try:
+        for item in nft_data.get("nftables", []):
+            rule = item.get("rule")
+            comment = (rule or {}).get("comment") or ""
+            if comment.startswith("user_uid_"):
+                rules[comment] = (rule.get("handle"), extract_bytes(rule))
+    except Exception as e:
+        log(f"Parse rules error: {e}")
+    return rules
+
+
+def counter_delta(checkpoint, handle, new_bytes, baseline):
+    """
+    Bytes to account since the last checkpoint. A counter that went down
+    (reboot, `nft flush`) or a rule with a new handle was re-created from 0,
+    so everything it holds is new. An unknown rule is new as well, except on
+    the first run after upgrading (`baseline`), when it was already counted.
+    """
+    if checkpoint is None:
+        return 0 if baseline else new_bytes
+    last_handle, last_bytes = checkpoint
+    if new_bytes < last_bytes or (last_handle is not None and handle != last_handle):
+        return new_bytes
+    return new_bytes - last_bytes
+
+
+def account_traffic(conn, rules, baseline, deltas=None):
+    """
+    Add each rule's delta exactly once: to the owner's byte counter and to the
+    newest open session of that UID (all sessions of a UID share its rule),
+    the sum per reseller to that reseller's running total, the sum per user
+    to that user's row of user_traffic_daily and the grand total to today's
+    row of traffic_daily. The checkpoints move in the same
+    transaction as the usage. `deltas`, if given, receives {rule: bytes}.
+    """
+    checkpoints = {
+        name: (handle, last)
+        for name, handle, last in conn.execute(
+            "SELECT rule_name, rule_handle, last_bytes FROM traffic_checkpoints"
+        ).fetchall()
+    }
+    owners = {}
+    for sess_id, user_id, reseller_id, rule_name in conn.execute(
+        "SELECT s.id, s.user_id, u.owner_id, s.nft_rule_name FROM user_ip_sessions s "
+        "JOIN users u ON u.id = s.user_id WHERE s.closed_at IS NULL ORDER BY s.id"
+    ).fetchall():
+        owners[rule_name] = (sess_id, user_id, reseller_id)
+
+    now = utcnow()
+    accounted = 0
+    reseller_deltas = {}
+    user_deltas = {}
+    for rule_name, (handle, new_bytes) in rules.items():
+        checkpoint = checkpoints.get(rule_name)
+        delta = counter_delta(checkpoint, handle, new_bytes, baseline)
+
+        if checkpoint is None:
+            conn.execute(
+                "INSERT INTO traffic_checkpoints (rule_name, rule_handle, last_bytes, updated_at) "
+                "VALUES (%s, %s, %s, %s)",
+                (rule_name, handle, new_bytes, now)
+            )
+        elif checkpoint != (handle, new_bytes):
+            conn.execute(
+                "UPDATE traffic_checkpoints SET rule_handle = %s, last_bytes = %s, updated_at = %s "
+                "WHERE rule_name = %s",
+                (handle, new_bytes, now, rule_name)
+            )
+
+        if delta <= 0:
+            continue
+        if deltas is not None:
+            deltas[rule_name] = delta
+
+        owner = owners.get(rule_name)
+        if owner is None:
+            # traffic after the last session closed (lingering process): latest session's owner
+            owner = conn.execute(
+                "SELECT s.id, s.user_id, u.owner_id FROM user_ip_sessions s JOIN users u ON u.id = s.user_id "
+                "WHERE s.nft_rule_name = %s ORDER BY s.id DESC LIMIT 1",
+                (rule_name,)
+            ).fetchone()
+            if owner is None:
+                continue
+        sess_id, user_id, reseller_id = owner
+
+        conn.execute(
+            "UPDATE user_ip_sessions SET bytes_in = bytes_in + %s WHERE id = %s",
+            (delta, sess_id)
+        )
+        conn.execute(
+            "UPDATE user_limits SET traffic_used_bytes = traffic_used_bytes + %s, updated_at = %s "
+            "WHERE user_id = %s",
+            (delta, now, user_id)
+        )
+        if reseller_id:
+            reseller_deltas[reseller_id] = reseller_deltas.get(reseller_id, 0) + delta
+        user_deltas[user_id] = user_deltas.get(user_id, 0) + delta
+        accounted += delta
+
+    for reseller_id, delta in reseller_deltas.items():
+        conn.execute(
+            "UPDATE reseller_quotas SET traffic_used_bytes = traffic_used_bytes + %s WHERE reseller_id = %s",
+            (delta, reseller_id)
+        )
+    if accounted:
+        add_daily_traffic(conn, accounted)
+        add_user_daily_traffic(conn, user_deltas)
+    return accounted
+
+
+def add_daily_traffic(conn, delta):
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    if conn.execute(
+        "UPDATE traffic_daily SET bytes = bytes + %s WHERE day = %s", (delta, today)
+    ).rowcount == 0:
+        # only this daemon writes the table, so there is no insert race
+        conn.execute("INSERT INTO traffic_daily (day, bytes) VALUES (%s, %s)", (today, delta))
+
+
+def add_user_daily_traffic(conn, user_deltas):
+    today = datetime.utcnow().strftime("%Y-%m-%d")
+    for user_id, delta in user_deltas.items():
+        if conn.execute(
+            "UPDATE user_traffic_daily SET bytes = bytes + %s WHERE user_id = %s AND day = %s",
+            (delta, user_id, today)
+        ).rowcount == 0:
+            conn.execute(
+                "INSERT INTO user_traffic_daily (user_id, day, bytes) VALUES (%s, %s, %s)",
+                (user_id, today, delta)
+            )
+
+
+def prune_user_daily_traffic(conn):
+    cutoff = (datetime.utcnow() - timedelta(days=USER_DAILY_RETENTION_DAYS)).strftime("%Y-%m-%d")
+    conn.execute("DELETE FROM user_traffic_daily WHERE day < %s", (cutoff,))
+
+
+class RateWindows:
+    """
+    Per-UID byte counts over sliding windows. Deltas go into a ring of
+    RATE_BUCKET_SECONDS buckets long enough for the largest window; every
+    window keeps a running sum per UID, so a bucket is added once and
+    subtracted once when it leaves the window. Memory per UID is bounded by
+    the number of buckets it appears in.
+    """
+
+    def __init__(self, windows=RATE_WINDOWS, bucket_seconds=RATE_BUCKET_SECONDS):
+        self.windows = windows
+        self.bucket_seconds = bucket_seconds
+        self.size = max(windows) // bucket_seconds
+        self.ring = [None] * self.size          # (bucket number, {uid: bytes})
+        self.sums = {w: {} for w in windows}
+        self.current = None
+        self.started = None
+
+    def _expire(self, bucket):
+        """Drop `bucket - window` from every window (the oldest one each window still held)."""
+        for window in self.windows:
+            old = bucket - window // self.bucket_seconds
+            slot = self.ring[old % self.size]
+            if slot is None or slot[0] != old:
+                continue
+            sums = self.sums[window]
+            for uid, value in slot[1].items():
+                left = sums.get(uid, 0) - value
+                if left > 0:
+                    sums[uid] = left
+                else:
+                    sums.pop(uid, None)
+
+    def add(self, now, uid_deltas):
+        bucket = int(now // self.bucket_seconds)
+        if self.started is None:
+            self.started = now
+            self.current = bucket - 1
+        if bucket - self.current >= self.size:
+            # nothing for longer than the largest window: start over
+            self.ring = [None] * self.size
+            self.sums = {w: {} for w in self.windows}
+            self.current = bucket - 1
+        # every bucket since the last pass enters the windows (and pushes an old one out)
+        for b in range(self.current + 1, bucket + 1):
+            self._expire(b)
+            self.ring[b % self.size] = (b, {})
+        self.current = max(self.current, bucket)
+        slot = self.ring[bucket % self.size][1]
+        for uid, delta in uid_deltas.items():
+            if delta <= 0:
+                continue
+            slot[uid] = slot.get(uid, 0) + delta
+            for sums in self.sums.values():
+                sums[uid] = sums.get(uid, 0) + delta
+
+    def rates(self, now):
+        """{uid: [bytes/s per window]} of the UIDs with traffic in the largest window."""
+        elapsed = max(self.bucket_seconds, now - self.started) if self.started is not None else 1
+        spans = [min(w, elapsed) for w in self.windows]
+        largest = self.sums[max(self.windows)]
+        return {
+            uid: [round(self.sums[w].get(uid, 0) / span, 1) for w, span in zip(self.windows, spans)]
+            for uid in largest
+        }
+
+
+_usernames = {}
+
+
+def uid_username(uid):
+    name = _usernames.get(uid)
+    if name is None:
+        try:
+            name = pwd.getpwuid(uid).pw_name
+        except KeyError:
+            name = str(uid)
+        _usernames[uid] = name
+    return name
+
+
+def publish_rates(path, windows, now):
+    """Write the current rates for the panel (atomic replace; read by the top-N endpoint)."""
+    payload = {
+        "generated_at": time.time(),
+        "windows": list(windows.windows),
+        "users": {uid_username(uid): r for uid, r in windows.rates(now).items()},
+    }
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump(payload, f)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except OSError as e:
+        log(f"RATES ERROR: {e}")
+
+
+def sshd_alive(pid):
+    """True if `pid` is still a running sshd process."""
+    if not pid:
+        return False
+    try:
+        with open(f"/proc/{pid}/comm", "r") as f:
+            return f.read().strip().startswith("sshd")
+    except OSError:
+        return False
+
+
+def reconcile_sessions(conn):
+    """
+    Close open session rows whose sshd process is gone (crash, kill -9,
+    reboot) so the open set only holds live sessions. Rows without a pid
+    predate close_session handling and are closed as well.
+    """
+    rows = conn.execute(
+        "SELECT id, sshd_pid FROM user_ip_sessions WHERE closed_at IS NULL"
+    ).fetchall()
+    stale = [sess_id for sess_id, pid in rows if not sshd_alive(pid)]
+    now = utcnow()
+    for sess_id in stale:
+        conn.execute(
+            "UPDATE user_ip_sessions SET closed_at = %s WHERE id = %s AND closed_at IS NULL",
+            (now, sess_id)
+        )
+    log(f"Reconciled sessions: open={len(rows)} closed_stale={len(stale)}")
+
+
+def read_ssh_sockets():
+    """
+    Established connections to sshd from one `ss -tnpi` call:
+    {(local, peer): {"pids": [...], "bytes": bytes_acked + bytes_received}}.
+    """
+    try:
+        result = subprocess.run(
+            ["ss", "-Htnpi", "state", "established", "( sport = :22 )"],
+            capture_output=True, text=True, timeout=10
+        )
+    except Exception as e:
+        log(f"SS ERROR: {e}")
+        return None
+    if result.returncode != 0:
+        log(f"SS ERROR: {result.stderr}")
+        return None
+
+    sockets = {}
+    current = None
+    for line in result.stdout.splitlines():
+        if not line.strip():
+            continue
+        if not line[0].isspace():
+            # Recv-Q Send-Q Local Peer Process
+            parts = line.split()
+            current = (parts[2], parts[3]) if len(parts) >= 4 else None
+            if current:
+                sockets[current] = {"pids": [int(p) for p in re.findall(r"pid=(\d+)", line)], "bytes": 0}
+        elif current is not None:
+            # the indented TCP info line of the socket above
+            acked = re.search(r"bytes_acked:(\d+)", line)
+            received = re.search(r"bytes_received:(\d+)", line)
+            sockets[current]["bytes"] = (int(acked.group(1)) if acked else 0) + \
+                                        (int(received.group(1)) if received else 0)
+    return sockets
+
+
+def process_uid(pid):
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("Uid:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class IdleReaper:
+    """
+    Finds SSH connections that moved less than `activity_bytes` per scan for
+    `idle_seconds`. A user's only connection is also kept while the user's
+    UID counter (tunnel traffic) moves: that traffic can only be its own.
+    Only the user-owned sshd session process of an idle connection is
+    terminated; sshd then closes the connection and PAM the session row.
+    """
+
+    def __init__(self, idle_seconds, activity_bytes):
+        self.idle_seconds = idle_seconds
+        self.activity_bytes = activity_bytes
+        self.connections = {}   # (local, peer) -> [bytes at last scan, last active]
+        self.uid_active = {}    # uid -> last time its counter moved
+
+    def note_uid_traffic(self, uid_deltas, now):
+        for uid, delta in uid_deltas.items():
+            if delta > 0:
+                self.uid_active[uid] = now
+
+    def find_idle(self, sockets, managed_uids, now):
+        """[(key, uid, user-owned pids, idle seconds)] of the connections to reap."""
+        candidates = []
+        per_uid = {}
+        for key, sock in sockets.items():
+            state = self.connections.get(key)
+            moved = sock["bytes"] - state[0] if state else None
+            if state is None or moved < 0 or moved >= self.activity_bytes:
+                self.connections[key] = [sock["bytes"], now]
+            else:
+                state[0] = sock["bytes"]
+
+            owned = [(pid, process_uid(pid)) for pid in sock["pids"]]
+            uids = {uid for _, uid in owned if uid in managed_uids}
+            if len(uids) != 1:
+                continue    # pre-auth, root or unmanaged account
+            uid = uids.pop()
+            per_uid[uid] = per_uid.get(uid, 0) + 1
+
+            idle_for = now - self.connections[key][1]
+            if idle_for >= self.idle_seconds:
+                candidates.append((key, uid, [pid for pid, u in owned if u == uid], idle_for))
+
+        # forget connections that are gone
+        for key in set(self.connections) - set(sockets):
+            del self.connections[key]
+
+        return [
+            c for c in candidates
+            if per_uid[c[1]] > 1 or now - self.uid_active.get(c[1], float("-inf")) >= self.idle_seconds
+        ]
+
+
+def reap_idle(conn, reaper, sockets, managed_uids):
+    """Terminate idle sessions and record them in reaped_sessions. Returns the count."""
+    now = time.monotonic()
+    reaped = 0
+    for (local, peer), uid, pids, idle_for in reaper.find_idle(sockets, managed_uids, now):
+        killed = []
+        for pid in pids:
+            if not sshd_alive(pid):
+                continue
+            try:
+                os.kill(pid, signal.SIGTERM)
+                killed.append(pid)
+            except OSError as e:
+                log(f"REAPER: kill {pid} failed: {e}")
+        if not killed:
+            continue
+        reaped += 1
+        reaper.connections.pop((local, peer), None)
+
+        username = uid_username(uid)
+        row = conn.execute("SELECT id FROM users WHERE username = %s", (username,)).fetchone()
+        conn.execute(
+            "INSERT INTO reaped_sessions (created_at, user_id, username, sshd_pid, peer, idle_seconds) "
+            "VALUES (%s, %s, %s, %s, %s, %s)",
+            (utcnow(), row[0] if row else None, username, killed[0], peer, int(idle_for))
+        )
+        log(f"REAPER: terminated sshd {killed} of {username} from {peer}, idle {int(idle_for)}s")
+    return reaped
+
+
+def main_loop():
+    log("Traffic daemon started.")
+    last_reconcile = None
+    last_quota_sync = None
+    baseline = None
+
+    env = load_env()
+    rates = RateWindows()
+    rates_file = env.get("RATES_FILE") or DEFAULT_RATES_FILE
+    idle_minutes = float(env.get("REAPER_IDLE_MINUTES") or 0)
+    reaper = None
+    last_reap = time.monotonic()
+    if idle_minutes > 0:
+        reaper = IdleReaper(
+            idle_minutes * 60,
+            int(env.get("REAPER_ACTIVITY_BYTES") or DEFAULT_REAPER_ACTIVITY_BYTES)
+        )
+        log(f"Idle reaper enabled: {idle_minutes:g} min")
+
+    while True:
+        try:
+            if last_reconcile is None or time.monotonic() - last_reconcile >= RECONCILE_INTERVAL:
+                conn = db()
+                reconcile_sessions(conn)
+                prune_user_daily_traffic(conn)
+                conn.close()
+                _usernames.clear()
+                last_reconcile = time.monotonic()
+
+            nft_data = get_nft_json()
+            if not quotas_enforced(nft_data) and (
+                    last_quota_sync is None or time.monotonic() - last_quota_sync >= QUOTA_SYNC_RETRY):
+                # also covers the daemon's start after a reboot
+                request_quota_sync()
+                last_quota_sync = time.monotonic()
+            if not nft_data:
+                time.sleep(5)
+                continue
+
+            conn = Database(load_env())
+            try:
+                if baseline is None:
+                    # no checkpoints yet = first run after upgrading: current
+                    # counters were already accounted by the old daemon
+                    baseline = conn.execute("SELECT COUNT(*) FROM traffic_checkpoints").fetchone()[0] == 0
+                    if baseline:
+                        log("No traffic checkpoints: taking current counters as baseline")
+                rules = read_uid_rules(nft_data)
+                deltas = {}
+                account_traffic(conn, rules, baseline, deltas)
+                conn.commit()
+                baseline = False
+
+                now = time.monotonic()
+                uid_deltas = {int(name[len("user_uid_"):]): d for name, d in deltas.items()}
+                # the first pass holds everything since the daemon last ran
+                rates.add(now, uid_deltas if rates.started is not None else {})
+                publish_rates(rates_file, rates, now)
+
+                if reaper is not None:
+                    reaper.note_uid_traffic(uid_deltas, now)
+                    if now - last_reap >= REAPER_SCAN_INTERVAL:
+                        last_reap = now
+                        sockets = read_ssh_sockets()
+                        if sockets is not None:
+                            managed = {int(name[len("user_uid_"):]) for name in rules}
+                            if reap_idle(conn, reaper, sockets, managed):
+                                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+        except Exception as e:
+            log(f"MAIN LOOP ERROR: {e}")
+
+        time.sleep(5)
+
+
+if __name__ == "__main__":
+    main_loop()
@@ -1,19 +1,52 @@
 // Admin Dashboard JavaScript
 
 document.addEventListener('DOMContentLoaded', function() {
-    // Animate stats on page load
-    animateStats();
+    // Load the summary counters, then animate them
+    loadSummary();
     
     // Handle action buttons
     initActionButtons();
 });
 
+// Dashboard summary: one small request, served from the telemetry snapshot
+async function loadSummary() {
+    try {
+        const panelPath = window.location.pathname.split('/')[1];
+        const res = await fetch(`/${panelPath}/dashboard/api/summary`);
+        const data = await res.json();
+        if (!data.success) return;
+
+        const s = data.summary;
+        document.getElementById('summaryTotal').textContent = s.users.total;
+        document.getElementById('summaryActive').textContent = s.users.active;
+        document.getElementById('summaryTraffic').textContent = formatBytes(s.traffic_today_bytes);
+        document.getElementById('summaryConnections').textContent = s.connections;
+        document.getElementById('summaryProblems').textContent = `${s.users.expired} / ${s.users.over_quota}`;
+        animateStats();
+    } catch (err) {
+        console.error('Error loading summary:', err);
+    }
+}
+
+function formatBytes(bytes) {
+    const units = ['B', 'KB', 'MB', 'GB', 'TB'];
+    let value = bytes || 0;
+    let i = 0;
+    while (value >= 1024 && i < units.length - 1) {
+        value /= 1024;
+        i++;
+    }
+    return `${value.toFixed(i ? 1 : 0)} ${units[i]}`;
+}
+
 // Animate statistics numbers
 function animateStats() {
     const statCards = document.querySelectorAll('.stat-card h3');
     
     statCards.forEach(stat => {
         const finalValue = stat.textContent.trim();
+        // only plain counters are animated ("1.5 GB", "3 / 4" are shown as-is)
+        if (!/^\d+$/.test(finalValue)) return;
         const numericValue = parseFloat(finalValue.replace(/[^\d.]/g, ''));
         
         if (!isNaN(numericValue)) {
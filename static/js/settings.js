@@ -48,6 +48,8 @@ function handleToggleChange(e) {
 function loadSettings() {
     // TODO: Load settings from backend
     console.log('Loading settings...');
+    loadProfiling();
+    loadApiTokens();
 }
 
 // SSL Functions
@@ -155,9 +157,15 @@ function createBackup() {
     const confirmed = confirm('Create a full system backup?\n\nThis will include:\n- Database\n- Configuration files\n- User data');
     
     if (confirmed) {
-        alert('Creating backup...\n\nThis feature will be implemented soon!');
-        // TODO: Implement backup creation
-        showNotification('Backup created successfully', 'success');
+        // A plain form POST lets the browser stream the download to disk
+        const panelPath = window.location.pathname.split('/')[1];
+        const form = document.createElement('form');
+        form.method = 'POST';
+        form.action = `/${panelPath}/settings/api/backup/create`;
+        document.body.appendChild(form);
+        form.submit();
+        form.remove();
+        showNotification('Backup download started', 'success');
     }
 }
 
@@ -165,11 +173,169 @@ function restoreBackup() {
     const confirmed = confirm('Restore from backup?\n\n⚠️ WARNING: This will overwrite current data!\n\nAre you sure?');
     
     if (confirmed) {
-        alert('Restore from backup...\n\nThis feature will be implemented soon!');
-        // TODO: Implement backup restore
+        const input = document.createElement('input');
+        input.type = 'file';
+        input.accept = '.gz,application/gzip';
+        input.addEventListener('change', () => {
+            if (input.files.length) uploadBackup(input.files[0]);
+        });
+        input.click();
     }
 }
 
+async function uploadBackup(file) {
+    const panelPath = window.location.pathname.split('/')[1];
+    showNotification('Restoring backup...', 'info');
+    try {
+        // The file is sent as the raw body, so the server reads it as a stream
+        const res = await fetch(`/${panelPath}/settings/api/backup/restore`, {
+            method: 'POST',
+            headers: {'Content-Type': 'application/gzip'},
+            body: file
+        });
+        const data = await res.json();
+        if (!data.success) {
+            alert(data.message || 'Restore failed');
+            return;
+        }
+        const counts = Object.entries(data.counts).map(([t, n]) => `${t}: ${n}`).join('\n');
+        const errors = data.linux ? Object.keys(data.linux.errors || {}).length : 0;
+        alert(`Backup restored\n\n${counts}` + (errors ? `\n\n${errors} Linux users failed` : ''));
+        showNotification('Backup restored', 'success');
+    } catch (err) {
+        alert('Restore failed: ' + err);
+    }
+}
+
+// Request Profiling
+function profilingUrl(suffix = '') {
+    const panelPath = window.location.pathname.split('/')[1];
+    return `/${panelPath}/settings/api/profiling${suffix}`;
+}
+
+async function loadProfiling() {
+    const select = document.getElementById('profilingEndpoint');
+    if (!select) return;
+    try {
+        const res = await fetch(profilingUrl());
+        const data = await res.json();
+        if (!data.success) return;
+
+        if (!select.options.length) {
+            data.endpoints.forEach(ep => select.add(new Option(ep, ep)));
+            select.value = data.endpoints.includes('user_management.get_users') ? 'user_management.get_users' : data.endpoints[0];
+        }
+
+        const badge = document.getElementById('profilingBadge');
+        const state = document.getElementById('profilingState');
+        badge.classList.toggle('active', !!data.armed);
+        badge.classList.toggle('inactive', !data.armed);
+        state.textContent = data.armed ? `${data.armed.endpoint} (${data.armed.remaining} left)` : 'Off';
+
+        const list = document.getElementById('profileList');
+        list.innerHTML = '';
+        data.profiles.slice(0, 20).forEach(p => {
+            const li = document.createElement('li');
+            const a = document.createElement('a');
+            a.href = profilingUrl('/' + encodeURIComponent(p.name));
+            a.textContent = p.name;
+            li.appendChild(a);
+            if (p.duration_ms !== undefined) {
+                li.appendChild(document.createTextNode(` — ${p.method} ${p.path} ${p.duration_ms} ms`));
+            }
+            list.appendChild(li);
+        });
+    } catch (err) {
+        console.error('Profiling status failed:', err);
+    }
+}
+
+async function armProfiling() {
+    const res = await fetch(profilingUrl(), {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({
+            endpoint: document.getElementById('profilingEndpoint').value,
+            mode: document.getElementById('profilingMode').value,
+            requests: parseInt(document.getElementById('profilingRequests').value, 10) || 10
+        })
+    });
+    const data = await res.json();
+    if (!data.success) {
+        alert(data.message || 'Failed to start profiling');
+        return;
+    }
+    showNotification('Profiling armed', 'success');
+    loadProfiling();
+}
+
+async function disarmProfiling() {
+    await fetch(profilingUrl(), {method: 'DELETE'});
+    showNotification('Profiling stopped', 'info');
+    loadProfiling();
+}
+
+// API Tokens
+function tokensUrl(suffix = '') {
+    const panelPath = window.location.pathname.split('/')[1];
+    return `/${panelPath}/settings/api/tokens${suffix}`;
+}
+
+async function loadApiTokens() {
+    const list = document.getElementById('apiTokenList');
+    if (!list) return;
+    try {
+        const res = await fetch(tokensUrl());
+        const data = await res.json();
+        if (!data.success) return;
+        list.innerHTML = '';
+        data.tokens.forEach(t => {
+            const li = document.createElement('li');
+            const used = t.last_used_at ? `last used ${t.last_used_at}` : 'never used';
+            li.textContent = `${t.name} — ${t.prefix}… — ${t.is_active ? used : 'revoked'} `;
+            if (t.is_active) {
+                const btn = document.createElement('button');
+                btn.className = 'btn-action secondary';
+                btn.textContent = 'Revoke';
+                btn.onclick = () => revokeApiToken(t.id);
+                li.appendChild(btn);
+            }
+            list.appendChild(li);
+        });
+    } catch (err) {
+        console.error('Loading API tokens failed:', err);
+    }
+}
+
+async function createApiToken() {
+    const name = document.getElementById('apiTokenName').value.trim();
+    if (!name) {
+        alert('Enter a name for the token');
+        return;
+    }
+    const res = await fetch(tokensUrl(), {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({name})
+    });
+    const data = await res.json();
+    if (!data.success) {
+        alert(data.message || 'Failed to create token');
+        return;
+    }
+    // shown once: only its hash is stored
+    prompt('Copy the token now, it will not be shown again:', data.token);
+    document.getElementById('apiTokenName').value = '';
+    loadApiTokens();
+}
+
+async function revokeApiToken(id) {
+    if (!confirm('Revoke this token?')) return;
+    await fetch(tokensUrl('/' + id), {method: 'DELETE'});
+    showNotification('Token revoked', 'info');
+    loadApiTokens();
+}
+
 // Notification Helper
 function showNotification(message, type = 'info') {
     // Create notification element
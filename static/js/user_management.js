@@ -6,6 +6,7 @@ let currentFilter = 'all';
 document.addEventListener('DOMContentLoaded', function () {
   setupEventListeners();
   loadUsers();
+  loadResellers();
 });
 
 function setupEventListeners() {
@@ -28,6 +29,11 @@ function setupEventListeners() {
   if (addUserBtn) {
     addUserBtn.addEventListener('click', showAddUserModal);
   }
+
+  const addResellerBtn = document.getElementById('addResellerBtn');
+  if (addResellerBtn) {
+    addResellerBtn.addEventListener('click', () => showResellerModal(null));
+  }
 }
 
 async function loadUsers() {
@@ -44,6 +50,7 @@ async function loadUsers() {
     }
 
     allUsers = data.users || [];
+    if (data.reseller) renderResellerQuota(data.reseller);
     updateStats();
     updateProblemBadge();
     filterUsers();
@@ -425,6 +432,176 @@ function deleteUser(userId) {
   });
 }
 
+// ---------- Resellers ----------
+
+let allResellers = [];
+
+function quotaText(used, limit) {
+  return `${used} / ${limit ? limit : '∞'}`;
+}
+
+function renderResellerQuota(q) {
+  document.getElementById('quotaUsers').textContent = quotaText(q.users_count, q.max_users);
+  document.getElementById('quotaTraffic').textContent = quotaText(q.traffic_allocated_gb, q.traffic_quota_gb);
+  document.getElementById('quotaConnections').textContent = quotaText(q.connections_allocated, q.connection_quota);
+  document.getElementById('quotaUsed').textContent = q.traffic_used_gb;
+}
+
+async function loadResellers() {
+  const tbody = document.getElementById('resellersTableBody');
+  if (!tbody) return;
+  try {
+    const panelPath = window.location.pathname.split('/')[1];
+    const res = await fetch(`/${panelPath}/user_management/api/resellers`);
+    const data = await res.json();
+    if (!data.success) return;
+    allResellers = data.resellers || [];
+
+    if (!allResellers.length) {
+      tbody.innerHTML = `<tr><td colspan="7" class="text-center" style="color:var(--text-secondary);">No resellers</td></tr>`;
+      return;
+    }
+    tbody.innerHTML = allResellers
+      .map((r) => {
+        const q = r.quota || {};
+        return `
+        <tr>
+          <td><strong>${r.username}</strong></td>
+          <td>
+            <span class="badge badge-${r.is_active ? 'active' : 'inactive'}">
+              <i class="fas fa-${r.is_active ? 'check-circle' : 'times-circle'}"></i>
+              ${r.is_active ? 'Active' : 'Inactive'}
+            </span>
+          </td>
+          <td>${quotaText(q.users_count ?? 0, q.max_users)}</td>
+          <td>${quotaText(q.traffic_allocated_gb ?? 0, q.traffic_quota_gb)}</td>
+          <td>${quotaText(q.connections_allocated ?? 0, q.connection_quota)}</td>
+          <td>${q.traffic_used_gb ?? 0}</td>
+          <td>
+            <div class="action-buttons">
+              <button class="btn-action edit" onclick="showResellerModal(${r.id})" title="Edit">
+                <i class="fas fa-edit"></i>
+              </button>
+              <button class="btn-action delete" onclick="deleteReseller(${r.id})" title="Delete">
+                <i class="fas fa-trash"></i>
+              </button>
+            </div>
+          </td>
+        </tr>`;
+      })
+      .join('');
+  } catch (err) {
+    console.error('Error loading resellers:', err);
+  }
+}
+
+function showResellerModal(resellerId) {
+  const reseller = resellerId ? allResellers.find((r) => r.id === resellerId) : null;
+  const q = (reseller && reseller.quota) || {};
+
+  Swal.fire({
+    title: reseller ? `Edit Reseller: ${reseller.username}` : 'Add Reseller',
+    html: `
+      <style>
+        .modal-grid{display:grid;grid-template-columns:repeat(2,1fr);gap:15px;text-align:left}
+        .modal-grid-full{grid-column:1/-1}
+        .form-label{display:block;margin-bottom:6px;font-weight:500;font-size:14px;color:#374151}
+        .form-input{width:100%;padding:10px 12px;border:1px solid #d1d5db;border-radius:8px;font-size:14px}
+      </style>
+      <div class="modal-grid">
+        <div class="modal-grid-full">
+          <label class="form-label"><i class="fas fa-user"></i> Username</label>
+          <input id="rs-username" class="form-input" value="${reseller ? reseller.username : ''}" ${reseller ? 'disabled' : ''} autocomplete="off">
+        </div>
+        <div class="modal-grid-full">
+          <label class="form-label"><i class="fas fa-key"></i> Password${reseller ? ' (leave empty to keep current)' : ''}</label>
+          <input id="rs-password" class="form-input" value="${reseller ? '' : generatePassword(16)}" autocomplete="off">
+        </div>
+        <div>
+          <label class="form-label"><i class="fas fa-id-card"></i> Max Accounts</label>
+          <input id="rs-users" type="number" class="form-input" value="${q.max_users ?? 0}" min="0" placeholder="0 = unlimited">
+        </div>
+        <div>
+          <label class="form-label"><i class="fas fa-database"></i> Traffic Quota (GB)</label>
+          <input id="rs-traffic" type="number" class="form-input" value="${q.traffic_quota_gb ?? 0}" min="0" placeholder="0 = unlimited">
+        </div>
+        <div>
+          <label class="form-label"><i class="fas fa-plug"></i> Connection Quota</label>
+          <input id="rs-connections" type="number" class="form-input" value="${q.connection_quota ?? 0}" min="0" placeholder="0 = unlimited">
+        </div>
+        <div>
+          <label style="display:flex;align-items:center;gap:8px;cursor:pointer;margin-top:30px;">
+            <input id="rs-active" type="checkbox" ${!reseller || reseller.is_active ? 'checked' : ''} style="width:18px;height:18px;">
+            <span class="form-label" style="margin:0;">Active</span>
+          </label>
+        </div>
+      </div>
+    `,
+    width: '700px',
+    showCancelButton: true,
+    confirmButtonText: reseller ? '<i class="fas fa-save"></i> Update' : '<i class="fas fa-check"></i> Create',
+    cancelButtonText: '<i class="fas fa-times"></i> Cancel',
+    confirmButtonColor: '#667eea',
+    preConfirm: () => {
+      const username = document.getElementById('rs-username').value.trim();
+      if (!reseller && !username) {
+        Swal.showValidationMessage('Username is required');
+        return false;
+      }
+      return {
+        username,
+        password: document.getElementById('rs-password').value || undefined,
+        max_users: document.getElementById('rs-users').value,
+        traffic_quota_gb: document.getElementById('rs-traffic').value,
+        connection_quota: document.getElementById('rs-connections').value,
+        is_active: document.getElementById('rs-active').checked,
+      };
+    },
+  }).then(async (result) => {
+    if (!result.isConfirmed) return;
+    try {
+      const panelPath = window.location.pathname.split('/')[1];
+      const url = `/${panelPath}/user_management/api/resellers` + (reseller ? `/${reseller.id}` : '');
+      const res = await fetch(url, {
+        method: reseller ? 'PUT' : 'POST', headers: { 'Content-Type': 'application/json' }, body: JSON.stringify(result.value)
+      });
+      const data = await res.json();
+      if (!data.success) return Swal.fire('Error', data.message, 'error');
+      Swal.fire('Saved!', data.message, 'success');
+      loadResellers();
+    } catch (err) {
+      Swal.fire('Error', 'Failed to save reseller', 'error');
+    }
+  });
+}
+
+function deleteReseller(resellerId) {
+  const reseller = allResellers.find((r) => r.id === resellerId);
+  if (!reseller) return;
+
+  Swal.fire({
+    title: 'Delete Reseller?',
+    html: `Are you sure you want to delete <strong>${reseller.username}</strong>?`,
+    icon: 'warning',
+    showCancelButton: true,
+    confirmButtonColor: '#dc3545',
+    confirmButtonText: 'Yes, delete it!',
+    cancelButtonText: 'Cancel',
+  }).then(async (result) => {
+    if (!result.isConfirmed) return;
+    try {
+      const panelPath = window.location.pathname.split('/')[1];
+      const res = await fetch(`/${panelPath}/user_management/api/resellers/${resellerId}`, { method: 'DELETE' });
+      const data = await res.json();
+      if (!data.success) return Swal.fire('Error', data.message, 'error');
+      Swal.fire('Deleted!', 'Reseller has been deleted', 'success');
+      loadResellers();
+    } catch (err) {
+      Swal.fire('Error', 'Failed to delete reseller', 'error');
+    }
+  });
+}
+
 // ---------- Rendering & Filters ----------
 
 function generatePassword(length) {
@@ -0,0 +1,72 @@
+// User Dashboard JavaScript
+
+document.addEventListener('DOMContentLoaded', function() {
+    loadUsage();
+    // Server-side snapshot refreshes every ~30s; polling faster gains nothing
+    setInterval(loadUsage, 60000);
+});
+
+async function loadUsage() {
+    try {
+        const pathParts = window.location.pathname.split('/');
+        const panelPath = pathParts[1];
+
+        const res = await fetch(`/${panelPath}/dashboard/api/usage`);
+        const data = await res.json();
+
+        if (!data.success) {
+            return;
+        }
+
+        renderUsage(data.usage);
+    } catch (err) {
+        console.error('Error loading usage:', err);
+    }
+}
+
+function renderUsage(usage) {
+    const limits = usage.limits;
+
+    document.getElementById('connections').textContent = limits
+        ? `${usage.current_connections} / ${limits.max_connections}`
+        : usage.current_connections;
+
+    if (limits) {
+        document.getElementById('trafficRemaining').textContent = `${limits.traffic_remaining_gb.toFixed(2)} GB`;
+        document.getElementById('trafficUsed').textContent =
+            `(${limits.traffic_used_gb.toFixed(2)} / ${limits.traffic_limit_gb} GB)`;
+        document.getElementById('daysLeft').textContent = limits.days_left !== null ? limits.days_left : '∞';
+        document.getElementById('expiresAt').textContent = limits.expires_at ? `(${limits.expires_at})` : '';
+    }
+
+    const ok = usage.is_active && !(limits && limits.is_expired);
+    const status = document.getElementById('accountStatus');
+    status.textContent = ok ? 'Active' : (usage.is_active ? 'Expired' : 'Disabled');
+
+    renderRecentUsage(usage.recent_usage || []);
+    document.getElementById('snapshotAt').textContent = `Updated: ${usage.snapshot_at} UTC`;
+}
+
+function renderRecentUsage(days) {
+    const list = document.getElementById('recentUsage');
+    const max = Math.max(...days.map((d) => d.traffic_gb), 0.001);
+
+    list.innerHTML = days
+        .slice()
+        .reverse()
+        .map((d) => `
+            <div class="activity-item">
+                <div class="activity-icon info">
+                    <i class="fas fa-exchange-alt"></i>
+                </div>
+                <div class="activity-content">
+                    <p class="activity-text"><strong>${d.traffic_gb.toFixed(2)} GB</strong></p>
+                    <div style="height: 6px; background: var(--border); border-radius: 3px;">
+                        <div style="width: ${(d.traffic_gb / max) * 100}%; height: 100%; background: var(--primary); border-radius: 3px;"></div>
+                    </div>
+                    <span class="activity-time">${d.date}</span>
+                </div>
+            </div>
+        `)
+        .join('');
+}
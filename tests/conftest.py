@@ -0,0 +1,32 @@
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config, _engine_options  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    from app import create_app, db
+
+    uri = f"sqlite:///{tmp_path / 'panel.db'}"
+
+    class TestConfig(Config):
+        TESTING = True
+        SECRET_KEY = 'test'
+        PANEL_PATH = 'p'
+        SQLALCHEMY_DATABASE_URI = uri
+        SQLALCHEMY_ENGINE_OPTIONS = _engine_options(uri)
+        SYSTEM_BACKEND = 'fake'
+        BILLING_CYCLE_DAY = 0
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
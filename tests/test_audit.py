@@ -0,0 +1,25 @@
+# tests/test_audit.py
+from datetime import datetime, timedelta
+
+from app import db
+from app.audit import query_events
+from app.models import AuditEvent
+
+
+def test_pages_follow_created_at_not_id(app):
+    base = datetime(2026, 1, 1)
+    # a worker that flushed late: older events under higher ids
+    for minutes in (5, 6, 1, 2, 7, 3):
+        db.session.add(AuditEvent(action='user.update', created_at=base + timedelta(minutes=minutes)))
+    db.session.commit()
+
+    seen, before_id = [], None
+    while True:
+        page = query_events(before_id=before_id, limit=2)
+        if not page:
+            break
+        seen.extend(page)
+        before_id = page[-1]['id']
+
+    assert [e['created_at'][-5:] for e in seen] == ['07:00', '06:00', '05:00', '03:00', '02:00', '01:00']
+    assert len({e['id'] for e in seen}) == 6
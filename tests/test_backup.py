@@ -0,0 +1,75 @@
+# tests/test_backup.py
+import io
+
+import pytest
+
+from app import db
+from app.backup import BackupError, generate_backup, restore_backup
+from app.models import User, UserLimit, ResellerQuota
+
+
+@pytest.fixture(autouse=True)
+def no_linux(monkeypatch):
+    from app.user_mgmt import linux
+    monkeypatch.setattr(linux, 'get_password_hashes', lambda usernames: {})
+    monkeypatch.setattr(linux, 'get_sshd_match_blocks', lambda usernames: {})
+
+
+def _user(username, role='user', owner=None):
+    user = User(username=username, role=role, owner_id=owner.id if owner else None)
+    user.set_password('secret12')
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def _backup() -> io.BytesIO:
+    return io.BytesIO(b''.join(generate_backup()))
+
+
+def test_backup_then_restore(app):
+    reseller = _user('res1', role='reseller')
+    reseller.reseller_quota = ResellerQuota(max_users=5, traffic_quota_gb=100)
+    alice = _user('alice', owner=reseller)
+    alice.limits = UserLimit(traffic_limit_gb=10, traffic_used_bytes=1234, max_connections=2)
+    db.session.commit()
+
+    data = _backup()
+    db.session.delete(alice)
+    db.session.commit()
+
+    result = restore_backup(data, reprovision=False)
+    assert result['counts']['users'] == 2
+    assert result['counts']['reseller_quotas'] == 1
+
+    alice = User.query.filter_by(username='alice').one()
+    assert alice.owner_id == reseller.id
+    assert alice.limits.traffic_used_bytes == 1234
+    quota = db.session.get(ResellerQuota, reseller.id)
+    assert (quota.users_count, quota.traffic_allocated_gb, quota.traffic_used_bytes) == (1, 10, 1234)
+
+
+def test_restore_owner_with_higher_id(app):
+    alice = _user('alice')
+    reseller = _user('res1', role='reseller')
+    assert alice.id < reseller.id
+    alice.owner_id = reseller.id
+    db.session.commit()
+
+    restore_backup(_backup(), reprovision=False)
+    assert User.query.filter_by(username='alice').one().owner_id == reseller.id
+
+
+def test_restore_rejects_unknown_owner(app, monkeypatch):
+    from app import backup
+    alice = _user('alice')
+    db.session.commit()
+    records = list(backup._records())
+    for record in records:
+        if record['type'] == 'row' and record['table'] == 'users':
+            record['data']['owner_id'] = 999
+    monkeypatch.setattr(backup, '_records', lambda: iter(records))
+
+    with pytest.raises(BackupError):
+        restore_backup(_backup(), reprovision=False)
+    assert User.query.filter_by(username='alice').one().owner_id is None
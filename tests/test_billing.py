@@ -0,0 +1,94 @@
+# tests/test_billing.py
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.billing import cycle_start, rollover
+from app.models import ResellerQuota, UsagePeriod, User, UserLimit
+
+
+@pytest.mark.parametrize('now, day, start', [
+    (datetime(2026, 5, 20, 8), 15, datetime(2026, 5, 15)),
+    (datetime(2026, 5, 15, 0), 15, datetime(2026, 5, 15)),       # starts at 00:00 of the day
+    (datetime(2026, 5, 14, 23, 59), 15, datetime(2026, 4, 15)),
+    # days past the end of a short month fall on its last day
+    (datetime(2026, 2, 28, 10), 31, datetime(2026, 2, 28)),
+    (datetime(2026, 2, 27, 10), 31, datetime(2026, 1, 31)),
+    (datetime(2026, 3, 5), 31, datetime(2026, 2, 28)),
+    (datetime(2028, 3, 1), 30, datetime(2028, 2, 29)),            # leap year
+    (datetime(2026, 5, 1), 31, datetime(2026, 4, 30)),
+    # January wraps to December of the previous year
+    (datetime(2026, 1, 3), 15, datetime(2025, 12, 15)),
+    (datetime(2026, 1, 1), 1, datetime(2026, 1, 1)),
+])
+def test_cycle_start(now, day, start):
+    assert cycle_start(now, day) == start
+
+
+def _user(username, used=0, day=1, started=None, owner=None):
+    user = User(username=username, role='user', password_hash='x', owner_id=owner.id if owner else None)
+    user.limits = UserLimit(traffic_limit_gb=10, traffic_used_bytes=used,
+                            billing_cycle_day=day, cycle_started_at=started)
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_first_cycle_is_only_anchored(app):
+    user = _user('alice', used=500, day=10)
+    result = rollover(datetime(2026, 5, 20))
+    assert (result['reset'], result['anchored']) == (0, 1)
+    assert user.limits.cycle_started_at == datetime(2026, 5, 10)
+    assert user.limits.traffic_used_bytes == 500
+    assert UsagePeriod.query.count() == 0
+
+    # same cycle: nothing to do
+    assert rollover(datetime(2026, 6, 9))['reset'] == 0
+
+
+def test_rollover_closes_the_ended_cycle(app):
+    reseller = User(username='res1', role='reseller', password_hash='x')
+    reseller.reseller_quota = ResellerQuota(traffic_used_bytes=1500)
+    db.session.add(reseller)
+    db.session.commit()
+    user = _user('alice', used=1000, day=1, started=datetime(2026, 4, 1), owner=reseller)
+
+    result = rollover(datetime(2026, 5, 2))
+    assert result['reset'] == 1
+    period = UsagePeriod.query.one()
+    assert (period.started_at, period.ended_at, period.bytes_used) == \
+        (datetime(2026, 4, 1), datetime(2026, 5, 1), 1000)
+    db.session.expire_all()
+    assert user.limits.traffic_used_bytes == 0
+    assert user.limits.cycle_started_at == datetime(2026, 5, 1)
+    assert db.session.get(ResellerQuota, reseller.id).traffic_used_bytes == 500
+
+
+def test_bytes_counted_during_rollover_are_kept(app):
+    user = _user('alice', used=1000, day=1, started=datetime(2026, 4, 1))
+    added = []
+
+    # the traffic daemon adds 300 bytes after rollover has read the usage
+    def daemon_write(conn, clauseelement, multiparams, params, execution_options, result):
+        if not added and getattr(getattr(clauseelement, 'table', None), 'name', None) == 'usage_periods':
+            added.append(True)
+            conn.exec_driver_sql('UPDATE user_limits SET traffic_used_bytes = traffic_used_bytes + 300')
+
+    event.listen(db.engine, 'after_execute', daemon_write)
+    try:
+        rollover(datetime(2026, 5, 2))
+    finally:
+        event.remove(db.engine, 'after_execute', daemon_write)
+
+    assert added
+    assert UsagePeriod.query.one().bytes_used == 1000
+    db.session.expire_all()
+    assert user.limits.traffic_used_bytes == 300
+
+
+def test_disabled_cycles_are_left_alone(app):
+    user = _user('alice', used=1000, day=0, started=datetime(2026, 4, 1))
+    assert rollover(datetime(2026, 5, 2)) == {'success': True, 'reset': 0, 'anchored': 0}
+    assert user.limits.traffic_used_bytes == 1000
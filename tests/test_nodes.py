@@ -0,0 +1,92 @@
+# tests/test_nodes.py
+import json
+import time
+
+from app import db
+from app.models import (Node, ResellerQuota, TrafficDaily, User, UserLimit, UserTrafficDaily)
+from app.nodes import protocol
+from app.nodes.client import quota_share, store_snapshot
+from app.nodes.protocol import NonceCache, signed_headers, verify
+
+TOKEN = 'node-secret'
+
+
+def test_signed_request_verifies():
+    body = json.dumps({'ops': []}).encode()
+    headers = signed_headers(TOKEN, 'POST', '/v1/provision', body)
+    assert verify(TOKEN, 'POST', '/v1/provision', body, headers)
+
+
+def test_signature_binds_token_method_path_and_body():
+    body = b'{"ops": []}'
+    headers = signed_headers(TOKEN, 'POST', '/v1/provision', body)
+    assert not verify('other', 'POST', '/v1/provision', body, headers)
+    assert not verify(TOKEN, 'GET', '/v1/provision', body, headers)
+    assert not verify(TOKEN, 'POST', '/v1/telemetry', body, headers)
+    assert not verify(TOKEN, 'POST', '/v1/provision', b'{"ops": [1]}', headers)
+    assert not verify(TOKEN, 'POST', '/v1/provision', body, dict(headers, **{protocol.NONCE_HEADER: 'f' * 32}))
+
+
+def test_old_requests_are_refused(monkeypatch):
+    headers = signed_headers(TOKEN, 'GET', '/v1/health', b'')
+    assert not verify(TOKEN, 'GET', '/v1/health', b'', headers, not_before=time.time() + 10)
+    monkeypatch.setattr(protocol.time, 'time', lambda: int(headers[protocol.TIMESTAMP_HEADER]) + protocol.MAX_SKEW + 1)
+    assert not verify(TOKEN, 'GET', '/v1/health', b'', headers)
+
+
+def test_nonce_is_accepted_once():
+    nonces = NonceCache()
+    headers = signed_headers(TOKEN, 'GET', '/v1/health', b'')
+    assert verify(TOKEN, 'GET', '/v1/health', b'', headers, nonces=nonces)
+    assert not verify(TOKEN, 'GET', '/v1/health', b'', headers, nonces=nonces)
+
+
+def test_nonce_cache_expires(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(protocol.time, 'monotonic', lambda: clock[0])
+    nonces = NonceCache(ttl=10)
+    assert nonces.add('a' * 32)
+    assert not nonces.add('a' * 32)
+    clock[0] += 11
+    assert nonces.add('a' * 32)
+
+
+def test_bad_signature_does_not_burn_the_nonce():
+    nonces = NonceCache()
+    headers = signed_headers(TOKEN, 'GET', '/v1/health', b'')
+    assert not verify(TOKEN, 'GET', '/v1/health', b'', dict(headers, **{protocol.SIGNATURE_HEADER: 'x'}), nonces=nonces)
+    assert verify(TOKEN, 'GET', '/v1/health', b'', headers, nonces=nonces)
+
+
+def test_quota_share():
+    assert quota_share(3 * 1024, 3) == 1024
+    assert quota_share(-5, 2) == 0
+    assert quota_share(10, 0) == 10
+
+
+def test_node_usage_counts_deltas_once(app):
+    reseller = User(username='res1', role='reseller', password_hash='x')
+    reseller.reseller_quota = ResellerQuota()
+    alice = User(username='alice', role='user', password_hash='x')
+    alice.limits = UserLimit(traffic_limit_gb=1)
+    node = Node(name='n1', url='http://n1', token=TOKEN)
+    db.session.add_all([reseller, alice, node])
+    db.session.flush()
+    alice.owner_id = reseller.id
+    db.session.commit()
+
+    def push(taken_at, traffic):
+        ok = store_snapshot(node, {'taken_at': taken_at, 'users': {'alice': {'traffic_bytes': traffic}}})
+        db.session.commit()
+        return ok
+
+    assert push(1_800_000_000, 1000)          # baseline only
+    assert push(1_800_000_010, 1500)
+    assert not push(1_800_000_010, 1500)      # same snapshot again (push + pull)
+    assert push(1_800_000_020, 200)           # counter reset on the node
+
+    day = UserTrafficDaily.query.one().day
+    assert alice.limits.traffic_used_bytes == 700
+    assert db.session.get(ResellerQuota, reseller.id).traffic_used_bytes == 700
+    assert db.session.get(UserTrafficDaily, (alice.id, day)).bytes == 700
+    assert db.session.get(TrafficDaily, day).bytes == 700
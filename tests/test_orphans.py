@@ -0,0 +1,17 @@
+# tests/test_orphans.py
+from app.user_mgmt.backends import get_system_backend
+from app.user_mgmt.services.linux_orphans import clean_orphans
+
+
+def test_clean_orphans_drops_quotas_before_deleting(app, monkeypatch):
+    backend = get_system_backend()
+    backend.create_user('ghost', 'secret12')
+    calls = []
+    apply_quotas, delete_user = backend.apply_quotas, backend.delete_user
+    monkeypatch.setattr(backend, 'apply_quotas',
+                        lambda quotas, removed=(): calls.append(('drop', list(removed))) or apply_quotas(quotas, removed))
+    monkeypatch.setattr(backend, 'delete_user',
+                        lambda username: calls.append(('delete', username)) or delete_user(username))
+
+    assert clean_orphans()['cleaned'] == ['ghost']
+    assert calls == [('drop', ['ghost']), ('delete', 'ghost')]
@@ -0,0 +1,69 @@
+# tests/test_resellers.py
+from app import db
+from app.models import ResellerQuota, User, UserLimit
+from app.user_mgmt.services.resellers import recount, reserve
+
+
+def _reseller(**limits):
+    reseller = User(username='res1', role='reseller', is_active=True)
+    reseller.set_password('respw1')
+    reseller.reseller_quota = ResellerQuota(**limits)
+    db.session.add(reseller)
+    db.session.commit()
+    return reseller
+
+
+def _totals(reseller):
+    db.session.expire_all()
+    q = db.session.get(ResellerQuota, reseller.id)
+    return q.users_count, q.traffic_allocated_gb, q.connections_allocated, q.traffic_used_bytes
+
+
+def test_reserve_within_limits(app):
+    reseller = _reseller(max_users=2, traffic_quota_gb=10, connection_quota=0)
+    assert reserve(reseller.id, users=1, traffic_gb=6, connections=50)
+    assert not reserve(reseller.id, users=1, traffic_gb=5)          # 11 > 10: nothing changes
+    assert reserve(reseller.id, users=1, traffic_gb=4)
+    assert not reserve(reseller.id, users=1)                         # max_users reached
+    assert _totals(reseller) == (2, 10, 50, 0)
+
+
+def test_reserve_never_below_zero(app):
+    reseller = _reseller(traffic_quota_gb=10)
+    assert reserve(reseller.id, users=1, traffic_gb=5, used_bytes=100)
+    assert not reserve(reseller.id, traffic_gb=-6)
+    assert reserve(reseller.id, traffic_gb=-6, used_bytes=-500, enforce=False)
+    assert _totals(reseller) == (1, 0, 0, 0)
+
+
+def test_admin_changes_are_not_refused(app):
+    reseller = _reseller(max_users=1, traffic_quota_gb=1)
+    assert reserve(reseller.id, users=3, traffic_gb=100, enforce=False)
+    assert _totals(reseller)[:2] == (3, 100)
+
+
+def test_recount(app):
+    reseller = _reseller()
+    for n, (gb, conns, used) in enumerate(((10, 2, 100), (5, 1, 50))):
+        user = User(username=f'user{n}', role='user', owner_id=reseller.id, password_hash='x')
+        user.limits = UserLimit(traffic_limit_gb=gb, max_connections=conns, traffic_used_bytes=used)
+        db.session.add(user)
+    db.session.add(User(username='other', role='user', password_hash='x',
+                        limits=UserLimit(traffic_limit_gb=99)))
+    reserve(reseller.id, users=7, traffic_gb=70, enforce=False)      # drifted totals
+    db.session.commit()
+
+    assert recount() == 1
+    db.session.commit()
+    assert _totals(reseller) == (2, 15, 3, 150)
+
+
+def test_deactivated_reseller_loses_its_session(app):
+    reseller = _reseller()
+    client = app.test_client()
+    client.post('/p/login', data={'username': 'res1', 'password': 'respw1', 'user_type': 'reseller'})
+    assert client.get('/p/user_management/api/users').status_code == 200
+
+    reseller.is_active = False
+    db.session.commit()
+    assert client.get('/p/user_management/api/users').status_code in (302, 401)
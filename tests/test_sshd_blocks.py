@@ -0,0 +1,57 @@
+# tests/test_sshd_blocks.py
+from app.user_mgmt import linux
+from app.user_mgmt.linux import _drop_match_blocks, parse_sshd_match_block, sshd_match_block
+
+
+def test_panel_block_round_trips():
+    block = sshd_match_block('alice')
+    assert parse_sshd_match_block('alice', block) == linux.SSHD_MATCH_DEFAULTS
+
+
+def test_changed_values_are_kept():
+    block = sshd_match_block('alice').replace('PermitTTY no', 'PermitTTY yes')
+    assert parse_sshd_match_block('alice', block)['PermitTTY'] == 'yes'
+
+
+def test_foreign_directives_are_rejected():
+    block = sshd_match_block('alice')
+    assert parse_sshd_match_block('alice', block + '    AuthorizedKeysCommand /tmp/x\n') is None
+    assert parse_sshd_match_block('alice', block.replace('internal-sftp', '/bin/sh')) is None
+    assert parse_sshd_match_block('alice', block + 'Match all\n    PermitRootLogin yes\n') is None
+
+
+def test_block_must_match_its_user():
+    assert parse_sshd_match_block('alice', sshd_match_block('bob')) is None
+    assert parse_sshd_match_block('a/b', sshd_match_block('a/b')) is None
+    assert parse_sshd_match_block('a b', sshd_match_block('a b')) is None
+
+
+def test_drop_match_blocks():
+    config = ('Port 22\n'
+              '\n' + sshd_match_block('alice') +
+              '\n' + sshd_match_block('bob') +
+              'Match Group admins\n    PermitTTY yes\n')
+    result = _drop_match_blocks(config, ['alice', 'bob'])
+    assert 'Match User' not in result
+    assert result.startswith('Port 22\n')
+    assert 'Match Group admins\n    PermitTTY yes\n' in result
+
+
+def test_set_blocks_rewrites_once(tmp_path, monkeypatch):
+    config = tmp_path / 'sshd_config'
+    config.write_text('Port 22\n\n' + sshd_match_block('alice'))
+    calls = []
+    monkeypatch.setattr(linux, 'SSHD_CONFIG', str(config))
+    monkeypatch.setattr(linux, 'check_linux_user_exists', lambda u: u != 'ghost')
+    monkeypatch.setattr(linux, 'get_sshd_match_blocks',
+                        lambda users: {'alice': sshd_match_block('alice')})
+    monkeypatch.setattr(linux, '_run', lambda cmd, input=None, **kw: calls.append((cmd, input)))
+    monkeypatch.setattr(linux, 'reload_sshd', lambda: True)
+
+    changed = sshd_match_block('alice').replace('PermitTTY no', 'PermitTTY yes')
+    ok, msg = linux.set_sshd_match_blocks({'alice': changed, 'ghost': sshd_match_block('ghost'),
+                                           'eve': 'Match User eve\n    PermitRootLogin yes\n'})
+    assert ok and 'rejected: eve, ghost' in msg
+    [(cmd, text)] = calls
+    assert cmd == ['tee', str(config)]
+    assert text.count('Match User alice') == 1 and 'PermitTTY yes' in text
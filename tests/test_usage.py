@@ -0,0 +1,45 @@
+# tests/test_usage.py
+from datetime import datetime, timedelta
+
+from app import db
+from app.models import AuditEvent, User
+from app.user_mgmt.services import usage
+
+
+def _user(username):
+    user = User(username=username, role='user')
+    user.set_password('secret12')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_login_does_not_bump_updated_at(app):
+    user = _user('alice')
+    stamped = user.updated_at
+    user.last_login = datetime.utcnow() + timedelta(minutes=1)
+    user.set_password('other123')
+    db.session.commit()
+    assert user.updated_at == stamped
+
+    user.is_active = False
+    db.session.commit()
+    assert user.updated_at > stamped
+
+
+def test_deleted_pages(app, monkeypatch):
+    monkeypatch.setattr(usage, 'MAX_BATCH', 2)
+    since = datetime(2026, 1, 1)
+    for n in range(5):
+        db.session.add(AuditEvent(action='user.delete', target_user_id=n, target=f'u{n}',
+                                  created_at=since + timedelta(minutes=n)))
+    db.session.commit()
+
+    seen, cursor = [], None
+    while True:
+        result = usage.query_usage(changed_since=since, deleted_after_id=cursor)
+        seen.extend(d['id'] for d in result['deleted'])
+        cursor = result.get('next_deleted_after_id')
+        if cursor is None:
+            break
+    assert seen == [0, 1, 2, 3, 4]